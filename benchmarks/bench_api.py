@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""Load-test the FastAPI backend end to end and record latency percentiles.
+
+For each table size the script seeds a scratch database, starts the app with
+uvicorn in a subprocess (LLM_BACKEND=fake, so no API calls are made) and
+drives each scenario with concurrent HTTP clients:
+
+- submit:       POST /api/submit
+- submissions:  GET /api/submissions (first page, deep keyset cursors, rating filter)
+- analytics:    GET /api/analytics
+
+p50/p95/p99 latency and throughput are printed and written, together with the
+git commit and settings, to a JSON file. Pass `--compare` with an earlier file
+to see the change per scenario.
+
+Seeded databases are reused across runs when `--seed-cache` is given (seeding
+1M rows takes a while).
+
+Usage:
+    python benchmarks/bench_api.py --sizes 10000,100000,1000000 --concurrency 16 --duration 10
+    python benchmarks/bench_api.py --sizes 10000 --compare benchmarks/results/api-<commit>.json
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = ROOT / "src" / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import database  # noqa: E402
+
+SCENARIOS = ("submit", "submissions", "analytics")
+WORDS = (
+    "food service staff friendly slow great terrible price delivery order cold "
+    "fresh waiter table clean dirty noisy quiet parking menu dessert coffee wait "
+    "manager refund booking rude helpful amazing awful average portion"
+).split()
+
+
+def git_info() -> Dict:
+    def git(*args: str) -> str:
+        try:
+            return subprocess.run(
+                ["git", *args], cwd=ROOT, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--", "src"))}
+
+
+def random_review(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40)))
+
+
+def seed(path: Path, rows: int, seed_value: int = 1):
+    """Create a database at `path` with `rows` submissions spread over the last year."""
+    database.close_connections()
+    database.DB_PATH = path
+    database.init_db()
+    database.close_connections()
+
+    rng = random.Random(seed_value)
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    conn = sqlite3.connect(str(path))
+    conn.execute("PRAGMA synchronous=OFF")
+    batch = 10_000
+    for offset in range(0, rows, batch):
+        params = []
+        for i in range(offset, min(rows, offset + batch)):
+            created = start + timedelta(seconds=i * 365 * 86400 / rows)
+            params.append((
+                rng.choices([1, 2, 3, 4, 5], weights=[10, 10, 20, 30, 30])[0],
+                random_review(rng), "seed response", "seed summary", "seed action",
+                created.strftime("%Y-%m-%d %H:%M:%S"),
+            ))
+        with conn:
+            # Goes through the triggers, so rollups and the search index are real.
+            conn.executemany(
+                "INSERT INTO submissions (rating, review, ai_response, ai_summary, ai_recommended_action, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                params,
+            )
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+
+def prepared_db(rows: int, workdir: Path, seed_cache: Optional[Path]) -> Path:
+    """Path to a freshly seeded (or copied from the seed cache) database with `rows` rows."""
+    target = workdir / f"bench-{rows}.db"
+    cached = seed_cache / f"seed-{rows}.db" if seed_cache else None
+    if cached and cached.exists():
+        shutil.copyfile(cached, target)
+        return target
+    started = time.perf_counter()
+    seed(target, rows)
+    print(f"  seeded {rows} rows in {time.perf_counter() - started:.1f}s")
+    if cached:
+        seed_cache.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(target, cached)
+    return target
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Server:
+    """uvicorn running the app against one database, with the fake LLM backend."""
+
+    def __init__(self, db_path: Path, llm_latency_ms: float, log_path: Path):
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = {
+            **os.environ,
+            "FEEDBACK_DB_PATH": str(db_path),
+            "LLM_BACKEND": "fake",
+            "FAKE_LLM_LATENCY_MS": str(llm_latency_ms),
+            "FAKE_LLM_JITTER_MS": str(llm_latency_ms / 4),
+            "LLM_CACHE_PATH": "",
+            # Every load-generator client is 127.0.0.1: measure the app, not the admission limits.
+            "CLIENT_RATE_PER_MINUTE": "0",
+            "LLM_MAX_CONCURRENT": "64",
+            "LLM_MAX_QUEUE": "4096",
+            "LLM_QUEUE_TIMEOUT_SECONDS": "60",
+        }
+        self._log = log_path.open("w")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(self.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=self._log, stderr=subprocess.STDOUT,
+        )
+
+    def wait_ready(self, timeout: float = 60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"server exited with code {self.process.returncode}; see {self._log.name}")
+            try:
+                if requests.get(self.url + "/", timeout=1).ok:
+                    return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise RuntimeError("server did not start in time")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self._log.close()
+
+
+def make_request(scenario: str, url: str, max_id: int) -> Callable[[requests.Session, random.Random], requests.Response]:
+    if scenario == "submit":
+        def call(session, rng):
+            body = {"rating": rng.randint(1, 5), "review": random_review(rng)}
+            return session.post(url + "/api/submit", json=body, timeout=30)
+    elif scenario == "submissions":
+        def call(session, rng):
+            roll = rng.random()
+            params = {"limit": 50}
+            if roll < 0.34:
+                pass  # newest page: what the dashboard loads first
+            elif roll < 0.67:
+                params["before_id"] = rng.randint(1, max_id + 1)
+            else:
+                params["before_id"] = rng.randint(1, max_id + 1)
+                params["rating"] = rng.randint(1, 5)
+            return session.get(url + "/api/submissions", params=params, timeout=30)
+    elif scenario == "analytics":
+        def call(session, rng):
+            return session.get(url + "/api/analytics", timeout=30)
+    else:
+        raise ValueError(f"unknown scenario {scenario!r}")
+    return call
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def drive(call, concurrency: int, duration: float, warmup: float) -> Dict:
+    """Run `call` from `concurrency` client threads; latencies of the warmup period are dropped."""
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop = measure_from + duration
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def client(index: int):
+        nonlocal errors
+        rng = random.Random(index)
+        session = requests.Session()
+        own: List[float] = []
+        own_errors = 0
+        while True:
+            t0 = time.perf_counter()
+            if t0 >= stop:
+                break
+            try:
+                ok = call(session, rng).status_code < 400
+            except requests.RequestException:
+                ok = False
+            t1 = time.perf_counter()
+            if t0 >= measure_from:
+                if ok:
+                    own.append((t1 - t0) * 1000)
+                else:
+                    own_errors += 1
+        session.close()
+        with lock:
+            latencies.extend(own)
+            errors += own_errors
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / duration, 1),
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+
+def compare(previous_path: Path, results: List[Dict]):
+    previous = {(r["rows"], r["scenario"]): r for r in json.loads(previous_path.read_text())["results"]}
+    print(f"\nvs {previous_path.name}:")
+    for r in results:
+        old = previous.get((r["rows"], r["scenario"]))
+        if not old:
+            continue
+        def delta(key):
+            return (r[key] - old[key]) / old[key] * 100 if old[key] else 0.0
+        print(f"  {r['rows']:>8} {r['scenario']:<12} p50 {delta('p50_ms'):+6.1f}%  p99 {delta('p99_ms'):+6.1f}%"
+              f"  throughput {delta('throughput_rps'):+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="comma-separated table sizes")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each scenario")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="fake backend latency")
+    parser.add_argument("--seed-cache", type=Path, help="directory to keep seeded databases between runs")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/api-<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier results file to diff against")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    git = git_info()
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench-api-") as tmp:
+        workdir = Path(tmp)
+        for rows in sizes:
+            print(f"{rows} rows")
+            db_path = prepared_db(rows, workdir, args.seed_cache)
+            server = Server(db_path, args.llm_latency_ms, workdir / f"server-{rows}.log")
+            try:
+                server.wait_ready()
+                for scenario in scenarios:
+                    call = make_request(scenario, server.url, rows)
+                    stats = drive(call, args.concurrency, args.duration, args.warmup)
+                    result = {"rows": rows, "scenario": scenario, **stats}
+                    results.append(result)
+                    print(f"  {scenario:<12} {stats['throughput_rps']:>8} req/s  p50 {stats['p50_ms']:>8} ms"
+                          f"  p95 {stats['p95_ms']:>8} ms  p99 {stats['p99_ms']:>8} ms  errors {stats['errors']}")
+            finally:
+                server.stop()
+
+    report = {
+        "git_commit": git["commit"],
+        "git_dirty": git["dirty"],
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "llm_latency_ms": args.llm_latency_ms,
+        },
+        "results": results,
+    }
+    output = args.output or ROOT / "benchmarks" / "results" / f"api-{(git['commit'] or 'unknown')[:12]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print("Wrote", output)
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Benchmark mixed read/write throughput of the SQLite layer.
+
+Compares the original connect-per-call + global-lock access pattern ("legacy")
+against the pooled WAL connections in `src/backend/database.py` ("pooled").
+Each run uses a fresh scratch database so results are independent.
+
+With --processes, it instead measures insert-only throughput with that many
+worker processes (like `uvicorn --workers N`) writing to one database file,
+and counts the writes that failed (e.g. "database is locked").
+
+Usage:
+    python benchmarks/bench_database.py --threads 8 --seconds 5 --write-ratio 0.2
+    python benchmarks/bench_database.py --processes 1,2,4,8 --threads 8 --seconds 5
+"""
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src" / "backend"))
+
+import database  # noqa: E402
+
+SEED_ROWS = 2000
+
+
+class LegacyStore:
+    """Replica of the pre-pool access pattern: new connection + global lock per call."""
+
+    def __init__(self, path: Path):
+        self.path = str(path)
+        self.lock = threading.Lock()
+
+    def add(self, rating: int, review: str) -> int:
+        with self.lock:
+            conn = sqlite3.connect(self.path)
+            cur = conn.execute(
+                "INSERT INTO submissions (rating, review, ai_response, ai_summary, ai_recommended_action)"
+                " VALUES (?, ?, 'r', 's', 'a')",
+                (rating, review),
+            )
+            conn.commit()
+            conn.close()
+        return cur.lastrowid
+
+    def get(self, submission_id: int):
+        with self.lock:
+            conn = sqlite3.connect(self.path)
+            row = conn.execute("SELECT * FROM submissions WHERE id = ?", (submission_id,)).fetchone()
+            conn.close()
+        return row
+
+    def analytics(self):
+        with self.lock:
+            conn = sqlite3.connect(self.path)
+            conn.execute("SELECT COUNT(*) FROM submissions").fetchone()
+            conn.execute("SELECT AVG(rating) FROM submissions").fetchone()
+            conn.execute("SELECT rating, COUNT(*) FROM submissions GROUP BY rating").fetchall()
+            conn.close()
+
+
+class PooledStore:
+    """Thin adapter over the real database module."""
+
+    def add(self, rating: int, review: str) -> int:
+        return database.add_submission(rating, review, "r", "s", "a")
+
+    def get(self, submission_id: int):
+        return database.get_submission_by_id(submission_id)
+
+    def analytics(self):
+        return database.get_analytics()
+
+
+def seed(path: Path, rows: int):
+    conn = sqlite3.connect(str(path))
+    conn.executemany(
+        "INSERT INTO submissions (rating, review, ai_response, ai_summary, ai_recommended_action)"
+        " VALUES (?, ?, 'r', 's', 'a')",
+        [(random.randint(1, 5), f"seed review {i}") for i in range(rows)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def drive(store, threads: int, seconds: float, write_ratio: float) -> dict:
+    """Hammer `store` from `threads` workers and count completed operations."""
+    stop = time.perf_counter() + seconds
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    counts_lock = threading.Lock()
+
+    def worker():
+        rng = random.Random()
+        reads = writes = errors = 0
+        while time.perf_counter() < stop:
+            try:
+                if rng.random() < write_ratio:
+                    store.add(rng.randint(1, 5), "benchmark review")
+                    writes += 1
+                elif rng.random() < 0.5:
+                    store.get(rng.randint(1, SEED_ROWS))
+                    reads += 1
+                else:
+                    store.analytics()
+                    reads += 1
+            except sqlite3.Error:
+                errors += 1
+        with counts_lock:
+            counts["reads"] += reads
+            counts["writes"] += writes
+            counts["errors"] += errors
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    total = counts["reads"] + counts["writes"]
+    return {**counts, "ops_per_sec": round(total / seconds, 1)}
+
+
+def run(mode: str, threads: int, seconds: float, write_ratio: float) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.close_connections()
+        database.DB_PATH = Path(tmp) / "bench.db"
+        database.init_db()
+        seed(database.DB_PATH, SEED_ROWS)
+        if mode == "legacy":
+            # init_db() switched the file to WAL; put it back to the default
+            # rollback journal the legacy code ran with.
+            database.close_connections()
+            conn = sqlite3.connect(str(database.DB_PATH))
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.close()
+        store = LegacyStore(database.DB_PATH) if mode == "legacy" else PooledStore()
+        result = drive(store, threads, seconds, write_ratio)
+        database.close_connections()
+    return {"mode": mode, **result}
+
+
+def _insert_worker(db_path: str, threads: int, seconds: float, results):
+    database.DB_PATH = Path(db_path)
+    results.put(drive(PooledStore(), threads, seconds, write_ratio=1.0))
+
+
+def run_processes(processes: int, threads: int, seconds: float) -> dict:
+    """Insert-only load from `processes` separate processes sharing one database file."""
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as tmp:
+        database.close_connections()
+        database.DB_PATH = Path(tmp) / "bench.db"
+        database.init_db()
+        seed(database.DB_PATH, SEED_ROWS)
+        database.close_connections()
+        results = context.Queue()
+        workers = [
+            context.Process(target=_insert_worker, args=(str(database.DB_PATH), threads, seconds, results))
+            for _ in range(processes)
+        ]
+        for w in workers:
+            w.start()
+        counts = [results.get() for _ in workers]
+        for w in workers:
+            w.join()
+    writes = sum(c["writes"] for c in counts)
+    return {
+        "mode": "insert",
+        "processes": processes,
+        "writes": writes,
+        "errors": sum(c["errors"] for c in counts),
+        "writes_per_sec": round(writes / seconds, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--processes", help="comma-separated process counts for the multi-process insert run")
+    args = parser.parse_args()
+
+    if args.processes:
+        for processes in (int(p) for p in args.processes.split(",") if p):
+            print(json.dumps(run_processes(processes, args.threads, args.seconds)))
+        return
+
+    results = [run(mode, args.threads, args.seconds, args.write_ratio) for mode in ("legacy", "pooled")]
+    for r in results:
+        print(json.dumps(r))
+    legacy, pooled = results
+    print(f"speedup: {pooled['ops_per_sec'] / max(legacy['ops_per_sec'], 1):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""Measure backend cold start: module import time and time to first 200 on `/`.
+
+Every dyno restart, test run and script pays the cost of importing the backend
+before it does anything useful, so this tracks it the same way bench_api.py
+tracks request latency:
+
+- import:  `import main` in a fresh interpreter (median over --runs)
+- ready:   from launching uvicorn to the first 200 from GET / (median over --runs)
+- modules: the slowest imports by cumulative time, from `python -X importtime`
+
+Both are measured against an existing, already migrated database (the normal
+restart case) with LLM_BACKEND=gemini and a dummy key, so the Gemini SDK would
+be loaded if anything imported it eagerly. Results go to
+benchmarks/results/startup-<commit>.json; `--compare` diffs against an earlier
+file, and `--max-import-ms` / `--max-ready-ms` fail the run when exceeded.
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --compare benchmarks/results/startup-<commit>.json --max-ready-ms 3000
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+import requests
+
+from bench_api import BACKEND_DIR, ROOT, free_port, git_info
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def backend_env(db_path: Path) -> Dict[str, str]:
+    return {
+        **os.environ,
+        "FEEDBACK_DB_PATH": str(db_path),
+        "LLM_BACKEND": "gemini",
+        "GEMINI_API_KEY": "bench-startup-dummy-key",
+        "LLM_CACHE_PATH": "",
+    }
+
+
+def prepare_db(db_path: Path):
+    """Create and migrate the database once, so runs measure a restart, not a first boot."""
+    subprocess.run(
+        [sys.executable, "-c", "import database; database.init_db()"],
+        cwd=BACKEND_DIR, env=backend_env(db_path), check=True,
+    )
+
+
+def measure_import(db_path: Path) -> float:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=BACKEND_DIR, env=backend_env(db_path), capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1]) * 1000
+
+
+def measure_ready(db_path: Path, timeout: float = 60.0) -> float:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=backend_env(db_path), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"server exited with code {process.returncode}")
+            try:
+                if requests.get(url, timeout=1).status_code == 200:
+                    return (time.perf_counter() - started) * 1000
+            except requests.RequestException:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError("server did not answer in time")
+    finally:
+        process.terminate()
+        try:
+            process.wait(10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def slowest_imports(db_path: Path, top: int) -> List[Dict]:
+    """Top-level packages and modules by cumulative import time, in ms."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=backend_env(db_path), capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if "." not in name:
+            modules.append({"module": name, "cumulative_ms": round(int(cumulative) / 1000, 1)})
+    modules.sort(key=lambda m: -m["cumulative_ms"])
+    return modules[:top]
+
+
+def compare(previous_path: Path, report: Dict):
+    previous = json.loads(previous_path.read_text())
+    print(f"\nvs {previous_path.name}:")
+    for key in ("import_ms", "ready_ms"):
+        old, new = previous[key]["median"], report[key]["median"]
+        change = (new - old) / old * 100 if old else 0.0
+        print(f"  {key:<10} {old:>8.1f} -> {new:>8.1f} ms  ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to report")
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/startup-<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier results file to diff against")
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import time exceeds this")
+    parser.add_argument("--max-ready-ms", type=float, help="fail if the median time to first 200 exceeds this")
+    args = parser.parse_args()
+
+    git = git_info()
+    with tempfile.TemporaryDirectory(prefix="bench-startup-") as tmp:
+        db_path = Path(tmp) / "startup.db"
+        prepare_db(db_path)
+        measure_import(db_path)  # warm the bytecode and OS file caches
+        imports = [measure_import(db_path) for _ in range(args.runs)]
+        ready = [measure_ready(db_path) for _ in range(args.runs)]
+        modules = slowest_imports(db_path, args.top)
+
+    def summary(values: List[float]) -> Dict:
+        return {"median": round(statistics.median(values), 1), "min": round(min(values), 1),
+                "max": round(max(values), 1), "runs": [round(v, 1) for v in values]}
+
+    report = {
+        "git_commit": git["commit"],
+        "git_dirty": git["dirty"],
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "import_ms": summary(imports),
+        "ready_ms": summary(ready),
+        "slowest_imports": modules,
+    }
+    print(f"import main   median {report['import_ms']['median']:>8.1f} ms  (min {report['import_ms']['min']})")
+    print(f"first 200 /   median {report['ready_ms']['median']:>8.1f} ms  (min {report['ready_ms']['min']})")
+    print("slowest imports:")
+    for module in modules:
+        print(f"  {module['cumulative_ms']:>8.1f} ms  {module['module']}")
+
+    output = args.output or ROOT / "benchmarks" / "results" / f"startup-{(git['commit'] or 'unknown')[:12]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print("Wrote", output)
+    if args.compare:
+        compare(args.compare, report)
+
+    failed = []
+    if args.max_import_ms is not None and report["import_ms"]["median"] > args.max_import_ms:
+        failed.append(f"import {report['import_ms']['median']} ms > {args.max_import_ms} ms")
+    if args.max_ready_ms is not None and report["ready_ms"]["median"] > args.max_ready_ms:
+        failed.append(f"first 200 {report['ready_ms']['median']} ms > {args.max_ready_ms} ms")
+    if failed:
+        print("Startup budget exceeded:", "; ".join(failed))
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Offline evaluation of the local recommended-action classifier against the LLM.
+
+Reads the submissions whose recommended action was written by the LLM (see
+action_classifier.load_examples), trains on the oldest rows and scores the
+newest --test-share of them, the way a model trained today would meet
+tomorrow's reviews. For each confidence threshold it reports:
+
+- calls avoided:      share of test reviews the classifier would answer itself
+- local agreement:    how often those local answers match the LLM's category
+- overall agreement:  the same over all test reviews, counting the ones sent
+                      to the LLM as agreeing (they get the LLM's answer)
+
+next to the rating-only rule the template fallback uses, plus the median
+prediction latency. Results go to benchmarks/results/action-classifier-<commit>.json;
+`--save` also writes the model trained on all rows to ACTION_CLASSIFIER_PATH.
+
+Usage:
+    FEEDBACK_DB_PATH=/data/submissions.db python benchmarks/eval_action_classifier.py
+    python benchmarks/eval_action_classifier.py --test-share 0.2 --thresholds 0.8,0.9,0.95 --save
+"""
+from __future__ import annotations
+import argparse
+import json
+import statistics
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from bench_api import ROOT, git_info
+
+import action_classifier  # noqa: E402
+import database  # noqa: E402
+
+
+def evaluate(model: action_classifier.HashedLinearClassifier, test: Sequence[Tuple[int, int, str, str]],
+             thresholds: Sequence[float]) -> Dict:
+    predictions = []
+    latencies = []
+    for _, rating, review, category in test:
+        started = time.perf_counter()
+        predicted, confidence = model.predict(rating, review)
+        latencies.append((time.perf_counter() - started) * 1e6)
+        predictions.append((predicted, confidence, category))
+
+    rule_agreement = sum(action_classifier.rating_rule(rating) == category for _, rating, _, category in test)
+    results = []
+    for threshold in thresholds:
+        local = [(predicted, category) for predicted, confidence, category in predictions if confidence >= threshold]
+        agreed = sum(predicted == category for predicted, category in local)
+        results.append({
+            "threshold": threshold,
+            "calls_avoided": round(len(local) / len(test), 4),
+            "local_agreement": round(agreed / len(local), 4) if local else None,
+            "overall_agreement": round((agreed + len(test) - len(local)) / len(test), 4),
+        })
+    return {
+        "test_rows": len(test),
+        "model_agreement": round(sum(p == c for p, _, c in predictions) / len(test), 4),
+        "rating_rule_agreement": round(rule_agreement / len(test), 4),
+        "predict_us_median": round(statistics.median(latencies), 1),
+        "thresholds": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--test-share", type=float, default=0.2, help="newest share of rows held out for scoring")
+    parser.add_argument("--thresholds", default="0.6,0.7,0.8,0.9,0.95,0.99")
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/action-classifier-<commit>.json)")
+    parser.add_argument("--save", action="store_true", help="also train on all rows and save to ACTION_CLASSIFIER_PATH")
+    args = parser.parse_args()
+    thresholds: List[float] = [float(t) for t in args.thresholds.split(",")]
+
+    database.init_db()
+    examples = action_classifier.load_examples()
+    split = int(len(examples) * (1 - args.test_share))
+    train, test = examples[:split], examples[split:]
+    if not train or not test:
+        raise SystemExit(f"Need LLM-labelled submissions to train and test on (found {len(examples)})")
+
+    started = time.perf_counter()
+    model = action_classifier.HashedLinearClassifier().fit(
+        [(rating, review, category) for _, rating, review, category in train], epochs=args.epochs
+    )
+    train_seconds = time.perf_counter() - started
+    evaluation = evaluate(model, test, thresholds)
+
+    git = git_info()
+    report = {
+        "git_commit": git["commit"],
+        "git_dirty": git["dirty"],
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "train_rows": len(train),
+        "train_seconds": round(train_seconds, 2),
+        "categories": dict(Counter(category for *_, category in examples)),
+        **evaluation,
+    }
+    print(f"train {report['train_rows']} rows in {report['train_seconds']} s, test {report['test_rows']} rows")
+    print(f"agreement with LLM: model {report['model_agreement']:.1%}, "
+          f"rating rule {report['rating_rule_agreement']:.1%}; predict {report['predict_us_median']} us")
+    print(f"{'threshold':>9}  {'calls avoided':>13}  {'local agr.':>10}  {'overall agr.':>12}")
+    for row in report["thresholds"]:
+        local = f"{row['local_agreement']:.1%}" if row["local_agreement"] is not None else "-"
+        print(f"{row['threshold']:>9}  {row['calls_avoided']:>13.1%}  {local:>10}  {row['overall_agreement']:>12.1%}")
+
+    output = args.output or ROOT / "benchmarks" / "results" / f"action-classifier-{(git['commit'] or 'unknown')[:12]}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print("Wrote", output)
+
+    if args.save:
+        final = action_classifier.HashedLinearClassifier().fit(
+            [(rating, review, category) for _, rating, review, category in examples], epochs=args.epochs
+        )
+        final.save(action_classifier.ACTION_CLASSIFIER_PATH)
+        print("Saved model to", action_classifier.ACTION_CLASSIFIER_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,13 @@ Behavior:
 - If `GEMINI_API_KEY` is set in the environment, it will call Google Gemini API.
   Otherwise it runs a fast simulation (no external calls) to keep storage and bandwidth low.
 
+Each distinct prompt is evaluated once and its output shared by every sample
+that produces it. Outputs are kept in `prompt_results.jsonl`, keyed by a hash
+of (model, generation config, prompt), so strategies and later runs reuse them
+and an interrupted run resumes where it stopped (`--fresh` discards the store).
+Prompts are evaluated concurrently (`--workers`). Real API calls go through a
+token-bucket rate limiter (`--rpm`) and are retried with exponential backoff.
+
 Outputs:
 - `tasks/task1/results_{strategy}.csv` small CSVs with predictions.
 """
@@ -15,45 +22,61 @@ import os
 import csv
 import json
 import random
+import hashlib
+import importlib.util
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 
-try:
-    import google.generativeai as genai
-except Exception:
-    genai = None
+
+def genai_available() -> bool:
+    """Whether the Gemini SDK is installed, checked without importing its heavy module tree."""
+    try:
+        return importlib.util.find_spec("google.generativeai") is not None
+    except ImportError:
+        return False
 
 
 OUTDIR = Path(__file__).resolve().parent / "task1_results"
 OUTDIR.mkdir(parents=True, exist_ok=True)
+RESULT_STORE = OUTDIR / "prompt_results.jsonl"
+
+DEFAULT_MODEL = "gemini-1.5-flash"
+GENERATION_CONFIG = {"max_output_tokens": 256, "temperature": 0.2}
+
+POS_PHRASES = [
+    "absolutely loved it", "highly recommend", "five stars", "will come again",
+    "perfect experience", "delicious", "superb service"
+]
+NEG_PHRASES = [
+    "terrible experience", "do not recommend", "one star", "never coming back",
+    "awful", "horrible service", "very disappointing"
+]
+NEUTRAL_PHRASES = [
+    "it was okay", "average", "nothing special", "decent for the price",
+    "not bad", "could be better"
+]
 
 
-def make_synthetic_sample(n: int = 200) -> List[Dict]:
+def make_synthetic_sample(n: int = 200, seed: Optional[int] = None) -> List[Dict]:
     """Create a synthetic list of reviews with ground-truth stars.
-    Designed to be small and diverse without external data.
+    Designed to be small and diverse without external data. The same seed
+    gives the same samples.
     """
-    pos_phrases = [
-        "absolutely loved it", "highly recommend", "five stars", "will come again",
-        "perfect experience", "delicious", "superb service"
-    ]
-    neg_phrases = [
-        "terrible experience", "do not recommend", "one star", "never coming back",
-        "awful", "horrible service", "very disappointing"
-    ]
-    neutral_phrases = [
-        "it was okay", "average", "nothing special", "decent for the price",
-        "not bad", "could be better"
-    ]
+    rng = random.Random(seed)
 
     samples = []
     for i in range(n):
-        star = random.choices([1,2,3,4,5], weights=[10,10,20,30,30], k=1)[0]
+        star = rng.choices([1,2,3,4,5], weights=[10,10,20,30,30], k=1)[0]
         if star >= 4:
-            text = f"{random.choice(pos_phrases)} — the meal was great and staff were friendly."
+            text = f"{rng.choice(POS_PHRASES)} — the meal was great and staff were friendly."
         elif star == 3:
-            text = f"{random.choice(neutral_phrases)} — the food was okay but service slow."
+            text = f"{rng.choice(NEUTRAL_PHRASES)} — the food was okay but service slow."
         else:
-            text = f"{random.choice(neg_phrases)} — I had a bad time and won't recommend."
+            text = f"{rng.choice(NEG_PHRASES)} — I had a bad time and won't recommend."
         samples.append({"id": i + 1, "review": text, "stars": star})
     return samples
 
@@ -87,27 +110,133 @@ def cot_prompt(review: str) -> str:
     )
 
 
-def call_llm(prompt: str, model: str = "gemini-1.5-flash", timeout: int = 15) -> Tuple[bool, str]:
+class TokenBucket:
+    """Thread-safe token bucket: `rate_per_minute` requests, bursts up to `capacity`."""
+
+    def __init__(self, rate_per_minute: float, capacity: int = 1):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_models: Dict[str, object] = {}
+_models_lock = threading.Lock()
+
+
+def get_model(model: str):
+    """Configure the SDK once and reuse one GenerativeModel per model name."""
+    import google.generativeai as genai
+
+    with _models_lock:
+        if model not in _models:
+            if not _models:
+                genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
+            _models[model] = genai.GenerativeModel(model)
+        return _models[model]
+
+
+def call_llm(
+    prompt: str,
+    model: str = DEFAULT_MODEL,
+    timeout: int = 15,
+    limiter: Optional[TokenBucket] = None,
+    max_retries: int = 4,
+    backoff: float = 1.0,
+) -> Tuple[bool, str]:
     """Call Google Gemini API if available. Returns (ok, text).
     If genai package or API key missing, returns (False, '')
+    Failed calls (quota errors, timeouts) are retried up to `max_retries`
+    times with exponential backoff and jitter; every attempt waits on `limiter`.
     """
     api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key or genai is None:
+    if not api_key or not genai_available():
         return False, ""
-    genai.configure(api_key=api_key)
-    try:
-        model_obj = genai.GenerativeModel(model)
-        resp = model_obj.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                max_output_tokens=256,
-                temperature=0.2,
+    import google.generativeai as genai
+
+    model_obj = get_model(model)
+    error = ""
+    for attempt in range(max_retries + 1):
+        if attempt:
+            time.sleep(min(30.0, backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            resp = model_obj.generate_content(
+                prompt,
+                generation_config=genai.types.GenerationConfig(**GENERATION_CONFIG),
+                request_options={"timeout": timeout},
             )
-        )
-        text = resp.text.strip()
-        return True, text
-    except Exception as e:
-        return False, str(e)
+            text = resp.text.strip()
+            return True, text
+        except Exception as e:
+            error = str(e)
+    return False, error
+
+
+def simulate_llm(prompt: str) -> Tuple[bool, str]:
+    """Offline stand-in for the model: like a real one it only sees the prompt.
+    Guesses from the review's wording with noise seeded by the prompt, so the
+    same prompt always gets the same answer."""
+    review = prompt.rsplit('Review: "', 1)[-1].split('"', 1)[0].lower()
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+    if any(p in review for p in POS_PHRASES):
+        stars = rng.choice([3, 4, 4, 5, 5])
+    elif any(p in review for p in NEG_PHRASES):
+        stars = rng.choice([1, 1, 2, 2, 3])
+    else:
+        stars = rng.choice([2, 3, 3, 3, 4])
+    return True, json.dumps({"predicted_stars": stars, "explanation": "(simulated) short justification"})
+
+
+def prompt_key(prompt: str, model: str, config: Dict) -> str:
+    """Results-store key: identical prompts under the same model and config share an output."""
+    payload = json.dumps({"model": model, "config": config, "prompt": prompt}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    """Append-only JSONL map of prompt key -> model output, shared by strategies and runs.
+
+    Only successful calls are stored, so failures are retried on the next run.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.outputs: Dict[str, str] = {}
+        if path.exists():
+            with path.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # partial line from an interrupted write
+                    self.outputs[record["key"]] = record["output"]
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            return self.outputs.get(key)
+
+    def put(self, key: str, output: str) -> None:
+        with self.lock:
+            self.outputs[key] = output
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "output": output}) + "\n")
 
 
 def parse_json_from_text(text: str) -> Tuple[bool, Dict]:
@@ -131,43 +260,82 @@ def parse_json_from_text(text: str) -> Tuple[bool, Dict]:
         return False, {"error": "no json found", "raw": text}
 
 
-def run_strategy(name: str, prompt_fn, samples: List[Dict], use_llm: bool) -> Dict:
-    results = []
+def result_from_output(s: Dict, ok: bool, out: str) -> Dict:
+    """Per-sample result row from the (shared) output of its prompt."""
+    if ok:
+        valid, obj = parse_json_from_text(out)
+        if valid and isinstance(obj, dict) and "predicted_stars" in obj:
+            pred = int(obj["predicted_stars"])
+            explanation = obj.get("explanation", "")
+            json_valid = True
+        else:
+            pred = None
+            explanation = out
+            json_valid = False
+    else:
+        pred = None
+        explanation = out
+        json_valid = False
+
+    return {
+        "id": s["id"],
+        "review": s["review"],
+        "gold": s["stars"],
+        "predicted": pred,
+        "json_valid": json_valid,
+        "explanation": explanation,
+    }
+
+
+def run_strategy(
+    name: str,
+    prompt_fn,
+    samples: List[Dict],
+    use_llm: bool,
+    store: ResultStore,
+    workers: int = 8,
+    limiter: Optional[TokenBucket] = None,
+    max_retries: int = 4,
+) -> Dict:
+    model = DEFAULT_MODEL if use_llm else "simulated"
+    by_key: Dict[str, str] = {}
     for s in samples:
         prompt = prompt_fn(s["review"])
+        by_key.setdefault(prompt_key(prompt, model, GENERATION_CONFIG), prompt)
+
+    outputs: Dict[str, Tuple[bool, str]] = {}
+    for key in by_key:
+        cached = store.get(key)
+        if cached is not None:
+            outputs[key] = (True, cached)
+    todo = [key for key in by_key if key not in outputs]
+    print(f"  {len(samples)} samples, {len(by_key)} unique prompts, {len(todo)} to evaluate")
+
+    def evaluate(key: str) -> Tuple[bool, str]:
         if use_llm:
-            ok, out = call_llm(prompt)
+            return call_llm(by_key[key], model=model, limiter=limiter, max_retries=max_retries)
+        return simulate_llm(by_key[key])
+
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(evaluate, key): key for key in todo}
+        for i, future in enumerate(as_completed(futures), 1):
+            key = futures[future]
+            ok, out = future.result()
+            outputs[key] = (ok, out)
             if ok:
-                valid, obj = parse_json_from_text(out)
-                if valid and isinstance(obj, dict) and "predicted_stars" in obj:
-                    pred = int(obj["predicted_stars"])
-                    explanation = obj.get("explanation", "")
-                    json_valid = True
-                else:
-                    pred = None
-                    explanation = out
-                    json_valid = False
+                store.put(key, out)
             else:
-                pred = None
-                explanation = out
-                json_valid = False
-        else:
-            # simulation: small noisy mapping from ground truth
-            gt = s["stars"]
-            pred = max(1, min(5, gt + random.choice([-1, 0, 1])))
-            explanation = "(simulated) short justification"
-            json_valid = True
+                failed += 1
+            if i % 50 == 0 or i == len(futures):
+                print(f"  {i}/{len(futures)} evaluated")
 
-        results.append(
-            {
-                "id": s["id"],
-                "review": s["review"],
-                "gold": s["stars"],
-                "predicted": pred,
-                "json_valid": json_valid,
-                "explanation": explanation,
-            }
-        )
+    if failed:
+        print(f"  {failed} prompts failed after retries; run again to retry them")
+    results = [
+        result_from_output(s, *outputs[prompt_key(prompt_fn(s["review"]), model, GENERATION_CONFIG)])
+        for s in samples
+    ]
 
     # write CSV
     out_file = OUTDIR / f"results_{name}.csv"
@@ -182,12 +350,30 @@ def run_strategy(name: str, prompt_fn, samples: List[Dict], use_llm: bool) -> Di
     accuracy = sum(1 for r in valid_preds if r["predicted"] == r["gold"]) / max(1, len(results))
     json_rate = sum(1 for r in results if r["json_valid"]) / max(1, len(results))
 
-    return {"strategy": name, "accuracy": accuracy, "json_rate": json_rate, "n": len(results), "outfile": str(out_file)}
+    return {
+        "strategy": name,
+        "accuracy": accuracy,
+        "json_rate": json_rate,
+        "n": len(results),
+        "unique_prompts": len(by_key),
+        "llm_calls": len(todo),
+        # share of samples answered without a new call (deduplicated or stored)
+        "cache_hit_rate": 1 - len(todo) / max(1, len(samples)),
+        "failed": failed,
+        "outfile": str(out_file),
+    }
 
 
-def main(n: int = 200):
-    samples = make_synthetic_sample(n)
-    use_llm = bool(os.environ.get("GEMINI_API_KEY")) and genai is not None
+def main(
+    n: int = 200,
+    workers: int = 8,
+    rpm: float = 60,
+    max_retries: int = 4,
+    seed: Optional[int] = 42,
+    fresh: bool = False,
+):
+    samples = make_synthetic_sample(n, seed)
+    use_llm = bool(os.environ.get("GEMINI_API_KEY")) and genai_available()
     if use_llm:
         print("GEMINI_API_KEY found — running real LLM calls (be aware of usage costs).")
     else:
@@ -198,14 +384,22 @@ def main(n: int = 200):
         ("few_shot", few_shot_prompt),
         ("chain_of_thought", cot_prompt),
     ]
+    # One bucket for the whole run: the quota is per API key, not per strategy.
+    limiter = TokenBucket(rpm, capacity=workers) if use_llm else None
+    if fresh:
+        RESULT_STORE.unlink(missing_ok=True)
+    store = ResultStore(RESULT_STORE)
 
     summaries = []
     for name, fn in strategies:
         print("Running strategy:", name)
-        summ = run_strategy(name, fn, samples, use_llm)
+        summ = run_strategy(name, fn, samples, use_llm, store, workers, limiter, max_retries)
         summaries.append(summ)
         print(summ)
 
+    llm_calls = sum(summ["llm_calls"] for summ in summaries)
+    print(f"Cache hit rate: {1 - llm_calls / max(1, n * len(strategies)):.1%} ({llm_calls} LLM calls)")
+
     # write brief summary file
     summary_fp = OUTDIR / "summary.json"
     summary_fp.write_text(json.dumps(summaries, indent=2), encoding="utf-8")
@@ -213,4 +407,12 @@ def main(n: int = 200):
 
 
 if __name__ == "__main__":
-    main(200)
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=200, help="number of synthetic samples")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent requests")
+    parser.add_argument("--rpm", type=float, default=60, help="API requests per minute (quota)")
+    parser.add_argument("--max-retries", type=int, default=4, help="retries per failed call")
+    parser.add_argument("--seed", type=int, default=42, help="sample seed")
+    parser.add_argument("--fresh", action="store_true", help="discard stored prompt results first")
+    args = parser.parse_args()
+    main(args.n, args.workers, args.rpm, args.max_retries, args.seed, args.fresh)
@@ -0,0 +1,237 @@
+"""Local fast path for recommended actions: a hashed bag-of-words linear classifier.
+
+Most reviews need one of a few routine actions ("5 stars, great!" -> share the
+praise), yet every one used to cost an LLM call. This model sorts a review into
+one of the ACTIONS categories from its rating and words. When it is at least
+ACTION_CLASSIFIER_MIN_CONFIDENCE sure, llm_service uses the category's action
+and skips the LLM for it; otherwise the LLM writes the action as before.
+
+Features are unigrams, bigrams and the rating, hashed into n_features buckets
+(no vocabulary to store), with one softmax weight row per bucket. Prediction is
+a few dozen row lookups, i.e. microseconds.
+
+Training labels come from the actions the LLM already wrote: each stored
+ai_recommended_action of an LLM-enriched submission is mapped to a category by
+keyword (label_action), and ambiguous ones are skipped. Train with
+
+    python src/backend/action_classifier.py train
+
+which saves the model to ACTION_CLASSIFIER_PATH; without a model file every
+action goes to the LLM. benchmarks/eval_action_classifier.py reports
+agreement with the LLM and the share of calls avoided per threshold.
+"""
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import database
+import metrics
+
+ACTION_CLASSIFIER_PATH = Path(
+    os.environ.get("ACTION_CLASSIFIER_PATH") or Path(__file__).parent / "action_classifier.npz"
+)
+ACTION_CLASSIFIER_MIN_CONFIDENCE = float(os.environ.get("ACTION_CLASSIFIER_MIN_CONFIDENCE", "0.9"))
+DEFAULT_FEATURES = 1 << 16
+
+# Category -> the action text used when the local model (or the rating rule) decides.
+ACTIONS = {
+    "follow_up": "Priority follow-up required. Contact customer within 24 hours.",
+    "improve": "Monitor for patterns. Consider process improvements.",
+    "share_praise": "Positive feedback. Share with team.",
+}
+_TEMPLATES = frozenset(ACTIONS.values())
+
+# Word stems that mark which category an LLM-written action belongs to.
+_ACTION_KEYWORDS = {
+    "follow_up": (
+        "contact", "reach out", "call the", "apolog", "refund", "compensat", "replace",
+        "follow up", "follow-up", "escalat", "make it right", "voucher", "credit",
+    ),
+    "improve": (
+        "monitor", "investigat", "train", "improv", "assess", "audit", "process",
+        "procedure", "look into", "evaluat", "streamline", "fix",
+    ),
+    "share_praise": (
+        "share", "thank", "recogni", "prais", "commend", "celebrat", "highlight",
+        "reward", "testimonial", "keep up", "maintain", "showcase",
+    ),
+}
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+
+
+def rating_rule(rating: int) -> str:
+    """Category chosen from the rating alone (the template fallback's rule)."""
+    if rating <= 2:
+        return "follow_up"
+    if rating == 3:
+        return "improve"
+    return "share_praise"
+
+
+def label_action(action_text: str) -> Optional[str]:
+    """Category of an LLM-written action by keyword, or None if no single category wins."""
+    text = action_text.lower()
+    scores = {
+        category: sum(keyword in text for keyword in keywords)
+        for category, keywords in _ACTION_KEYWORDS.items()
+    }
+    best = max(scores.values())
+    winners = [category for category, score in scores.items() if score == best]
+    return winners[0] if best > 0 and len(winners) == 1 else None
+
+
+class HashedLinearClassifier:
+    """Multinomial logistic regression over hashed binary unigram/bigram/rating features."""
+
+    def __init__(self, classes: Sequence[str] = tuple(ACTIONS), n_features: int = DEFAULT_FEATURES):
+        self.classes = list(classes)
+        self.n_features = n_features
+        self.weights = np.zeros((n_features, len(self.classes)), dtype=np.float32)
+        self.bias = np.zeros(len(self.classes), dtype=np.float32)
+        self.metadata: Dict = {}
+
+    def features(self, rating: int, review: str) -> np.ndarray:
+        words = _TOKEN.findall(review.lower())
+        tokens = [f"rating={rating}", *words, *(f"{a} {b}" for a, b in zip(words, words[1:]))]
+        return np.fromiter(
+            {zlib.crc32(token.encode("utf-8")) % self.n_features for token in tokens}, dtype=np.int64
+        )
+
+    def _probabilities(self, features: np.ndarray) -> np.ndarray:
+        scores = self.weights[features].sum(axis=0) + self.bias
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    def predict(self, rating: int, review: str) -> Tuple[str, float]:
+        """(category, probability) of the most likely category."""
+        probabilities = self._probabilities(self.features(rating, review))
+        best = int(probabilities.argmax())
+        return self.classes[best], float(probabilities[best])
+
+    def fit(self, examples: Sequence[Tuple[int, str, str]], epochs: int = 5,
+            learning_rate: float = 0.5, l2: float = 1e-5, seed: int = 0) -> "HashedLinearClassifier":
+        """Train on (rating, review, category) examples with plain SGD."""
+        data = [(self.features(rating, review), self.classes.index(category))
+                for rating, review, category in examples]
+        rng = random.Random(seed)
+        for epoch in range(epochs):
+            rng.shuffle(data)
+            rate = learning_rate / (1 + epoch)
+            for features, target in data:
+                gradient = self._probabilities(features)
+                gradient[target] -= 1.0
+                rows = self.weights[features]
+                self.weights[features] = rows - rate * (gradient + l2 * rows)
+                self.bias -= rate * gradient
+        self.metadata = {
+            "examples": len(data),
+            "epochs": epochs,
+            "trained_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        return self
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.parent / f".{path.name}.tmp.npz"
+        np.savez_compressed(
+            tmp, weights=self.weights, bias=self.bias, classes=np.array(self.classes),
+            metadata=np.array(json.dumps(self.metadata)),
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "HashedLinearClassifier":
+        with np.load(path, allow_pickle=False) as data:
+            classifier = cls([str(c) for c in data["classes"]], n_features=data["weights"].shape[0])
+            classifier.weights = data["weights"]
+            classifier.bias = data["bias"]
+            classifier.metadata = json.loads(str(data["metadata"]))
+        return classifier
+
+
+_classifier: Optional[HashedLinearClassifier] = None
+_loaded = False
+_classifier_lock = threading.Lock()
+
+
+def get_classifier() -> Optional[HashedLinearClassifier]:
+    """The process-wide model, loaded from ACTION_CLASSIFIER_PATH on first use (None if absent)."""
+    global _classifier, _loaded
+    if not _loaded:
+        with _classifier_lock:
+            if not _loaded:
+                if ACTION_CLASSIFIER_PATH.exists():
+                    _classifier = HashedLinearClassifier.load(ACTION_CLASSIFIER_PATH)
+                _loaded = True
+    return _classifier
+
+
+def set_classifier(classifier: Optional[HashedLinearClassifier]):
+    """Use `classifier` from now on (None turns the fast path off)."""
+    global _classifier, _loaded
+    with _classifier_lock:
+        _classifier, _loaded = classifier, True
+
+
+def classify(rating: int, review: str) -> Optional[str]:
+    """The action text when the local model is confident enough, else None (ask the LLM)."""
+    classifier = get_classifier()
+    if classifier is None:
+        return None
+    category, confidence = classifier.predict(rating, review)
+    if confidence < ACTION_CLASSIFIER_MIN_CONFIDENCE:
+        metrics.ACTION_CLASSIFIER_DECISIONS.inc(outcome="llm")
+        return None
+    metrics.ACTION_CLASSIFIER_DECISIONS.inc(outcome="local")
+    return ACTIONS[category]
+
+
+def load_examples(limit: Optional[int] = None) -> List[Tuple[int, int, str, str]]:
+    """(id, rating, review, category) for stored LLM-written actions that have a clear label, oldest first."""
+    examples = []
+    for chunk in database.iter_submissions(chunk_size=5000):
+        for row in chunk:
+            # Only "complete" rows carry LLM output, and template actions (fallbacks or this
+            # classifier's own answers) must not teach the model.
+            action = row["ai_recommended_action"]
+            if row["enrichment_status"] != "complete" or not action or action in _TEMPLATES:
+                continue
+            category = label_action(action)
+            if category is not None:
+                examples.append((row["id"], row["rating"], row["review"], category))
+        if limit is not None and len(examples) >= limit:
+            return examples[:limit]
+    return examples
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the local recommended-action classifier from stored submissions.")
+    parser.add_argument("command", choices=["train"])
+    parser.add_argument("--out", type=Path, default=ACTION_CLASSIFIER_PATH)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--features", type=int, default=DEFAULT_FEATURES)
+    args = parser.parse_args()
+
+    database.init_db()
+    started = time.perf_counter()
+    examples = load_examples()
+    if not examples:
+        raise SystemExit("No LLM-labelled submissions to train on")
+    model = HashedLinearClassifier(n_features=args.features).fit(
+        [(rating, review, category) for _, rating, review, category in examples], epochs=args.epochs
+    )
+    model.save(args.out)
+    print(json.dumps({**model.metadata, "seconds": round(time.perf_counter() - started, 1), "path": str(args.out)}))
@@ -0,0 +1,243 @@
+"""Admission control for LLM-backed endpoints: bounded concurrency, a bounded
+wait queue and per-client rate limits.
+
+Sync endpoints run on the shared threadpool, so a burst of slow /api/submit
+calls could take every thread and starve health checks and admin reads. The
+middleware admits at most LLM_MAX_CONCURRENT LLM-backed requests at a time,
+and the threadpool is sized so that READ_RESERVED_THREADS threads are always
+left over for everything else. Requests beyond the limit wait on the event loop
+(holding no thread) in a queue of at most LLM_MAX_QUEUE, for at most
+LLM_QUEUE_TIMEOUT_SECONDS. Anything beyond that gets a fast 503.
+
+Each client (by IP, or the first X-Forwarded-For hop when
+RATE_LIMIT_TRUST_FORWARDED is set) also has a token bucket of
+CLIENT_RATE_PER_MINUTE LLM-backed requests with bursts of CLIENT_BURST. Going
+over it gets a 429. A batch costs one token per multi-review prompt it needs
+(items / LLM_BATCH_SIZE, rounded up); a batch bigger than the burst is let in
+when the bucket is full and leaves it in debt. Both rejections carry Retry-After.
+
+A slot is released only once the response body has been fully sent, so
+streaming replies count for as long as they hold a thread.
+"""
+import asyncio
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import anyio
+from starlette.responses import JSONResponse
+
+import llm_service
+import metrics
+
+BATCH_PATH = "/api/submit/batch"
+LLM_PATHS = ("/api/submit", "/api/submit/stream", BATCH_PATH)
+
+LLM_MAX_CONCURRENT = int(os.environ.get("LLM_MAX_CONCURRENT", "16"))
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "64"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+READ_RESERVED_THREADS = int(os.environ.get("READ_RESERVED_THREADS", "8"))
+THREADPOOL_SIZE = int(os.environ.get("THREADPOOL_SIZE", "40"))
+CLIENT_RATE_PER_MINUTE = float(os.environ.get("CLIENT_RATE_PER_MINUTE", "60"))
+CLIENT_BURST = int(os.environ.get("CLIENT_BURST", "20"))
+RATE_LIMIT_TRUST_FORWARDED = os.environ.get("RATE_LIMIT_TRUST_FORWARDED", "").lower() in ("1", "true", "yes")
+BUSY_RETRY_AFTER_SECONDS = int(os.environ.get("ADMISSION_RETRY_AFTER_SECONDS", "5"))
+MAX_TRACKED_CLIENTS = 10000
+
+
+class ClientRateLimiter:
+    """Per-client token buckets (least recently seen clients are forgotten past a cap)."""
+
+    def __init__(self, rate_per_minute: float, burst: int, max_clients: int = MAX_TRACKED_CLIENTS):
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, client: str, cost: float = 1.0) -> float:
+        """Take `cost` tokens for `client`. Returns 0 if allowed, else seconds until they are available.
+
+        A cost above the burst is allowed once the bucket is full and leaves it
+        negative, so the client waits until the whole cost has been refilled.
+        """
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        needed = min(cost, float(self.burst))
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if tokens >= needed:
+                tokens -= cost
+            else:
+                wait = (needed - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            while len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class AdmissionController:
+    """Concurrency limit plus bounded wait queue for LLM-backed requests."""
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float,
+                 rate_limiter: Optional[ClientRateLimiter] = None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.rate_limiter = rate_limiter
+        self.active = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created on first use, inside the server's event loop.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+
+    async def acquire(self) -> bool:
+        """Wait for a slot. False when the queue is full or the wait timed out."""
+        semaphore = self._get_semaphore()
+        if semaphore.locked() and self.waiting >= self.max_queue:
+            metrics.ADMISSION_REJECTIONS.inc(reason="queue_full")
+            return False
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            metrics.ADMISSION_REJECTIONS.inc(reason="queue_timeout")
+            return False
+        finally:
+            self.waiting -= 1
+            metrics.ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - started)
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._get_semaphore().release()
+
+    def snapshot(self) -> Dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+        }
+
+
+def controller_from_env() -> AdmissionController:
+    return AdmissionController(
+        LLM_MAX_CONCURRENT,
+        LLM_MAX_QUEUE,
+        LLM_QUEUE_TIMEOUT_SECONDS,
+        ClientRateLimiter(CLIENT_RATE_PER_MINUTE, CLIENT_BURST),
+    )
+
+
+controller = controller_from_env()
+
+
+def configure_threadpool():
+    """Size the sync-endpoint threadpool so READ_RESERVED_THREADS stay free of LLM work.
+
+    Call from inside the running event loop (e.g. the app lifespan).
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(THREADPOOL_SIZE, controller.max_concurrent + READ_RESERVED_THREADS)
+
+
+def client_id(scope) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        for name, value in scope.get("headers", ()):
+            if name == b"x-forwarded-for":
+                return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def batch_cost(body: bytes) -> int:
+    """Rate-limit tokens for a batch body: one per multi-review LLM prompt it needs."""
+    try:
+        items = json.loads(body).get("items")
+    except (ValueError, AttributeError):
+        return 1  # rejected by validation anyway
+    count = len(items) if isinstance(items, list) else 0
+    return max(1, math.ceil(count / llm_service.BATCH_SIZE))
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+def _replay(body: bytes, receive):
+    """A receive callable that yields the already-read body first."""
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
+
+
+def _reject(status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying `controller` to POSTs on LLM_PATHS."""
+
+    def __init__(self, app, admission: Optional[AdmissionController] = None):
+        self.app = app
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in LLM_PATHS:
+            await self.app(scope, receive, send)
+            return
+        admission = self.admission or controller
+
+        if admission.rate_limiter is not None:
+            cost = 1
+            if scope["path"] == BATCH_PATH:
+                body = await _read_body(receive)
+                cost = batch_cost(body)
+                receive = _replay(body, receive)
+            wait = admission.rate_limiter.acquire(client_id(scope), cost)
+            if wait > 0:
+                metrics.ADMISSION_REJECTIONS.inc(reason="rate_limited")
+                await _reject(429, "Rate limit exceeded; slow down", wait)(scope, receive, send)
+                return
+
+        if not await admission.acquire():
+            await _reject(503, "Server busy; retry later", BUSY_RETRY_AFTER_SECONDS)(scope, receive, send)
+            return
+        try:
+            # Returns once the whole body (including a stream) has been sent.
+            await self.app(scope, receive, send)
+        finally:
+            admission.release()
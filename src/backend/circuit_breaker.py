@@ -0,0 +1,90 @@
+"""Circuit breaker used to stop calling a failing dependency (the LLM API).
+
+closed    -> calls go through; consecutive failures are counted.
+open      -> calls are rejected immediately until reset_seconds have passed.
+half_open -> one trial call is let through; success closes the breaker,
+             failure opens it again.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self._trips = 0
+        self._rejected = 0
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed now."""
+        with self._lock:
+            if self._state == "closed":
+                return True
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._state = "half_open"
+                self._probe_in_flight = False
+            if self._state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != "closed":
+                logger.info("Circuit breaker %s closed", self.name)
+            self._state = "closed"
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == "half_open" or self._failures >= self.failure_threshold:
+                if self._state != "open":
+                    self._trips += 1
+                    logger.warning(
+                        "Circuit breaker %s opened after %d consecutive failures",
+                        self.name, self._failures,
+                    )
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release_probe(self):
+        """Give up a half-open probe without a verdict (the caller went away mid-call)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def reset(self):
+        """Force the breaker closed (used in tests and by operators)."""
+        self.record_success()
+
+    def snapshot(self) -> Dict:
+        """Current state for monitoring endpoints."""
+        with self._lock:
+            retry_in = None
+            if self._state == "open":
+                retry_in = round(max(0.0, self.reset_seconds - (time.monotonic() - self._opened_at)), 2)
+            return {
+                "name": self.name,
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "failure_threshold": self.failure_threshold,
+                "trips": self._trips,
+                "rejected_calls": self._rejected,
+                "retry_in_seconds": retry_in,
+            }
@@ -1,100 +1,952 @@
 """Database layer for Task 2 - manages SQLite submissions storage."""
 import sqlite3
 import json
+import queue
+import random
+from concurrent.futures import Future
 from pathlib import Path
-from datetime import datetime
-from typing import List, Dict, Optional
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional
 import threading
+import time
+import os
+import re
+import weakref
 
-DB_PATH = Path(__file__).parent / "submissions.db"
+import metrics
+
+# FEEDBACK_DB_PATH points the app at another database file (benchmarks, deployments).
+DB_PATH = Path(os.environ.get("FEEDBACK_DB_PATH") or Path(__file__).parent / "submissions.db")
+
+# SQLite allows many concurrent readers in WAL mode but only one writer. Reads
+# run on their own pooled connection; writes go through the writer thread below
+# (_write), and this lock only serializes schema migrations within a process.
 _lock = threading.Lock()
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool: List[sqlite3.Connection] = []
+_generation = 0
 
+FTS_AVAILABLE = False
 
-def init_db():
-    """Initialize the database with submissions table."""
-    with _lock:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS submissions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                rating INTEGER NOT NULL,
-                review TEXT NOT NULL,
-                ai_response TEXT,
-                ai_summary TEXT,
-                ai_recommended_action TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA foreign_keys=ON",
+)
+
+
+def _connect() -> sqlite3.Connection:
+    """Open a new connection to DB_PATH with the tuned pragmas applied."""
+    # Each connection is only ever used by the thread that opened it;
+    # check_same_thread is relaxed so close_connections() can close it.
+    conn = sqlite3.connect(str(DB_PATH), timeout=5.0, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+
+class _ThreadConnection:
+    """A thread's connection, closed when the thread exits and its locals are dropped.
+
+    Server threadpools retire idle threads, so without this every burst of
+    traffic after a quiet spell would leave another set of open connections.
+    """
+
+    __slots__ = ("conn", "key", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection, key: tuple):
+        self.conn = conn
+        self.key = key
+        weakref.finalize(self, _discard, conn)
+
+
+def get_connection() -> sqlite3.Connection:
+    """Return this thread's reusable connection, opening it on first use.
+
+    Connections are keyed by thread and by DB_PATH, so pointing DB_PATH at a
+    different file (e.g. in tests) transparently opens a fresh connection.
+    """
+    holder = getattr(_local, "holder", None)
+    key = (str(DB_PATH), _generation)
+    if holder is not None and holder.key == key:
+        return holder.conn
+    if holder is not None:
+        _discard(holder.conn)
+    conn = _connect()
+    _local.holder = _ThreadConnection(conn, key)
+    with _pool_lock:
+        _pool.append(conn)
+    return conn
+
+
+def _discard(conn: sqlite3.Connection):
+    """Close a pooled connection and forget about it."""
+    with _pool_lock:
+        if conn in _pool:
+            _pool.remove(conn)
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+def close_connections():
+    """Close every pooled connection (all threads). Used on shutdown and in tests."""
+    global _generation
+    with _pool_lock:
+        conns = list(_pool)
+        _pool.clear()
+        # Bumping the generation makes other threads reconnect instead of
+        # reusing the connection closed underneath them.
+        _generation += 1
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _local.holder = None
+
+
+# All writes in a process go through one writer thread. It takes every job
+# queued so far (at most DB_WRITE_BATCH_MAX, waiting up to DB_WRITE_BATCH_DELAY_MS
+# for more) and applies them in a single BEGIN IMMEDIATE transaction, one
+# SAVEPOINT per job, so a failing job only rolls back itself. One COMMIT per
+# batch instead of per row (group commit) makes each process take SQLite's
+# write lock once per batch. The writer is per process, not shared: with several
+# worker processes their writers still take turns on the file lock (BEGIN
+# IMMEDIATE is retried for up to DB_WRITE_BUSY_TIMEOUT_SECONDS), so "database is
+# locked" errors are gone but total write throughput does not grow with workers.
+DB_WRITE_BATCH_MAX = int(os.environ.get("DB_WRITE_BATCH_MAX", "64"))
+DB_WRITE_BATCH_DELAY_MS = float(os.environ.get("DB_WRITE_BATCH_DELAY_MS", "0"))
+DB_WRITE_BUSY_TIMEOUT_SECONDS = float(os.environ.get("DB_WRITE_BUSY_TIMEOUT_SECONDS", "30"))
+
+
+class _WriteJob:
+    """One caller's write: fn(conn) runs on the writer thread; the result comes back via future."""
+
+    __slots__ = ("fn", "future", "queued_at", "waited", "commit_seconds")
+
+    def __init__(self, fn: Callable[[sqlite3.Connection], Any]):
+        self.fn = fn
+        self.future: Future = Future()
+        self.queued_at = time.perf_counter()
+        self.waited = 0.0
+        self.commit_seconds = 0.0
+
+
+class _GroupCommitWriter:
+    """The process's single writer thread, started on first use."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[_WriteJob]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, fn: Callable[[sqlite3.Connection], Any]) -> _WriteJob:
+        if self._thread is None or not self._thread.is_alive():
+            with self._start_lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                    self._thread.start()
+        job = _WriteJob(fn)
+        self._queue.put(job)
+        return job
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            # Whatever queued up during the previous commit joins this one; optionally
+            # linger up to DB_WRITE_BATCH_DELAY_MS for more.
+            deadline = time.perf_counter() + DB_WRITE_BATCH_DELAY_MS / 1000
+            while len(batch) < DB_WRITE_BATCH_MAX:
+                try:
+                    remaining = deadline - time.perf_counter()
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._apply(batch)
+
+    def _apply(self, batch: List[_WriteJob]):
+        # Nothing may escape: it would end the writer thread and leave callers
+        # waiting on their futures forever.
+        try:
+            self._apply_batch(batch)
+            error: Exception = RuntimeError("Write was not applied")
+        except Exception as e:
+            error = e
+        for job in batch:
+            if not job.future.done():
+                job.future.set_exception(error)
+
+    def _apply_batch(self, batch: List[_WriteJob]):
+        outcomes = []
+        conn = None
+        try:
+            conn = get_connection()
+            _begin_immediate(conn)
+            began = time.perf_counter()
+            for job in batch:
+                conn.execute("SAVEPOINT write_job")
+                try:
+                    outcomes.append((job, job.fn(conn), None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_job")
+                    outcomes.append((job, None, e))
+                conn.execute("RELEASE write_job")
+            committing = time.perf_counter()
+            conn.commit()
+            committed = time.perf_counter() - committing
+        except Exception as e:
+            # The transaction itself failed (e.g. still locked after the busy timeout,
+            # or the connection was closed underneath the writer).
+            try:
+                if conn is not None and conn.in_transaction:
+                    conn.rollback()
+            except sqlite3.Error:
+                pass
+            for job in batch:
+                job.future.set_exception(e)
+            return
+        metrics.DB_WRITE_BATCH_SIZE.observe(len(batch))
+        metrics.DB_COMMIT_SECONDS.observe(committed)
+        for job, result, error in outcomes:
+            job.waited = began - job.queued_at
+            job.commit_seconds = committed
+            metrics.DB_LOCK_WAIT_SECONDS.observe(job.waited)
+            if error is None:
+                job.future.set_result(result)
+            else:
+                job.future.set_exception(error)
+
+
+def _begin_immediate(conn: sqlite3.Connection):
+    """Take the write lock, retrying with backoff while another process holds it."""
+    deadline = time.perf_counter() + DB_WRITE_BUSY_TIMEOUT_SECONDS
+    delay = 0.005
+    while True:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            busy = "locked" in str(e) or "busy" in str(e)
+            if not busy or time.perf_counter() >= deadline:
+                raise
+            metrics.DB_BUSY_RETRIES.inc()
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay = min(delay * 2, 0.25)
+
+
+_writer = _GroupCommitWriter()
+
+
+def _write(fn: Callable[[sqlite3.Connection], Any]) -> Any:
+    """Run fn(conn) in the writer's next transaction and return its result (or raise its error).
+
+    fn must only use the connection it is given and must not commit.
+    Returns once the transaction holding the write has committed.
+    """
+    job = _writer.submit(fn)
+    result = job.future.result()
+    metrics.record_stage("db.lock_wait", job.waited)
+    metrics.record_stage("db.commit", job.commit_seconds)
+    return result
+
+
+# Times every public database function (labelled by name) and, for list
+# results, how many rows it returned.
+_timed = metrics.timed(metrics.DB_QUERY_SECONDS, "db", rows=metrics.DB_ROWS_RETURNED)
+
+
+def _execute_script(conn: sqlite3.Connection, script: str):
+    """Run several statements inside the current transaction.
+
+    Unlike conn.executescript(), this does not COMMIT first, so a migration
+    stays atomic and keeps the write lock until init_db() commits it.
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+    if statement.strip():
+        conn.execute(statement)
+
+
+def _create_signature_table(conn: sqlite3.Connection):
+    """MinHash signatures of indexed reviews, so the near-duplicate index survives restarts.
+
+    `scheme` names the shingling/permutation settings a signature was built
+    with; signatures from other settings are ignored on load.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS review_signatures (
+            submission_id INTEGER PRIMARY KEY REFERENCES submissions(id) ON DELETE CASCADE,
+            scheme TEXT NOT NULL,
+            signature BLOB NOT NULL
+        )
+    """)
+
+
+def _create_revision_counter(conn: sqlite3.Connection):
+    """Single-row counter bumped by every write to submissions.
+
+    It changes whenever any listing or analytics result could change, so the
+    API can use it as a cheap ETag; triggers keep it correct across processes.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS data_revision (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            revision INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO data_revision (id, revision) VALUES (1, 0)")
+    _execute_script(conn, """
+        CREATE TRIGGER IF NOT EXISTS trg_revision_insert AFTER INSERT ON submissions
+        BEGIN
+            UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_revision_update AFTER UPDATE ON submissions
+        BEGIN
+            UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_revision_delete AFTER DELETE ON submissions
+        BEGIN
+            UPDATE data_revision SET revision = revision + 1 WHERE id = 1;
+        END;
+    """)
+
+
+def _create_search_index(conn: sqlite3.Connection):
+    """Create the FTS5 index over review and ai_summary, synced by triggers.
+
+    The index is an external-content table, so the text is stored only once.
+    A newly created index is backfilled from the existing rows. Builds of
+    SQLite without FTS5 skip it and search_submissions() reports that.
+    """
+    global FTS_AVAILABLE
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'submissions_fts'"
+    ).fetchone()
+    try:
+        conn.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS submissions_fts USING fts5(
+                review, ai_summary,
+                content = 'submissions', content_rowid = 'id',
+                tokenize = 'porter unicode61'
             )
         """)
-        conn.commit()
-        conn.close()
+    except sqlite3.OperationalError:
+        FTS_AVAILABLE = False
+        return
+    FTS_AVAILABLE = True
+    _execute_script(conn, """
+        CREATE TRIGGER IF NOT EXISTS trg_fts_insert AFTER INSERT ON submissions
+        BEGIN
+            INSERT INTO submissions_fts (rowid, review, ai_summary)
+            VALUES (NEW.id, NEW.review, NEW.ai_summary);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_fts_delete AFTER DELETE ON submissions
+        BEGIN
+            INSERT INTO submissions_fts (submissions_fts, rowid, review, ai_summary)
+            VALUES ('delete', OLD.id, OLD.review, OLD.ai_summary);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_fts_update AFTER UPDATE OF review, ai_summary ON submissions
+        BEGIN
+            INSERT INTO submissions_fts (submissions_fts, rowid, review, ai_summary)
+            VALUES ('delete', OLD.id, OLD.review, OLD.ai_summary);
+            INSERT INTO submissions_fts (rowid, review, ai_summary)
+            VALUES (NEW.id, NEW.review, NEW.ai_summary);
+        END;
+    """)
+    if not exists:
+        conn.execute("INSERT INTO submissions_fts (submissions_fts) VALUES ('rebuild')")
+
+
+def _create_rollups(conn: sqlite3.Connection):
+    """Create the rating rollup table and the triggers that keep it current.
+
+    Triggers run inside the writing transaction, so the rollup can never drift
+    from the rows it counts. A newly created table is backfilled from the
+    existing submissions.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rating_rollup'"
+    ).fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rating_rollup (
+            rating INTEGER PRIMARY KEY,
+            submission_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    _execute_script(conn, """
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_insert AFTER INSERT ON submissions
+        BEGIN
+            INSERT INTO rating_rollup (rating, submission_count) VALUES (NEW.rating, 1)
+            ON CONFLICT (rating) DO UPDATE SET submission_count = submission_count + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_delete AFTER DELETE ON submissions
+        BEGIN
+            UPDATE rating_rollup SET submission_count = submission_count - 1
+            WHERE rating = OLD.rating;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS trg_rollup_update AFTER UPDATE OF rating ON submissions
+        WHEN OLD.rating != NEW.rating
+        BEGIN
+            UPDATE rating_rollup SET submission_count = submission_count - 1
+            WHERE rating = OLD.rating;
+            INSERT INTO rating_rollup (rating, submission_count) VALUES (NEW.rating, 1)
+            ON CONFLICT (rating) DO UPDATE SET submission_count = submission_count + 1;
+        END;
+    """)
+    if not exists:
+        _recompute_rating_rollup(conn)
+
+
+# granularity -> (table, strftime format of the bucket key). created_at is UTC.
+TIME_BUCKETS = {
+    "hour": ("rollup_hourly", "%Y-%m-%d %H:00:00"),
+    "day": ("rollup_daily", "%Y-%m-%d"),
+}
+
+# Ratings at or below this count as "low" in the time-series share.
+LOW_RATING_MAX = 2
+
+
+def _create_time_rollups(conn: sqlite3.Connection):
+    """Create hourly/daily bucket tables and the triggers that maintain them.
+
+    Each bucket stores count, rating sum and low-rating count, which is enough
+    to serve volume, average rating and low-rating share without touching
+    submissions. New tables are backfilled from existing rows.
+    """
+    for table, fmt in TIME_BUCKETS.values():
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT PRIMARY KEY,
+                submission_count INTEGER NOT NULL DEFAULT 0,
+                rating_sum INTEGER NOT NULL DEFAULT 0,
+                low_rating_count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        add = f"""
+            INSERT INTO {table} (bucket, submission_count, rating_sum, low_rating_count)
+            VALUES (strftime('{fmt}', NEW.created_at), 1, NEW.rating, NEW.rating <= {LOW_RATING_MAX})
+            ON CONFLICT (bucket) DO UPDATE SET
+                submission_count = submission_count + 1,
+                rating_sum = rating_sum + excluded.rating_sum,
+                low_rating_count = low_rating_count + excluded.low_rating_count;
+        """
+        remove = f"""
+            UPDATE {table} SET
+                submission_count = submission_count - 1,
+                rating_sum = rating_sum - OLD.rating,
+                low_rating_count = low_rating_count - (OLD.rating <= {LOW_RATING_MAX})
+            WHERE bucket = strftime('{fmt}', OLD.created_at);
+        """
+        _execute_script(conn, f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_insert AFTER INSERT ON submissions
+            BEGIN {add} END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_delete AFTER DELETE ON submissions
+            BEGIN {remove} END;
+
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_update AFTER UPDATE OF rating, created_at ON submissions
+            WHEN OLD.rating != NEW.rating OR OLD.created_at != NEW.created_at
+            BEGIN {remove} {add} END;
+        """)
+        if not exists:
+            _recompute_time_rollup(conn, table, fmt)
+
+
+def _migrate_submissions(conn: sqlite3.Connection):
+    """v1: the submissions table and its lookup indexes."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS submissions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            rating INTEGER NOT NULL,
+            review TEXT NOT NULL,
+            ai_response TEXT,
+            ai_summary TEXT,
+            ai_recommended_action TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_submissions_created_at ON submissions (created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_submissions_rating_id ON submissions (rating, id)")
+
+
+def _migrate_enrichment_status(conn: sqlite3.Connection):
+    """v2: background enrichment status, with a partial index of pending rows."""
+    if not _has_column(conn, "submissions", "enrichment_status"):
+        # Rows that predate background enrichment were generated inline.
+        conn.execute(
+            "ALTER TABLE submissions ADD COLUMN enrichment_status TEXT NOT NULL DEFAULT 'complete'"
+        )
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_submissions_pending
+        ON submissions (id) WHERE enrichment_status = 'pending'
+    """)
+
+
+def _migrate_rollups(conn: sqlite3.Connection):
+    """v3: rating and hourly/daily rollups."""
+    _create_rollups(conn)
+    _create_time_rollups(conn)
+
+
+def _migrate_duplicates(conn: sqlite3.Connection):
+    """v6: duplicate_of and the near-duplicate signature store."""
+    if not _has_column(conn, "submissions", "duplicate_of"):
+        # Set when the AI outputs were reused from a near-identical earlier review.
+        conn.execute("ALTER TABLE submissions ADD COLUMN duplicate_of INTEGER")
+    _create_signature_table(conn)
+
+
+def _has_column(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    return any(row["name"] == column for row in conn.execute(f"PRAGMA table_info({table})"))
+
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
 
 
+# Schema migrations in order; PRAGMA user_version records how many have been
+# applied. Every step is idempotent, so databases created before versioning
+# (user_version 0) upgrade in place. Append new steps; never edit released ones.
+MIGRATIONS = (
+    _migrate_submissions,
+    _migrate_enrichment_status,
+    _migrate_rollups,
+    _create_revision_counter,
+    _create_search_index,
+    _migrate_duplicates,
+)
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+@_timed
+def init_db():
+    """Bring the schema up to SCHEMA_VERSION; a single PRAGMA read when it already is.
+
+    Run once at startup (the API's lifespan hook, scripts, tests). Importing
+    this module does not touch the database.
+    """
+    global FTS_AVAILABLE
+    with _lock:
+        conn = get_connection()
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        while version < SCHEMA_VERSION:
+            # Other worker processes may be starting too: take the write lock,
+            # then re-read the version, so each step runs exactly once.
+            _begin_immediate(conn)
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version < SCHEMA_VERSION:
+                    MIGRATIONS[version](conn)
+                    version += 1
+                    conn.execute(f"PRAGMA user_version = {version}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+        FTS_AVAILABLE = _has_table(conn, "submissions_fts")
+
+
+def _time_rollup_query(fmt: str) -> str:
+    """Full-scan aggregation producing the rows a bucket table should hold."""
+    return f"""
+        SELECT strftime('{fmt}', created_at) AS bucket, COUNT(*), SUM(rating),
+               SUM(rating <= {LOW_RATING_MAX})
+        FROM submissions
+        GROUP BY bucket
+    """
+
+
+def _recompute_time_rollup(conn: sqlite3.Connection, table: str, fmt: str):
+    conn.execute(f"DELETE FROM {table}")
+    conn.execute(f"""
+        INSERT INTO {table} (bucket, submission_count, rating_sum, low_rating_count)
+        {_time_rollup_query(fmt)}
+    """)
+
+
+def _recompute_rating_rollup(conn: sqlite3.Connection):
+    conn.execute("DELETE FROM rating_rollup")
+    conn.execute("""
+        INSERT INTO rating_rollup (rating, submission_count)
+        SELECT rating, COUNT(*) FROM submissions GROUP BY rating
+    """)
+
+
+def _recompute_rollups(conn: sqlite3.Connection):
+    """Replace all rollup contents with values from a full scan (caller commits)."""
+    _recompute_rating_rollup(conn)
+    for table, fmt in TIME_BUCKETS.values():
+        _recompute_time_rollup(conn, table, fmt)
+
+
+@_timed
 def add_submission(
     rating: int,
     review: str,
     ai_response: str,
-    ai_summary: str,
-    ai_recommended_action: str
+    ai_summary: Optional[str],
+    ai_recommended_action: Optional[str],
+    enrichment_status: str = "complete",
+    duplicate_of: Optional[int] = None
 ) -> int:
-    """Add a new submission and return its ID."""
-    with _lock:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO submissions (rating, review, ai_response, ai_summary, ai_recommended_action)
-            VALUES (?, ?, ?, ?, ?)
-        """, (rating, review, ai_response, ai_summary, ai_recommended_action))
-        submission_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-    return submission_id
+    """Add a new submission and return its ID.
+
+    Pass enrichment_status="pending" (with empty admin fields) when the summary
+    and recommended action will be filled in later by update_enrichment(), and
+    duplicate_of when the AI outputs were reused from that earlier submission.
+    """
+    def insert(conn: sqlite3.Connection) -> int:
+        return conn.execute("""
+            INSERT INTO submissions (
+                rating, review, ai_response, ai_summary, ai_recommended_action, enrichment_status, duplicate_of
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (rating, review, ai_response, ai_summary, ai_recommended_action, enrichment_status, duplicate_of)).lastrowid
+
+    return _write(insert)
+
+
+@_timed
+def add_submissions_batch(rows: List[Dict], chunk_size: int = 500) -> List[int]:
+    """Insert many submissions with executemany, one write job per chunk.
 
+    Each row is a dict with rating, review, ai_response, ai_summary,
+    ai_recommended_action and optionally enrichment_status and duplicate_of.
+    Returns the new IDs in input order.
+    """
+    def insert_chunk(params: List[tuple]) -> Callable[[sqlite3.Connection], List[int]]:
+        def insert(conn: sqlite3.Connection) -> List[int]:
+            conn.executemany("""
+                INSERT INTO submissions (
+                    rating, review, ai_response, ai_summary, ai_recommended_action, enrichment_status, duplicate_of
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, params)
+            # Jobs run one at a time on the writer, so the chunk's AUTOINCREMENT
+            # ids are consecutive and end at the table's current sequence value.
+            last_id = conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'submissions'"
+            ).fetchone()[0]
+            return list(range(last_id - len(params) + 1, last_id + 1))
+        return insert
 
+    ids: List[int] = []
+    for start in range(0, len(rows), chunk_size):
+        params = [
+            (
+                row["rating"], row["review"], row["ai_response"], row["ai_summary"],
+                row["ai_recommended_action"], row.get("enrichment_status", "complete"),
+                row.get("duplicate_of"),
+            )
+            for row in rows[start:start + chunk_size]
+        ]
+        ids.extend(_write(insert_chunk(params)))
+    return ids
+
+
+@_timed
+def update_enrichment(
+    submission_id: int,
+    ai_summary: Optional[str],
+    ai_recommended_action: Optional[str],
+    enrichment_status: str
+) -> bool:
+    """Store the admin-only AI fields for a submission. Returns False if it does not exist."""
+    def update(conn: sqlite3.Connection) -> bool:
+        return conn.execute("""
+            UPDATE submissions
+            SET ai_summary = ?, ai_recommended_action = ?, enrichment_status = ?
+            WHERE id = ?
+        """, (ai_summary, ai_recommended_action, enrichment_status, submission_id)).rowcount > 0
+
+    return _write(update)
+
+
+@_timed
+def get_pending_submission_ids() -> List[int]:
+    """IDs of submissions still waiting for background enrichment, oldest first."""
+    conn = get_connection()
+    cursor = conn.execute(
+        "SELECT id FROM submissions WHERE enrichment_status = 'pending' ORDER BY id"
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+@_timed
+def add_review_signatures(signatures: List[tuple], scheme: str):
+    """Store (submission_id, signature bytes) pairs for the near-duplicate index."""
+    params = [(submission_id, scheme, signature) for submission_id, signature in signatures]
+    _write(lambda conn: conn.executemany(
+        "INSERT OR REPLACE INTO review_signatures (submission_id, scheme, signature) VALUES (?, ?, ?)", params
+    ))
+
+
+@_timed
+def get_review_signatures(scheme: str, limit: int) -> List[tuple]:
+    """The newest `limit` stored signatures as (submission_id, rating, signature), oldest first."""
+    conn = get_connection()
+    cursor = conn.execute("""
+        SELECT submission_id, rating, signature FROM (
+            SELECT sig.submission_id, s.rating, sig.signature
+            FROM review_signatures sig
+            JOIN submissions s ON s.id = sig.submission_id
+            WHERE sig.scheme = ?
+            ORDER BY sig.submission_id DESC
+            LIMIT ?
+        ) ORDER BY submission_id
+    """, (scheme, limit))
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+@_timed
 def get_all_submissions() -> List[Dict]:
     """Retrieve all submissions ordered by newest first."""
-    with _lock:
-        conn = sqlite3.connect(str(DB_PATH))
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, rating, review, ai_response, ai_summary, ai_recommended_action, created_at
-            FROM submissions
-            ORDER BY created_at DESC
-        """)
-        rows = cursor.fetchall()
-        conn.close()
+    conn = get_connection()
+    cursor = conn.execute("""
+        SELECT id, rating, review, ai_response, ai_summary, ai_recommended_action,
+               enrichment_status, duplicate_of, created_at
+        FROM submissions
+        ORDER BY created_at DESC
+    """)
+    return [dict(row) for row in cursor.fetchall()]
+
+
+@_timed
+def get_submissions(
+    limit: int = 50,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    rating: Optional[int] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None
+) -> List[Dict]:
+    """Retrieve one page of submissions, newest first, using keyset pagination.
+
+    before_id returns rows older than that id (walking back through history);
+    after_id returns the `limit` rows immediately newer than it (polling for new
+    rows). created_from is inclusive and created_to exclusive, both in the
+    "YYYY-MM-DD HH:MM:SS" format SQLite stores. Each page is an index range
+    scan, so the cost does not depend on the size of the table.
+    """
+    clauses, params = [], []
+    if before_id is not None:
+        clauses.append("id < ?")
+        params.append(before_id)
+    if after_id is not None:
+        clauses.append("id > ?")
+        params.append(after_id)
+    if rating is not None:
+        clauses.append("rating = ?")
+        params.append(rating)
+    if created_from is not None:
+        clauses.append("created_at >= ?")
+        params.append(created_from)
+    if created_to is not None:
+        clauses.append("created_at < ?")
+        params.append(created_to)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    # Walking forward from after_id has to take the oldest rows first.
+    order = "ASC" if after_id is not None else "DESC"
+
+    conn = get_connection()
+    cursor = conn.execute(f"""
+        SELECT id, rating, review, ai_response, ai_summary, ai_recommended_action,
+               enrichment_status, duplicate_of, created_at
+        FROM submissions
+        {where}
+        ORDER BY id {order}
+        LIMIT ?
+    """, (*params, limit))
+    rows = [dict(row) for row in cursor.fetchall()]
+    if order == "ASC":
+        rows.reverse()
+    return rows
+
+
+EXPORT_COLUMNS = (
+    "id", "rating", "review", "ai_response", "ai_summary",
+    "ai_recommended_action", "enrichment_status", "created_at", "duplicate_of",
+)
+
+
+def iter_submissions(
+    after_id: int = 0,
+    rating: Optional[int] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    chunk_size: int = 1000
+) -> Iterator[List[Dict]]:
+    """Yield submissions oldest first, in chunks of at most chunk_size rows.
+
+    Each chunk is its own short keyset query (id > last id seen), so memory is
+    bounded by chunk_size, no read transaction is held open between chunks
+    (WAL checkpoints keep running), and the generator may be resumed from any
+    thread. Pass the last exported id as after_id to resume an export.
+    """
+    clauses, params = ["id > ?"], [after_id]
+    if rating is not None:
+        clauses.append("rating = ?")
+        params.append(rating)
+    if created_from is not None:
+        clauses.append("created_at >= ?")
+        params.append(created_from)
+    if created_to is not None:
+        clauses.append("created_at < ?")
+        params.append(created_to)
+    query = f"""
+        SELECT {', '.join(EXPORT_COLUMNS)}
+        FROM submissions
+        WHERE {' AND '.join(clauses)}
+        ORDER BY id
+        LIMIT ?
+    """
+    while True:
+        started = time.perf_counter()
+        rows = [dict(row) for row in get_connection().execute(query, (*params, chunk_size))]
+        metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - started, function="iter_submissions")
+        metrics.DB_ROWS_RETURNED.observe(len(rows), function="iter_submissions")
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        params[0] = rows[-1]["id"]
+
+
+_SEARCH_TERM = re.compile(r'"([^"]+)"|(\S+)')
+
+
+def build_fts_query(text: str) -> str:
+    """Turn free text into a safe FTS5 query.
+
+    Every word must match (implicit AND); "quoted text" matches as a phrase and
+    a trailing * does prefix matching. FTS5 operators in user input are
+    neutralized by quoting, so arbitrary text cannot cause a syntax error.
+    """
+    terms = []
+    for phrase, word in _SEARCH_TERM.findall(text):
+        if phrase:
+            tokens = re.findall(r"\w+", phrase)
+            if tokens:
+                terms.append('"' + " ".join(tokens) + '"')
+            continue
+        tokens = re.findall(r"\w+", word)
+        terms.extend(f'"{token}"' for token in tokens)
+        if tokens and word.endswith("*"):
+            terms[-1] += "*"
+    return " ".join(terms)
+
+
+# Only the newest N matches are scored with bm25. Ranking every match of a
+# very common term on a large table costs ~1s; the window keeps keyword
+# queries in the tens of milliseconds. 0 ranks all matches.
+SEARCH_CANDIDATES = int(os.environ.get("SEARCH_CANDIDATES", "2000"))
+
+
+@_timed
+def search_submissions(query: str, rating: Optional[int] = None, limit: int = 20, offset: int = 0) -> List[Dict]:
+    """Full-text search over review and ai_summary (best match first).
+
+    The newest SEARCH_CANDIDATES matches are ranked by relevance, with matches in
+    the review weighing twice as much as matches in the summary; older matches
+    follow newest first, unranked. Each result includes a highlighted `snippet`
+    of the review.
+    """
+    if not FTS_AVAILABLE:
+        raise RuntimeError("Full-text search requires SQLite with FTS5")
+    fts_query = build_fts_query(query)
+    if not fts_query:
+        return []
+    clauses, params = ["submissions_fts MATCH :q"], {"q": fts_query}
+    if rating is not None:
+        clauses.append("s.rating = :rating")
+        params["rating"] = rating
+    where = " AND ".join(clauses)
+    conn = get_connection()
+    window_start, window_size = 0, 0
+    if SEARCH_CANDIDATES > 0:
+        # The window is the newest candidates after filtering; a rowid lower bound
+        # is answered by FTS5 itself, so ranking inside it stays cheap.
+        window_start, window_size = conn.execute(f"""
+            SELECT COALESCE(MIN(rowid), 0), COUNT(*) FROM (
+                SELECT submissions_fts.rowid FROM submissions_fts
+                JOIN submissions s ON s.id = submissions_fts.rowid
+                WHERE {where}
+                ORDER BY submissions_fts.rowid DESC LIMIT :candidates
+            )
+        """, {**params, "candidates": SEARCH_CANDIDATES}).fetchone()
+
+    select = f"""
+        SELECT s.id, s.rating, s.review, s.ai_response, s.ai_summary, s.ai_recommended_action,
+               s.enrichment_status, s.duplicate_of, s.created_at,
+               snippet(submissions_fts, 0, '**', '**', '…', 16) AS snippet,
+               bm25(submissions_fts, 2.0, 1.0) AS score
+        FROM submissions_fts
+        JOIN submissions s ON s.id = submissions_fts.rowid
+        WHERE {where}
+    """
+    rows = conn.execute(
+        select + " AND submissions_fts.rowid >= :start ORDER BY score LIMIT :limit OFFSET :offset",
+        {**params, "start": window_start, "limit": limit, "offset": offset},
+    ).fetchall()
+    if 0 < SEARCH_CANDIDATES == window_size and len(rows) < limit:
+        # Past the ranked window: the remaining matches, newest first.
+        rows += conn.execute(
+            select + " AND submissions_fts.rowid < :start ORDER BY submissions_fts.rowid DESC"
+            " LIMIT :limit OFFSET :offset",
+            {**params, "start": window_start, "limit": limit - len(rows),
+             "offset": max(0, offset - window_size)},
+        ).fetchall()
     return [dict(row) for row in rows]
 
 
+@_timed
 def get_submission_by_id(submission_id: int) -> Optional[Dict]:
     """Retrieve a single submission by ID."""
-    with _lock:
-        conn = sqlite3.connect(str(DB_PATH))
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, rating, review, ai_response, ai_summary, ai_recommended_action, created_at
-            FROM submissions
-            WHERE id = ?
-        """, (submission_id,))
-        row = cursor.fetchone()
-        conn.close()
+    conn = get_connection()
+    cursor = conn.execute("""
+        SELECT id, rating, review, ai_response, ai_summary, ai_recommended_action,
+               enrichment_status, duplicate_of, created_at
+        FROM submissions
+        WHERE id = ?
+    """, (submission_id,))
+    row = cursor.fetchone()
     return dict(row) if row else None
 
 
+@_timed
 def get_analytics() -> Dict:
-    """Compute simple analytics from all submissions."""
-    with _lock:
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) as total FROM submissions")
-        total = cursor.fetchone()[0]
-        cursor.execute("SELECT AVG(rating) as avg_rating FROM submissions")
-        avg_rating = cursor.fetchone()[0] or 0.0
-        cursor.execute("SELECT rating, COUNT(*) as count FROM submissions GROUP BY rating")
-        rating_dist = {row[0]: row[1] for row in cursor.fetchall()}
-        conn.close()
+    """Return analytics from the rating rollup (a handful of rows, not a table scan)."""
+    conn = get_connection()
+    cursor = conn.execute(
+        "SELECT rating, submission_count FROM rating_rollup WHERE submission_count > 0 ORDER BY rating"
+    )
+    rating_dist = {row[0]: row[1] for row in cursor.fetchall()}
+    total = sum(rating_dist.values())
+    avg_rating = sum(r * c for r, c in rating_dist.items()) / total if total else 0.0
     return {
         "total_submissions": total,
         "average_rating": round(avg_rating, 2),
@@ -102,5 +954,114 @@ def get_analytics() -> Dict:
     }
 
 
-# Initialize DB on import
-init_db()
+@_timed
+def get_data_revision() -> int:
+    """Counter that increases on every insert, update or delete of a submission."""
+    conn = get_connection()
+    return conn.execute("SELECT revision FROM data_revision WHERE id = 1").fetchone()[0]
+
+
+@_timed
+def rebuild_rollups():
+    """Recompute every rollup from the raw submissions table."""
+    _write(_recompute_rollups)
+
+
+@_timed
+def verify_rollups() -> Dict:
+    """Compare every rollup against a full scan of submissions.
+
+    Returns {"ok": bool, "expected": {...}, "actual": {...}, "mismatched_buckets": {...}}
+    where expected/actual map rating -> count and mismatched_buckets lists, per
+    granularity, the time buckets whose stored values differ from the scan.
+    """
+    conn = get_connection()
+    expected = {
+        row[0]: row[1]
+        for row in conn.execute("SELECT rating, COUNT(*) FROM submissions GROUP BY rating")
+    }
+    actual = {
+        row[0]: row[1]
+        for row in conn.execute("SELECT rating, submission_count FROM rating_rollup WHERE submission_count != 0")
+    }
+
+    mismatched = {}
+    for granularity, (table, fmt) in TIME_BUCKETS.items():
+        scanned = {row[0]: tuple(row[1:]) for row in conn.execute(_time_rollup_query(fmt))}
+        stored = {
+            row[0]: tuple(row[1:])
+            for row in conn.execute(
+                f"SELECT bucket, submission_count, rating_sum, low_rating_count FROM {table}"
+                " WHERE submission_count != 0"
+            )
+        }
+        mismatched[granularity] = sorted(
+            bucket for bucket in scanned.keys() | stored.keys() if scanned.get(bucket) != stored.get(bucket)
+        )
+
+    ok = expected == actual and not any(mismatched.values())
+    return {"ok": ok, "expected": expected, "actual": actual, "mismatched_buckets": mismatched}
+
+
+@_timed
+def get_timeseries(granularity: str, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+    """Per-bucket volume, average rating and low-rating share from the rollups.
+
+    granularity is "hour" or "day"; start is inclusive and end exclusive, in
+    the "YYYY-MM-DD HH:MM:SS" format (compared against the bucket key).
+    """
+    table, fmt = TIME_BUCKETS[granularity]
+    clauses, params = ["submission_count > 0"], []
+    if start is not None:
+        clauses.append("bucket >= ?")
+        params.append(_bucket_key(start, fmt))
+    if end is not None:
+        clauses.append("bucket < ?")
+        params.append(_bucket_end_key(end, granularity))
+    conn = get_connection()
+    cursor = conn.execute(f"""
+        SELECT bucket, submission_count, rating_sum, low_rating_count
+        FROM {table}
+        WHERE {' AND '.join(clauses)}
+        ORDER BY bucket
+    """, params)
+    return [
+        {
+            "bucket": bucket,
+            "submissions": count,
+            "average_rating": round(rating_sum / count, 2),
+            "low_rating_share": round(low / count, 4),
+        }
+        for bucket, count, rating_sum, low in cursor.fetchall()
+    ]
+
+
+def _bucket_key(timestamp: str, fmt: str) -> str:
+    """Truncate a timestamp to its bucket key so a partial first bucket is included."""
+    return datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").strftime(fmt)
+
+
+def _bucket_end_key(timestamp: str, granularity: str) -> str:
+    """Exclusive upper bound as a bucket key: the next key unless on a bucket boundary."""
+    fmt = TIME_BUCKETS[granularity][1]
+    moment = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+    key = moment.strftime(fmt)
+    if datetime.strptime(key, fmt) == moment:
+        return key
+    step = timedelta(hours=1) if granularity == "hour" else timedelta(days=1)
+    return (datetime.strptime(key, fmt) + step).strftime(fmt)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintenance commands for the submissions database.")
+    parser.add_argument("command", choices=["rebuild-rollups", "verify-rollups"])
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "rebuild-rollups":
+        rebuild_rollups()
+    report = verify_rollups()
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if report["ok"] else 1)
@@ -0,0 +1,192 @@
+"""Near-duplicate review detection with MinHash signatures and an LSH index.
+
+Bot floods and copy-paste campaigns send many lightly reworded copies of one
+review. Each review is reduced to character shingles, then to a MinHash
+signature (DEDUP_NUM_PERM values) whose positional agreement estimates
+Jaccard similarity. Signatures are split into DEDUP_BANDS bands and each band
+is hashed into a bucket, so a lookup only compares against reviews that share
+at least one bucket. Cost depends on the number of near matches, not on
+history size.
+
+A new review whose best candidate has the same rating and an estimated
+similarity of at least DEDUP_THRESHOLD reuses that submission's AI outputs
+and is stored with duplicate_of set. Only originals are indexed, so a flood
+does not grow the index. The newest DEDUP_MAX_ENTRIES originals are kept in
+memory, and their signatures are stored in SQLite (review_signatures), from
+where the index is rebuilt on first use after a restart.
+"""
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+import database
+import metrics
+
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", "0.8"))
+DEDUP_NUM_PERM = int(os.environ.get("DEDUP_NUM_PERM", "128"))
+DEDUP_BANDS = int(os.environ.get("DEDUP_BANDS", "16"))
+DEDUP_SHINGLE_SIZE = int(os.environ.get("DEDUP_SHINGLE_SIZE", "5"))
+# Short reviews ("Great service!") are legitimately identical across customers.
+DEDUP_MIN_CHARS = int(os.environ.get("DEDUP_MIN_CHARS", "40"))
+DEDUP_MAX_ENTRIES = int(os.environ.get("DEDUP_MAX_ENTRIES", "100000"))
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64(0xFFFFFFFF)
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    return " ".join(_NON_WORD.sub(" ", text.lower()).split())
+
+
+def shingles(text: str, size: int) -> Set[str]:
+    """Overlapping character n-grams of the normalized text."""
+    text = normalize(text)
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class NearDuplicateIndex:
+    """In-memory MinHash LSH index of recent original submissions."""
+
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, bands: int = DEDUP_BANDS,
+                 threshold: float = DEDUP_THRESHOLD, shingle_size: int = DEDUP_SHINGLE_SIZE,
+                 max_entries: int = DEDUP_MAX_ENTRIES):
+        if num_perm % bands:
+            raise ValueError("DEDUP_NUM_PERM must be a multiple of DEDUP_BANDS")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        # Identifies signatures that are comparable with this configuration.
+        self.scheme = f"minhash-c{shingle_size}-p{num_perm}"
+        # Fixed seed: signatures must stay comparable across processes and restarts.
+        rng = np.random.RandomState(1)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Tuple[int, np.ndarray]]" = OrderedDict()
+        self._buckets: List[Dict[bytes, Set[int]]] = [{} for _ in range(bands)]
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles(text, self.shingle_size)), dtype=np.uint64
+        )
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, submission_id: int, rating: int, signature: np.ndarray):
+        with self._lock:
+            if submission_id in self._entries:
+                return
+            self._entries[submission_id] = (rating, signature)
+            for band, key in zip(self._buckets, self._band_keys(signature)):
+                band.setdefault(key, set()).add(submission_id)
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        submission_id, (_, signature) = self._entries.popitem(last=False)
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            ids = band.get(key)
+            if ids is not None:
+                ids.discard(submission_id)
+                if not ids:
+                    del band[key]
+
+    def query(self, rating: int, signature: np.ndarray) -> Optional[Tuple[int, float]]:
+        """Best indexed (submission_id, similarity) with this rating at or above the threshold."""
+        with self._lock:
+            candidates: Set[int] = set()
+            for band, key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(band.get(key, ()))
+            best = None
+            for candidate in candidates:
+                candidate_rating, candidate_signature = self._entries[candidate]
+                if candidate_rating != rating:
+                    continue
+                similarity = float(np.mean(candidate_signature == signature))
+                if similarity >= self.threshold and (best is None or similarity > best[1]):
+                    best = (candidate, similarity)
+        return best
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def load(self):
+        """Rebuild from the signatures stored in the database."""
+        for submission_id, rating, blob in database.get_review_signatures(self.scheme, self.max_entries):
+            signature = np.frombuffer(blob, dtype=np.uint32)
+            if len(signature) == self.num_perm:
+                self.add(submission_id, rating, signature)
+
+
+_index: Optional[NearDuplicateIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> NearDuplicateIndex:
+    """The process-wide index, loaded from SQLite on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = NearDuplicateIndex()
+                index.load()
+                _index = index
+    return _index
+
+
+def reset_index():
+    """Forget the in-memory index (it is reloaded from the database on next use)."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def find_duplicate(rating: int, review: str) -> Tuple[Optional[Dict], Optional[np.ndarray]]:
+    """Look for an earlier near-identical review with the same rating.
+
+    Returns (original submission or None, signature to pass to remember() if
+    this review ends up stored as an original). Both are None when
+    deduplication is off or the review is too short to judge.
+    """
+    if not DEDUP_ENABLED or len(normalize(review)) < DEDUP_MIN_CHARS:
+        return None, None
+    index = get_index()
+    signature = index.signature(review)
+    match = index.query(rating, signature)
+    if match is None:
+        return None, signature
+    original = database.get_submission_by_id(match[0])
+    if original is None:
+        return None, signature
+    metrics.DEDUP_MATCHES.inc()
+    return original, signature
+
+
+def remember(submissions: List[Tuple[int, int, Optional[np.ndarray]]]):
+    """Index newly stored originals given as (submission_id, rating, signature) and persist them."""
+    submissions = [s for s in submissions if s[2] is not None]
+    if not submissions:
+        return
+    index = get_index()
+    for submission_id, rating, signature in submissions:
+        index.add(submission_id, rating, signature)
+    database.add_review_signatures(
+        [(submission_id, signature.tobytes()) for submission_id, _, signature in submissions], index.scheme
+    )
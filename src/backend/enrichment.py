@@ -0,0 +1,157 @@
+"""Background enrichment for Task 2 - fills in admin-only AI fields off the request path.
+
+`/api/submit` stores the submission with the customer reply and
+enrichment_status="pending", then enqueues its id here. A small pool of worker
+threads generates the summary and recommended action, retrying LLM failures
+with exponential backoff before settling for the template fallbacks.
+
+Statuses: pending -> complete (LLM output), fallback (templates, when no LLM
+is configured or after retries ran out) or failed (unexpected error, e.g. the database was unavailable).
+"""
+import os
+import queue
+import random
+import threading
+import logging
+from typing import List
+
+import database
+from events import hub
+from llm_service import LLMError, generate_admin_fields, llm_available
+
+logger = logging.getLogger(__name__)
+
+# "async" enriches in the background; "sync" generates everything inline.
+ENRICHMENT_MODE = os.environ.get("ENRICHMENT_MODE", "async")
+WORKER_COUNT = int(os.environ.get("ENRICHMENT_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.environ.get("ENRICHMENT_MAX_ATTEMPTS", "3"))
+BACKOFF_SECONDS = float(os.environ.get("ENRICHMENT_BACKOFF_SECONDS", "1.0"))
+
+_queue: "queue.Queue[int]" = queue.Queue()
+_workers: List[threading.Thread] = []
+_workers_lock = threading.Lock()
+_stop = threading.Event()
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with jitter for the given (1-based) attempt."""
+    return BACKOFF_SECONDS * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+
+
+def enrich_submission(submission_id: int) -> str:
+    """Generate and store the admin fields for one submission. Returns the final status."""
+    submission = database.get_submission_by_id(submission_id)
+    if submission is None:
+        return "missing"
+    rating, review = submission["rating"], submission["review"]
+
+    # Near-duplicates take the original's admin fields once it has them.
+    original = database.get_submission_by_id(submission["duplicate_of"]) if submission["duplicate_of"] else None
+    if original is not None and original["enrichment_status"] in ("complete", "fallback"):
+        status = original["enrichment_status"]
+        database.update_enrichment(
+            submission_id, original["ai_summary"], original["ai_recommended_action"], status
+        )
+        _publish_updated(submission_id)
+        return status
+
+    if not llm_available():
+        # Nothing to retry: store the templates as what they are.
+        fields = generate_admin_fields(rating, review)
+        database.update_enrichment(
+            submission_id, fields["ai_summary"], fields["ai_recommended_action"], "fallback"
+        )
+        _publish_updated(submission_id)
+        return "fallback"
+
+    attempt = 1
+    while True:
+        try:
+            fields = generate_admin_fields(rating, review, strict=True)
+            status = "complete"
+            break
+        except LLMError:
+            # Give up on the LLM after the last attempt or when shutting down.
+            if attempt >= MAX_ATTEMPTS or _stop.wait(backoff_delay(attempt)):
+                fields = generate_admin_fields(rating, review)
+                status = "fallback"
+                break
+            attempt += 1
+
+    database.update_enrichment(
+        submission_id, fields["ai_summary"], fields["ai_recommended_action"], status
+    )
+    _publish_updated(submission_id)
+    return status
+
+
+def _publish_updated(submission_id: int):
+    """Tell live dashboards that a submission's admin fields changed."""
+    submission = database.get_submission_by_id(submission_id)
+    if submission is not None:
+        hub.publish("submission.updated", submission)
+
+
+def _worker():
+    while not _stop.is_set():
+        try:
+            submission_id = _queue.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        try:
+            enrich_submission(submission_id)
+        except Exception:
+            logger.exception("Enrichment failed for submission %s", submission_id)
+            try:
+                database.update_enrichment(submission_id, None, None, "failed")
+                _publish_updated(submission_id)
+            except Exception:
+                logger.exception("Could not mark submission %s as failed", submission_id)
+        finally:
+            _queue.task_done()
+
+
+def start_workers(count: int = WORKER_COUNT):
+    """Start the worker pool (idempotent)."""
+    with _workers_lock:
+        if _workers:
+            return
+        _stop.clear()
+        for i in range(count):
+            thread = threading.Thread(target=_worker, name=f"enrichment-{i}", daemon=True)
+            thread.start()
+            _workers.append(thread)
+
+
+def stop_workers(timeout: float = 5.0):
+    """Signal workers to stop and wait for them. Queued ids stay pending in the DB."""
+    with _workers_lock:
+        _stop.set()
+        for thread in _workers:
+            thread.join(timeout)
+        _workers.clear()
+        _stop.clear()
+
+
+def enqueue(submission_id: int):
+    """Schedule a submission for enrichment, starting the workers if needed."""
+    start_workers()
+    _queue.put(submission_id)
+
+
+def requeue_pending() -> int:
+    """Re-enqueue submissions left pending by a previous process. Returns the count."""
+    pending = database.get_pending_submission_ids()
+    for submission_id in pending:
+        enqueue(submission_id)
+    return len(pending)
+
+
+def queue_depth() -> int:
+    """Submissions queued and not yet picked up by a worker."""
+    return _queue.qsize()
+
+
+def wait_until_idle():
+    """Block until every queued submission has been processed (used in tests)."""
+    _queue.join()
@@ -0,0 +1,93 @@
+"""In-process broadcast hub for server-sent events (SSE).
+
+Writers (request handlers, enrichment workers) call `hub.publish()` from any
+thread; each `/api/events` connection owns an asyncio queue fed through its
+event loop. Recent events are kept in a ring buffer so a client reconnecting
+with Last-Event-ID receives what it missed. A subscriber that falls too far
+behind is disconnected rather than allowed to grow without bound.
+
+The hub lives in one process: with several uvicorn workers, each worker only
+broadcasts the writes it handled itself.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+REPLAY_BUFFER_SIZE = 1000
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+class Subscription:
+    """One connected client: its event loop and queue."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: "asyncio.Queue[Optional[Tuple[int, str, Dict]]]" = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE + 1)
+        self.closed = False
+
+    def deliver(self, event: Optional[Tuple[int, str, Dict]]):
+        """Runs on the subscriber's loop. None tells the stream to end."""
+        if self.closed:
+            return
+        if event is not None and self.queue.qsize() >= SUBSCRIBER_QUEUE_SIZE:
+            # Too slow to keep up: end the stream, the client reconnects and replays.
+            self.closed = True
+            event = None
+        self.queue.put_nowait(event)
+
+
+class EventHub:
+    """Thread-safe fan-out of (id, type, data) events to SSE subscribers."""
+
+    def __init__(self, replay_size: int = REPLAY_BUFFER_SIZE):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._recent: Deque[Tuple[int, str, Dict]] = deque(maxlen=replay_size)
+        self._subscribers: List[Subscription] = []
+
+    def publish(self, event_type: str, data: Dict) -> int:
+        """Broadcast an event to every subscriber. Safe to call from any thread."""
+        with self._lock:
+            event = (next(self._ids), event_type, data)
+            self._recent.append(event)
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down.
+                self.unsubscribe(sub)
+        return event[0]
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop, last_event_id: Optional[int] = None) -> Subscription:
+        """Register a subscriber, replaying buffered events newer than last_event_id."""
+        sub = Subscription(loop)
+        with self._lock:
+            if last_event_id is not None:
+                for event in self._recent:
+                    if event[0] > last_event_id:
+                        sub.queue.put_nowait(event)
+            self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+
+def format_sse(event: Tuple[Optional[int], str, Dict]) -> str:
+    """Serialize one event in text/event-stream format (no id line when the id is None)."""
+    event_id, event_type, data = event
+    id_line = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{id_line}event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+hub = EventHub()
@@ -0,0 +1,214 @@
+"""LLM backends for Task 2 - one long-lived client per process.
+
+llm_service talks to whichever backend LLM_BACKEND selects:
+
+- "gemini": Google Gemini via google-generativeai. The SDK is configured and
+  the GenerativeModel built once, so its underlying HTTP/gRPC channel is reused
+  (kept alive) across requests instead of being rebuilt per call.
+- "fake": an in-process stand-in with configurable latency and error rate,
+  returning well-formed output for every prompt llm_service sends. Use it to
+  load-test throughput and fallback behaviour offline.
+- "none": no LLM; every caller uses its template fallback.
+- "auto" (default): "gemini" when GEMINI_API_KEY is set and the SDK is
+  installed, otherwise "none".
+
+The SDK is imported when the Gemini backend is first built (on the first LLM
+call), not when this module is imported: its module tree takes most of a
+second to load and nothing else needs it.
+"""
+import importlib.util
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Iterator, Optional
+
+
+def _genai_installed() -> bool:
+    try:
+        return importlib.util.find_spec("google.generativeai") is not None
+    except ImportError:  # no "google" namespace package at all
+        return False
+
+
+GENAI_AVAILABLE = _genai_installed()
+
+DEFAULT_MODEL = "gemini-1.5-flash"
+
+
+class LLMBackendError(Exception):
+    """Raised by a backend when a generation fails."""
+
+
+class LLMBackend:
+    """Interface: generate text for a prompt or raise LLMBackendError."""
+
+    name = "none"
+    model_name = "none"
+
+    def available(self) -> bool:
+        return False
+
+    def generate(self, prompt: str, max_output_tokens: int, temperature: float, timeout: float) -> str:
+        raise LLMBackendError("No LLM backend configured")
+
+    def stream(self, prompt: str, max_output_tokens: int, temperature: float, timeout: float) -> Iterator[str]:
+        """Yield the generation in pieces as they arrive. May raise LLMBackendError mid-stream.
+
+        Backends without native streaming yield the whole text as one piece.
+        """
+        yield self.generate(prompt, max_output_tokens, temperature, timeout)
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini with a single configured client and model object."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str, model_name: str = DEFAULT_MODEL, transport: Optional[str] = None):
+        import google.generativeai as genai
+
+        self.model_name = model_name
+        self._genai = genai
+        genai.configure(api_key=api_key, transport=transport)
+        self._model = genai.GenerativeModel(model_name)
+
+    def available(self) -> bool:
+        return True
+
+    def _generate_content(self, prompt: str, max_output_tokens: int, temperature: float, timeout: float,
+                          stream: bool = False):
+        return self._model.generate_content(
+            prompt,
+            generation_config=self._genai.types.GenerationConfig(
+                max_output_tokens=max_output_tokens,
+                temperature=temperature,
+            ),
+            request_options={"timeout": timeout},
+            stream=stream,
+        )
+
+    def generate(self, prompt: str, max_output_tokens: int, temperature: float, timeout: float) -> str:
+        try:
+            return self._generate_content(prompt, max_output_tokens, temperature, timeout).text.strip()
+        except Exception as e:
+            raise LLMBackendError(str(e)) from e
+
+    def stream(self, prompt: str, max_output_tokens: int, temperature: float, timeout: float) -> Iterator[str]:
+        try:
+            for chunk in self._generate_content(prompt, max_output_tokens, temperature, timeout, stream=True):
+                if chunk.text:
+                    yield chunk.text
+        except Exception as e:
+            raise LLMBackendError(str(e)) from e
+
+
+class FakeBackend(LLMBackend):
+    """Offline stand-in: sleeps, fails at a set rate and answers in the requested shape."""
+
+    name = "fake"
+
+    def __init__(self, latency_ms: float = 200.0, jitter_ms: float = 50.0, error_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.model_name = "fake"
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self.calls = 0
+
+    def available(self) -> bool:
+        return True
+
+    def _draw(self):
+        """Count the call and pick its total latency (seconds) and whether it fails."""
+        with self._random_lock:
+            self.calls += 1
+            delay = max(0.0, self.latency_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            fail = self._random.random() < self.error_rate
+        return delay, fail
+
+    def generate(self, prompt: str, max_output_tokens: int, temperature: float, timeout: float) -> str:
+        delay, fail = self._draw()
+        time.sleep(min(delay, timeout))
+        if delay > timeout:
+            raise LLMBackendError("fake backend timed out")
+        if fail:
+            raise LLMBackendError("fake backend injected error")
+        return self._answer(prompt)
+
+    def stream(self, prompt: str, max_output_tokens: int, temperature: float, timeout: float) -> Iterator[str]:
+        # The latency is spread over the words, so the first one arrives early.
+        delay, fail = self._draw()
+        if delay > timeout:
+            time.sleep(timeout)
+            raise LLMBackendError("fake backend timed out")
+        if fail:
+            raise LLMBackendError("fake backend injected error")
+        words = re.findall(r"\S+\s*", self._answer(prompt))
+        for word in words:
+            time.sleep(delay / len(words))
+            yield word
+
+    @staticmethod
+    def _answer(prompt: str) -> str:
+        keys = re.findall(r'^- "(\w+)":', prompt, flags=re.MULTILINE)
+        batch = re.search(r"Below are (\d+) numbered", prompt)
+        if batch:
+            items = []
+            for index in range(1, int(batch.group(1)) + 1):
+                item = {key: f"(fake) {key} for review {index}" for key in keys if key != "index"}
+                items.append({"index": index, **item})
+            return json.dumps(items)
+        if keys:
+            return json.dumps({key: f"(fake) {key}" for key in keys})
+        return "(fake) Thank you for your feedback! We appreciate you taking the time to share it."
+
+
+_backend: Optional[LLMBackend] = None
+_backend_lock = threading.Lock()
+
+
+def create_backend_from_env() -> LLMBackend:
+    """Build the backend selected by LLM_BACKEND and related settings."""
+    choice = os.environ.get("LLM_BACKEND", "auto").lower()
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if choice == "auto":
+        choice = "gemini" if api_key and GENAI_AVAILABLE else "none"
+
+    if choice == "gemini":
+        if not api_key or not GENAI_AVAILABLE:
+            return LLMBackend()
+        return GeminiBackend(
+            api_key,
+            model_name=os.environ.get("LLM_MODEL", DEFAULT_MODEL),
+            transport=os.environ.get("GEMINI_TRANSPORT") or None,
+        )
+    if choice == "fake":
+        return FakeBackend(
+            latency_ms=float(os.environ.get("FAKE_LLM_LATENCY_MS", "200")),
+            jitter_ms=float(os.environ.get("FAKE_LLM_JITTER_MS", "50")),
+            error_rate=float(os.environ.get("FAKE_LLM_ERROR_RATE", "0")),
+            seed=int(os.environ["FAKE_LLM_SEED"]) if os.environ.get("FAKE_LLM_SEED") else None,
+        )
+    return LLMBackend()
+
+
+def get_backend() -> LLMBackend:
+    """The process-wide backend, created on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend_from_env()
+    return _backend
+
+
+def set_backend(backend: Optional[LLMBackend]):
+    """Replace the process-wide backend (None re-reads the environment on next use)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
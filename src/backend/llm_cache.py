@@ -0,0 +1,138 @@
+"""Content-addressed cache for LLM outputs used by llm_service.
+
+Keys hash the task, rating, normalized review text, model and prompt version,
+so identical (or trivially different) reviews reuse an earlier generation.
+Entries live in an in-memory LRU and, when a path is configured, in a small
+SQLite file that survives restarts. Both tiers honour the same TTL.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = " \t\n.!?,;:\"'"
+
+
+def normalize_review(review: str) -> str:
+    """Case-fold, collapse whitespace and trim edge punctuation."""
+    return _WHITESPACE.sub(" ", review.lower()).strip(_EDGE_PUNCTUATION)
+
+
+def make_key(task: str, rating: int, review: str, model: str, prompt_version: str) -> str:
+    """Stable cache key for one generation."""
+    material = "\x1f".join([task, str(rating), normalize_review(review), model, prompt_version])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """Two-tier (memory LRU + optional SQLite) cache with TTL and hit/miss counters."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 86400.0, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._disk: Optional[sqlite3.Connection] = None
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            # Guarded by self._lock, so one connection can be shared across threads.
+            self._disk = sqlite3.connect(path, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            self._disk.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+            """)
+            self._disk.execute("DELETE FROM llm_cache WHERE stored_at < ?", (time.time() - ttl_seconds,))
+            self._disk.commit()
+
+    def _expired(self, stored_at: float) -> bool:
+        return time.time() - stored_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached value or None, counting the hit or miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if not self._expired(stored_at):
+                    self._memory.move_to_end(key)
+                    self._counters["hits"] += 1
+                    self._counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT value, stored_at FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, stored_at = row
+                    if not self._expired(stored_at):
+                        self._remember(key, value, stored_at)
+                        self._counters["hits"] += 1
+                        self._counters["disk_hits"] += 1
+                        return value
+                    self._disk.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                    self._disk.commit()
+
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key: str, value: str):
+        """Store a value in both tiers."""
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, value, stored_at)
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, value, stored_at),
+                )
+                self._disk.commit()
+
+    def _remember(self, key: str, value: str, stored_at: float):
+        """Insert into the memory LRU, evicting the oldest entries (caller holds the lock)."""
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = (value, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def clear(self):
+        """Drop every entry from both tiers (counters are kept)."""
+        with self._lock:
+            self._memory.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM llm_cache")
+                self._disk.commit()
+
+    def stats(self) -> Dict:
+        """Counters plus current size and hit rate."""
+        with self._lock:
+            counters = dict(self._counters)
+            counters["memory_entries"] = len(self._memory)
+            counters["persistent"] = self._disk is not None
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_rate"] = round(counters["hits"] / lookups, 4) if lookups else 0.0
+        return counters
+
+
+def cache_from_env() -> LLMCache:
+    """Build the process-wide cache from LLM_CACHE_* environment variables."""
+    return LLMCache(
+        max_entries=int(os.environ.get("LLM_CACHE_SIZE", "1024")),
+        ttl_seconds=float(os.environ.get("LLM_CACHE_TTL_SECONDS", "86400")),
+        path=os.environ.get("LLM_CACHE_PATH") or None,
+    )
@@ -1,99 +1,523 @@
-"""LLM integration for Task 2 - uses Google Gemini API."""
+"""LLM integration for Task 2 - prompts, caching and fallbacks on top of llm_backends."""
 import os
-from typing import Tuple
+import json
+import threading
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
-try:
-    import google.generativeai as genai
-    GENAI_AVAILABLE = True
-except ImportError:
-    GENAI_AVAILABLE = False
+import action_classifier
+import metrics
+from circuit_breaker import CircuitBreaker
+from llm_backends import LLMBackendError, get_backend
+from llm_cache import cache_from_env, make_key
 
+# Part of every cache key: bump whenever a prompt below changes so stale
+# generations are not served for the new wording.
+PROMPT_VERSION = "1"
 
-def configure_genai():
-    """Configure Gemini API with key from environment."""
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key or not GENAI_AVAILABLE:
-        return False
-    genai.configure(api_key=api_key)
-    return True
+# "combined" asks for response, summary and action in one JSON call;
+# "separate" keeps the original one-call-per-field behaviour.
+GENERATION_MODE = os.environ.get("LLM_GENERATION_MODE", "combined")
 
+# Total time a request may spend waiting on the LLM before templates are used.
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("LLM_REQUEST_DEADLINE_SECONDS", "10"))
+# Threads for generate_all_concurrent; 0 = three per admitted LLM request, so
+# calls do not queue behind other requests' and burn their deadline waiting.
+FANOUT_WORKERS = int(os.environ.get("LLM_FANOUT_WORKERS", "0"))
 
-def generate_user_response(rating: int, review: str) -> str:
-    """Generate a user-facing response based on rating and review."""
-    if not configure_genai():
-        return f"Thank you for your {rating}-star review! We appreciate your feedback."
-    
-    prompt = f"""You are a customer service representative. A user submitted a {rating}-star review with the following text:
-"{review}"
+# Bulk ingest: reviews per multi-review prompt and prompts in flight at once.
+BATCH_SIZE = int(os.environ.get("LLM_BATCH_SIZE", "10"))
+BATCH_CONCURRENCY = int(os.environ.get("LLM_BATCH_CONCURRENCY", "4"))
+BATCH_TIMEOUT_SECONDS = float(os.environ.get("LLM_BATCH_TIMEOUT_SECONDS", "60"))
 
-Write a short, friendly response (2-3 sentences) thanking them and addressing their feedback appropriately."""
-    
+# Per-task (max_output_tokens, temperature). Override any of them with
+# LLM_GENERATION_SETTINGS, e.g. '{"user_response": {"temperature": 0.4}}'.
+GENERATION_SETTINGS = {
+    "user_response": {"max_output_tokens": 150, "temperature": 0.7},
+    "admin_summary": {"max_output_tokens": 80, "temperature": 0.3},
+    "recommended_action": {"max_output_tokens": 100, "temperature": 0.5},
+    "combined": {"max_output_tokens": 330, "temperature": 0.5},
+    "admin_fields": {"max_output_tokens": 200, "temperature": 0.4},
+    "batch": {"max_output_tokens": 330, "temperature": 0.5},  # per review in the prompt
+}
+for _task, _overrides in json.loads(os.environ.get("LLM_GENERATION_SETTINGS") or "{}").items():
+    GENERATION_SETTINGS.setdefault(_task, {}).update(_overrides)
+
+COMBINED_FIELDS = ("ai_response", "ai_summary", "ai_recommended_action")
+ADMIN_FIELDS = ("ai_summary", "ai_recommended_action")
+
+
+class LLMError(Exception):
+    """Raised in strict mode when the LLM is configured but gave no usable output."""
+
+
+_cache = cache_from_env()
+_breaker = CircuitBreaker(
+    "gemini",
+    failure_threshold=int(os.environ.get("LLM_BREAKER_THRESHOLD", "5")),
+    reset_seconds=float(os.environ.get("LLM_BREAKER_RESET_SECONDS", "30")),
+)
+_executor: Optional[ThreadPoolExecutor] = None
+_timed = metrics.timed(metrics.LLM_GENERATE_SECONDS, "llm")
+_executor_lock = threading.Lock()
+
+
+def llm_available() -> bool:
+    """True when a real (or fake) LLM backend is configured."""
+    return get_backend().available()
+
+
+def _call_model(
+    prompt: str,
+    max_output_tokens: int,
+    temperature: float,
+    timeout: Optional[float] = None,
+    task: str = "other"
+) -> Optional[str]:
+    """Send a prompt to the configured backend. Returns the text, or None on any failure.
+
+    While the circuit breaker is open this returns None immediately, so callers
+    go straight to their template fallback instead of waiting on a failing API.
+    """
+    backend = get_backend()
+    if not backend.available():
+        metrics.LLM_CALLS.inc(task=task, outcome="unavailable")
+        return None
+    if not _breaker.allow():
+        metrics.LLM_CALLS.inc(task=task, outcome="circuit_open")
+        return None
+    started = time.perf_counter()
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(
+        text = backend.generate(
             prompt,
-            generation_config=genai.types.GenerationConfig(
-                max_output_tokens=150,
-                temperature=0.7,
-            )
+            max_output_tokens=max_output_tokens,
+            temperature=temperature,
+            timeout=timeout or REQUEST_DEADLINE_SECONDS,
         )
-        return response.text.strip()
-    except Exception as e:
-        return f"Thank you for your {rating}-star review! We value your feedback."
+        outcome = "ok"
+    except LLMBackendError:
+        text, outcome = None, "error"
+    _observe_call(task, outcome, time.perf_counter() - started)
+    if text is None:
+        _breaker.record_failure()
+        return None
+    _breaker.record_success()
+    return text
 
 
-def generate_admin_summary(rating: int, review: str) -> str:
-    """Generate an internal summary for admin dashboard."""
-    if not configure_genai():
-        return f"User rated {rating} stars. Review: {review[:100]}..."
-    
-    prompt = f"""Summarize this customer review in one concise sentence for internal use:
+def _observe_call(task: str, outcome: str, seconds: float):
+    metrics.LLM_CALLS.inc(task=task, outcome=outcome)
+    metrics.LLM_CALL_SECONDS.observe(seconds, task=task, outcome=outcome)
+    metrics.record_stage(f"llm.{task}", seconds)
+
+
+def _cached_call(
+    task: str,
+    rating: int,
+    review: str,
+    prompt: str,
+    is_usable: Optional[Callable[[str], bool]] = None
+) -> Optional[str]:
+    """_call_model behind the response cache, with the task's generation settings.
+
+    Only usable LLM output is stored, so outages and parse failures are retried
+    on the next request instead of pinning a fallback.
+    """
+    key = make_key(task, rating, review, get_backend().model_name, PROMPT_VERSION)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+    text = _call_model(prompt, task=task, **GENERATION_SETTINGS[task])
+    if text and (is_usable is None or is_usable(text)):
+        _cache.put(key, text)
+    return text
+
+
+def cache_stats() -> Dict:
+    """Hit/miss counters of the LLM response cache."""
+    return _cache.stats()
+
+
+def breaker_state() -> Dict:
+    """Current state of the LLM circuit breaker."""
+    return _breaker.snapshot()
+
+
+def fallback_user_response(rating: int) -> str:
+    """Template reply used when the LLM is unavailable."""
+    metrics.LLM_FALLBACKS.inc(field="ai_response")
+    return f"Thank you for your {rating}-star review! We appreciate your feedback."
+
+
+def fallback_admin_summary(rating: int, review: str) -> str:
+    """Template summary used when the LLM is unavailable."""
+    metrics.LLM_FALLBACKS.inc(field="ai_summary")
+    return f"User rated {rating} stars. Review: {review[:100]}..."
+
+
+def fallback_recommended_action(rating: int) -> str:
+    """Rating-only rule used when the LLM is unavailable."""
+    metrics.LLM_FALLBACKS.inc(field="ai_recommended_action")
+    return action_classifier.ACTIONS[action_classifier.rating_rule(rating)]
+
+
+def _user_response_prompt(rating: int, review: str) -> str:
+    return f"""You are a customer service representative. A user submitted a {rating}-star review with the following text:
+"{review}"
+
+Write a short, friendly response (2-3 sentences) thanking them and addressing their feedback appropriately."""
+
+
+@_timed
+def generate_user_response(rating: int, review: str) -> str:
+    """Generate a user-facing response based on rating and review."""
+    text = _cached_call("user_response", rating, review, _user_response_prompt(rating, review))
+    return text or fallback_user_response(rating)
+
+
+def generate_user_response_stream(rating: int, review: str) -> Iterator[Tuple[str, str]]:
+    """Stream the user-facing response as ("token", text) pieces while the model produces it.
+
+    Cached replies and template fallbacks arrive as a single token. If the model
+    fails after some tokens were already yielded, a final ("replace", fallback)
+    tells the caller to discard them. The complete reply is the concatenation
+    of the tokens (or the replacement), and is cached like generate_user_response.
+    """
+    key = make_key("user_response", rating, review, get_backend().model_name, PROMPT_VERSION)
+    cached = _cache.get(key)
+    if cached is not None:
+        yield "token", cached
+        return
+
+    backend = get_backend()
+    if not backend.available() or not _breaker.allow():
+        yield "token", fallback_user_response(rating)
+        return
+
+    settings = GENERATION_SETTINGS["user_response"]
+    pieces: List[str] = []
+    started = time.perf_counter()
+    outcome = None
+    try:
+        for piece in backend.stream(
+            _user_response_prompt(rating, review),
+            max_output_tokens=settings["max_output_tokens"],
+            temperature=settings["temperature"],
+            timeout=REQUEST_DEADLINE_SECONDS,
+        ):
+            if not pieces:
+                piece = piece.lstrip()
+            if piece:
+                pieces.append(piece)
+                yield "token", piece
+        outcome = "ok"
+    except LLMBackendError:
+        outcome = "error"
+    finally:
+        # Also runs when the stream is closed early (client gone): that says nothing
+        # about the backend, but a half-open probe must still be given back.
+        _observe_call("user_response_stream", outcome or "abandoned", time.perf_counter() - started)
+        if outcome == "ok":
+            _breaker.record_success()
+        elif outcome == "error":
+            _breaker.record_failure()
+        else:
+            _breaker.release_probe()
+    if outcome == "error":
+        yield ("replace" if pieces else "token"), fallback_user_response(rating)
+        return
+
+    text = "".join(pieces).strip()
+    if text:
+        _cache.put(key, text)
+    else:
+        yield "token", fallback_user_response(rating)
+
+
+def _admin_summary_prompt(rating: int, review: str) -> str:
+    return f"""Summarize this customer review in one concise sentence for internal use:
 Rating: {rating} stars
 Review: "{review}"
 
 Keep it brief and factual."""
-    
-    try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                max_output_tokens=80,
-                temperature=0.3,
-            )
-        )
-        return response.text.strip()
-    except Exception:
-        return f"{rating}-star review: {review[:80]}..."
 
 
+@_timed
+def generate_admin_summary(rating: int, review: str) -> str:
+    """Generate an internal summary for admin dashboard."""
+    text = _cached_call("admin_summary", rating, review, _admin_summary_prompt(rating, review))
+    return text or fallback_admin_summary(rating, review)
+
+
+@_timed
 def generate_recommended_action(rating: int, review: str) -> str:
-    """Generate recommended next actions for admin."""
-    if not configure_genai():
-        if rating <= 2:
-            return "Priority follow-up required. Contact customer within 24 hours."
-        elif rating == 3:
-            return "Monitor for patterns. Consider process improvements."
-        else:
-            return "Positive feedback. Share with team."
-    
+    """Generate recommended next actions for admin (locally for routine reviews)."""
+    local_action = action_classifier.classify(rating, review)
+    if local_action is not None:
+        return local_action
     prompt = f"""Based on this customer review, suggest one specific action for the business (1-2 sentences):
 Rating: {rating} stars
 Review: "{review}"
 
 Focus on actionable next steps."""
-    
+
+    text = _cached_call("recommended_action", rating, review, prompt)
+    return text or fallback_recommended_action(rating)
+
+
+def parse_json_from_text(text: str) -> Tuple[bool, Dict]:
+    """Extract the first JSON object from model output (which may be fenced)."""
     try:
-        model = genai.GenerativeModel("gemini-1.5-flash")
-        response = model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                max_output_tokens=100,
-                temperature=0.5,
-            )
+        return True, json.loads(text)
+    except Exception:
+        start = text.find("{")
+        end = text.rfind("}")
+        if start != -1 and end > start:
+            try:
+                return True, json.loads(text[start : end + 1])
+            except Exception as e:
+                return False, {"error": str(e), "raw": text}
+        return False, {"error": "no json found", "raw": text}
+
+
+def validate_combined(obj, fields=COMBINED_FIELDS) -> Dict[str, str]:
+    """Keep only the expected fields that are non-empty strings."""
+    if not isinstance(obj, dict):
+        return {}
+    valid = {}
+    for field in fields:
+        value = obj.get(field)
+        if isinstance(value, str) and value.strip():
+            valid[field] = value.strip()
+    return valid
+
+
+def _parse_fields(text: str, fields) -> Dict[str, str]:
+    """Parse model output and keep the valid expected fields."""
+    ok, obj = parse_json_from_text(text)
+    return validate_combined(obj, fields) if ok else {}
+
+
+@_timed
+def generate_all(rating: int, review: str) -> Dict[str, str]:
+    """Generate response, summary and action with a single structured LLM call.
+
+    Any field that is missing or invalid in the model output falls back to
+    its template, so callers always get all three keys.
+    """
+    prompt = f"""You are assisting a customer service team. A user submitted a {rating}-star review:
+"{review}"
+
+Return only a JSON object with exactly these string keys:
+- "ai_response": a short, friendly reply to the customer (2-3 sentences) thanking them and addressing their feedback.
+- "ai_summary": one concise, factual sentence summarizing the review for internal use.
+- "ai_recommended_action": one specific, actionable next step for the business (1-2 sentences).
+
+Respond with JSON only."""
+
+    text = _cached_call(
+        "combined", rating, review, prompt,
+        is_usable=lambda t: len(_parse_fields(t, COMBINED_FIELDS)) == len(COMBINED_FIELDS),
+    )
+    fields = _parse_fields(text, COMBINED_FIELDS) if text else {}
+
+    return {
+        "ai_response": fields.get("ai_response") or fallback_user_response(rating),
+        "ai_summary": fields.get("ai_summary") or fallback_admin_summary(rating, review),
+        "ai_recommended_action": fields.get("ai_recommended_action") or fallback_recommended_action(rating),
+    }
+
+
+@_timed
+def generate_admin_fields(rating: int, review: str, strict: bool = False) -> Dict[str, str]:
+    """Generate the admin-only summary and recommended action in one LLM call.
+
+    With strict=True a configured-but-failing LLM raises LLMError instead of
+    falling back, so background workers can retry before settling for templates.
+    When the local classifier is confident about the action, only the summary
+    is asked of the LLM.
+    """
+    local_action = action_classifier.classify(rating, review)
+    if local_action is not None:
+        summary = None
+        if llm_available():
+            summary = _cached_call("admin_summary", rating, review, _admin_summary_prompt(rating, review))
+            if strict and not summary:
+                raise LLMError("LLM returned no usable admin summary")
+        return {
+            "ai_summary": summary or fallback_admin_summary(rating, review),
+            "ai_recommended_action": local_action,
+        }
+
+    prompt = f"""You are assisting a customer service team. A user submitted a {rating}-star review:
+"{review}"
+
+Return only a JSON object with exactly these string keys:
+- "ai_summary": one concise, factual sentence summarizing the review for internal use.
+- "ai_recommended_action": one specific, actionable next step for the business (1-2 sentences).
+
+Respond with JSON only."""
+
+    fields = {}
+    if llm_available():
+        text = _cached_call(
+            "admin_fields", rating, review, prompt,
+            is_usable=lambda t: len(_parse_fields(t, ADMIN_FIELDS)) == len(ADMIN_FIELDS),
         )
-        return response.text.strip()
+        fields = _parse_fields(text, ADMIN_FIELDS) if text else {}
+        if strict and len(fields) < len(ADMIN_FIELDS):
+            raise LLMError("LLM returned no usable admin fields")
+
+    return {
+        "ai_summary": fields.get("ai_summary") or fallback_admin_summary(rating, review),
+        "ai_recommended_action": fields.get("ai_recommended_action") or fallback_recommended_action(rating),
+    }
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Shared pool for concurrent LLM calls (created on first use)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            import admission  # imports this module; only needed for the default size
+
+            workers = FANOUT_WORKERS or 3 * admission.controller.max_concurrent
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-fanout")
+        return _executor
+
+
+@_timed
+def generate_all_concurrent(rating: int, review: str, deadline: Optional[float] = None) -> Dict[str, str]:
+    """Run the three separate generate_* calls at the same time under one deadline.
+
+    Calls still running when the deadline passes are abandoned (their results
+    still warm the cache) and the corresponding template is returned instead.
+    """
+    deadline = REQUEST_DEADLINE_SECONDS if deadline is None else deadline
+    executor = _get_executor()
+    # Each call runs in a copy of this context so its timings count toward the request.
+    futures = {
+        "ai_response": executor.submit(contextvars.copy_context().run, generate_user_response, rating, review),
+        "ai_summary": executor.submit(contextvars.copy_context().run, generate_admin_summary, rating, review),
+        "ai_recommended_action": executor.submit(
+            contextvars.copy_context().run, generate_recommended_action, rating, review
+        ),
+    }
+    wait(futures.values(), timeout=deadline)
+
+    fallbacks = {
+        "ai_response": lambda: fallback_user_response(rating),
+        "ai_summary": lambda: fallback_admin_summary(rating, review),
+        "ai_recommended_action": lambda: fallback_recommended_action(rating),
+    }
+    results = {}
+    for field, future in futures.items():
+        if future.done() and future.exception() is None:
+            results[field] = future.result()
+        else:
+            results[field] = fallbacks[field]()
+    return results
+
+
+def _batch_prompt(items: List[Tuple[int, str]]) -> str:
+    numbered = "\n".join(
+        f'{i}. ({rating} stars) "{review}"' for i, (rating, review) in enumerate(items, start=1)
+    )
+    return f"""You are assisting a customer service team. Below are {len(items)} numbered customer reviews:
+{numbered}
+
+Return only a JSON array with one object per review, in the same order. Each object has these keys:
+- "index": the review number (integer).
+- "ai_response": a short, friendly reply to the customer (2-3 sentences) thanking them and addressing their feedback.
+- "ai_summary": one concise, factual sentence summarizing the review for internal use.
+- "ai_recommended_action": one specific, actionable next step for the business (1-2 sentences).
+
+Respond with JSON only."""
+
+
+def _parse_batch(text: str, count: int) -> List[Dict[str, str]]:
+    """Map a JSON array reply back to review positions; unusable entries become {}."""
+    try:
+        data = json.loads(text)
     except Exception:
-        if rating <= 2:
-            return "Priority follow-up required."
-        return "Review and acknowledge feedback."
+        start, end = text.find("["), text.rfind("]")
+        try:
+            data = json.loads(text[start : end + 1]) if start != -1 and end > start else []
+        except Exception:
+            data = []
+    if not isinstance(data, list):
+        return [{} for _ in range(count)]
+
+    parsed = [{} for _ in range(count)]
+    for position, obj in enumerate(data):
+        if not isinstance(obj, dict):
+            continue
+        index = obj.get("index")
+        slot = index - 1 if isinstance(index, int) and 1 <= index <= count else position
+        if slot < count:
+            parsed[slot] = validate_combined(obj)
+    return parsed
+
+
+def _generate_group(items: List[Tuple[int, str]]) -> List[Dict[str, str]]:
+    """One multi-review LLM call for a group of (rating, review) pairs."""
+    settings = GENERATION_SETTINGS["batch"]
+    text = _call_model(
+        _batch_prompt(items),
+        max_output_tokens=min(8192, settings["max_output_tokens"] * len(items)),
+        temperature=settings["temperature"],
+        timeout=BATCH_TIMEOUT_SECONDS,
+        task="batch",
+    )
+    return _parse_batch(text, len(items)) if text else [{} for _ in items]
+
+
+@_timed
+def generate_batch(items: List[Tuple[int, str]]) -> List[Dict[str, str]]:
+    """Generate all three fields for many reviews using multi-review prompts.
+
+    Cached and duplicate reviews are resolved without extra calls, the rest are
+    grouped BATCH_SIZE per prompt with at most BATCH_CONCURRENCY prompts in
+    flight. Returns one complete dict per input item (templates fill any gaps).
+    """
+    results: List[Dict[str, str]] = [{} for _ in items]
+    pending: Dict[str, List[int]] = {}
+    for i, (rating, review) in enumerate(items):
+        key = make_key("combined", rating, review, get_backend().model_name, PROMPT_VERSION)
+        if key in pending:
+            pending[key].append(i)
+            continue
+        cached = _cache.get(key)
+        fields = _parse_fields(cached, COMBINED_FIELDS) if cached else {}
+        if len(fields) == len(COMBINED_FIELDS):
+            results[i] = fields
+        else:
+            pending[key] = [i]
+
+    if pending and llm_available():
+        keys = list(pending)
+        groups = [keys[j:j + BATCH_SIZE] for j in range(0, len(keys), BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY, thread_name_prefix="llm-batch") as pool:
+            outputs = pool.map(
+                lambda group: contextvars.copy_context().run(
+                    _generate_group, [items[pending[k][0]] for k in group]
+                ),
+                groups,
+            )
+            for group, parsed in zip(groups, outputs):
+                for key, fields in zip(group, parsed):
+                    if len(fields) == len(COMBINED_FIELDS):
+                        _cache.put(key, json.dumps(fields))
+                    for i in pending[key]:
+                        results[i] = fields
+
+    for i, (rating, review) in enumerate(items):
+        fields = results[i]
+        results[i] = {
+            "ai_response": fields.get("ai_response") or fallback_user_response(rating),
+            "ai_summary": fields.get("ai_summary") or fallback_admin_summary(rating, review),
+            "ai_recommended_action": fields.get("ai_recommended_action") or fallback_recommended_action(rating),
+        }
+    return results
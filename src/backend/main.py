@@ -1,18 +1,87 @@
 """FastAPI backend for Task 2 - AI Feedback System."""
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Dict
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Any, List, Dict, Optional
+from datetime import datetime
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+import asyncio
 import sys
 from pathlib import Path
 
 # Add backend to path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from database import add_submission, get_all_submissions, get_analytics
-from llm_service import generate_user_response, generate_admin_summary, generate_recommended_action
+from database import (
+    EXPORT_COLUMNS,
+    add_submission,
+    add_submissions_batch,
+    get_analytics,
+    get_data_revision,
+    get_submission_by_id,
+    get_submissions,
+    get_timeseries,
+    init_db,
+    iter_submissions,
+    search_submissions,
+)
+from llm_service import (
+    GENERATION_MODE,
+    breaker_state,
+    cache_stats,
+    fallback_user_response,
+    generate_all,
+    generate_all_concurrent,
+    generate_batch,
+    generate_admin_fields,
+    generate_user_response,
+    generate_user_response_stream,
+    llm_available,
+)
+import admission
+import dedup
+import enrichment
+import metrics
+import snapshot
+from events import format_sse, hub
+
+logger = logging.getLogger(__name__)
+
+# Comment lines sent on idle SSE streams so proxies keep the connection open.
+SSE_HEARTBEAT_SECONDS = 15
+
+# Requests slower than this are logged with a per-stage breakdown (0 disables).
+SLOW_REQUEST_MS = float(os.environ.get("SLOW_REQUEST_MS", "0"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Migrate the schema, then start background work and pick up anything left pending."""
+    init_db()
+    admission.configure_threadpool()
+    if enrichment.ENRICHMENT_MODE == "async":
+        enrichment.start_workers()
+        enrichment.requeue_pending()
+    snapshot.start_scheduler()
+    yield
+    snapshot.stop_scheduler()
+    enrichment.stop_workers()
 
-app = FastAPI(title="AI Feedback System API", version="1.0.0")
+
+app = FastAPI(title="AI Feedback System API", version="1.0.0", lifespan=lifespan)
+
+# Bounded concurrency, queueing and per-client rate limits for LLM-backed POSTs
+# (inside CORS, so rejections still carry CORS headers).
+app.add_middleware(admission.AdmissionMiddleware)
 
 # Enable CORS for dashboard access
 app.add_middleware(
@@ -24,6 +93,28 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Time every request, and log slow ones with where the time went."""
+    started = time.perf_counter()
+    with metrics.track_stages() as stages:
+        response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        elapsed,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=str(response.status_code),
+    )
+    if SLOW_REQUEST_MS and elapsed * 1000 >= SLOW_REQUEST_MS:
+        logger.warning(
+            "Slow request %s %s %.1fms: %s",
+            request.method, request.url.path, elapsed * 1000, stages.summary() or "no stages recorded",
+        )
+    return response
+
+
 class SubmissionRequest(BaseModel):
     rating: int = Field(..., ge=1, le=5, description="Star rating from 1-5")
     review: str = Field(..., min_length=1, max_length=5000, description="Review text")
@@ -34,6 +125,83 @@ class SubmissionResponse(BaseModel):
     ai_response: str
 
 
+MAX_BATCH_ITEMS = 5000
+
+
+class BatchSubmissionRequest(BaseModel):
+    # Items are validated one by one so a bad row is reported, not fatal.
+    items: List[Dict[str, Any]] = Field(..., min_length=1, max_length=MAX_BATCH_ITEMS)
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    ai_response: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchSubmissionResponse(BaseModel):
+    inserted: int
+    failed: int
+    results: List[BatchItemResult]
+
+
+def _etag_for(request: Request) -> str:
+    """Weak ETag from the data revision plus the query string.
+
+    Any write to submissions bumps the revision, so a matching ETag means the
+    response would be identical and the query can be skipped entirely.
+    """
+    query = hashlib.sha1(str(request.query_params).encode("utf-8")).hexdigest()[:12]
+    return f'W/"{get_data_revision()}-{query}"'
+
+
+def _not_modified(request: Request, etag: str) -> bool:
+    return request.headers.get("if-none-match") == etag
+
+
+def _publish_created(submission_id: int):
+    """Broadcast a newly stored submission to live dashboards."""
+    submission = get_submission_by_id(submission_id)
+    if submission is not None:
+        hub.publish("submission.created", submission)
+
+
+def _inline_status() -> str:
+    """Status for admin fields generated on the request path: templates without an LLM."""
+    return "complete" if llm_available() else "fallback"
+
+
+def _store_duplicate(submission: SubmissionRequest, original: Dict) -> int:
+    """Store a near-duplicate review with the AI outputs of the earlier one it matches.
+
+    If the original's admin fields are not ready yet, the copy is enriched on
+    its own; the worker still reuses them if they are ready by then.
+    """
+    if original["enrichment_status"] in ("complete", "fallback"):
+        ai_summary, ai_action = original["ai_summary"], original["ai_recommended_action"]
+        status = original["enrichment_status"]
+    elif enrichment.ENRICHMENT_MODE == "async":
+        ai_summary, ai_action, status = None, None, "pending"
+    else:
+        admin_fields = generate_admin_fields(submission.rating, submission.review)
+        ai_summary, ai_action = admin_fields["ai_summary"], admin_fields["ai_recommended_action"]
+        status = _inline_status()
+    submission_id = add_submission(
+        rating=submission.rating,
+        review=submission.review,
+        ai_response=original["ai_response"],
+        ai_summary=ai_summary,
+        ai_recommended_action=ai_action,
+        enrichment_status=status,
+        duplicate_of=original["id"]
+    )
+    _publish_created(submission_id)
+    if status == "pending":
+        enrichment.enqueue(submission_id)
+    return submission_id
+
+
 @app.get("/")
 def root():
     """API health check."""
@@ -44,10 +212,37 @@ def root():
 def submit_review(submission: SubmissionRequest):
     """Submit a new review and get AI-generated response."""
     try:
+        # Near-copies of an earlier review reuse its outputs instead of calling the LLM.
+        duplicate, signature = dedup.find_duplicate(submission.rating, submission.review)
+        if duplicate is not None:
+            submission_id = _store_duplicate(submission, duplicate)
+            return SubmissionResponse(id=submission_id, ai_response=duplicate["ai_response"])
+
+        if enrichment.ENRICHMENT_MODE == "async":
+            # Only the customer reply is on the request path; the admin fields
+            # are generated by the background workers.
+            ai_response = generate_user_response(submission.rating, submission.review)
+            submission_id = add_submission(
+                rating=submission.rating,
+                review=submission.review,
+                ai_response=ai_response,
+                ai_summary=None,
+                ai_recommended_action=None,
+                enrichment_status="pending"
+            )
+            dedup.remember([(submission_id, submission.rating, signature)])
+            _publish_created(submission_id)
+            enrichment.enqueue(submission_id)
+            return SubmissionResponse(id=submission_id, ai_response=ai_response)
+
         # Generate AI responses
-        ai_response = generate_user_response(submission.rating, submission.review)
-        ai_summary = generate_admin_summary(submission.rating, submission.review)
-        ai_action = generate_recommended_action(submission.rating, submission.review)
+        if GENERATION_MODE == "combined":
+            generated = generate_all(submission.rating, submission.review)
+        else:
+            generated = generate_all_concurrent(submission.rating, submission.review)
+        ai_response = generated["ai_response"]
+        ai_summary = generated["ai_summary"]
+        ai_action = generated["ai_recommended_action"]
         
         # Store in database
         submission_id = add_submission(
@@ -55,34 +250,406 @@ def submit_review(submission: SubmissionRequest):
             review=submission.review,
             ai_response=ai_response,
             ai_summary=ai_summary,
-            ai_recommended_action=ai_action
+            ai_recommended_action=ai_action,
+            enrichment_status=_inline_status()
         )
+        dedup.remember([(submission_id, submission.rating, signature)])
+        _publish_created(submission_id)
         
         return SubmissionResponse(id=submission_id, ai_response=ai_response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing submission: {str(e)}")
 
 
+def _store_streamed(submission: SubmissionRequest, ai_response: str, signature) -> int:
+    """Store a submission whose reply was streamed; admin fields as in /api/submit."""
+    if enrichment.ENRICHMENT_MODE == "async":
+        submission_id = add_submission(
+            rating=submission.rating,
+            review=submission.review,
+            ai_response=ai_response,
+            ai_summary=None,
+            ai_recommended_action=None,
+            enrichment_status="pending"
+        )
+        dedup.remember([(submission_id, submission.rating, signature)])
+        _publish_created(submission_id)
+        enrichment.enqueue(submission_id)
+        return submission_id
+
+    admin_fields = generate_admin_fields(submission.rating, submission.review)
+    submission_id = add_submission(
+        rating=submission.rating,
+        review=submission.review,
+        ai_response=ai_response,
+        ai_summary=admin_fields["ai_summary"],
+        ai_recommended_action=admin_fields["ai_recommended_action"],
+        enrichment_status=_inline_status()
+    )
+    dedup.remember([(submission_id, submission.rating, signature)])
+    _publish_created(submission_id)
+    return submission_id
+
+
+# Reviews whose client disconnected mid-stream are stored here: the generator is
+# closed by the server (possibly on the event loop), where LLM and DB calls must not block.
+_abandoned_streams = ThreadPoolExecutor(max_workers=2, thread_name_prefix="abandoned-stream")
+
+
+def _store_abandoned(submission: SubmissionRequest, signature):
+    try:
+        _store_streamed(submission, fallback_user_response(submission.rating), signature)
+    except Exception:
+        logger.exception("Could not store a submission whose stream was abandoned")
+
+
+def _stream_submission(submission: SubmissionRequest):
+    """SSE body for /api/submit/stream: reply tokens as generated, then the stored row's id."""
+    duplicate, signature = dedup.find_duplicate(submission.rating, submission.review)
+    if duplicate is not None:
+        # Stored before anything is sent, so a client leaving early cannot lose it.
+        try:
+            submission_id = _store_duplicate(submission, duplicate)
+        except Exception as e:
+            yield format_sse((None, "error", {"detail": f"Error processing submission: {str(e)}"}))
+            return
+        yield format_sse((None, "token", {"text": duplicate["ai_response"]}))
+        yield format_sse((None, "done", {"id": submission_id, "ai_response": duplicate["ai_response"]}))
+        return
+
+    pieces: List[str] = []
+    try:
+        for kind, text in generate_user_response_stream(submission.rating, submission.review):
+            if kind == "replace":
+                pieces = []
+            pieces.append(text)
+            yield format_sse((None, kind, {"text": text}))
+    except GeneratorExit:
+        # The client went away mid-reply; keep the review (with the template reply) without blocking close.
+        _abandoned_streams.submit(_store_abandoned, submission, signature)
+        raise
+    ai_response = "".join(pieces).strip()
+
+    try:
+        submission_id = _store_streamed(submission, ai_response, signature)
+    except Exception as e:
+        yield format_sse((None, "error", {"detail": f"Error processing submission: {str(e)}"}))
+        return
+    yield format_sse((None, "done", {"id": submission_id, "ai_response": ai_response}))
+
+
+@app.post("/api/submit/stream")
+def submit_review_stream(submission: SubmissionRequest):
+    """Submit a review and stream the AI response as server-sent events.
+
+    Events: `token` ({"text"}) for each piece of the reply as the model
+    produces it, `replace` ({"text"}) if the model failed mid-reply and the
+    fallback supersedes what was sent, then `done` ({"id", "ai_response"})
+    once the submission is stored, or `error` ({"detail"}) if storing failed.
+    """
+    return StreamingResponse(
+        _stream_submission(submission),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _to_db_timestamp(value: Optional[str], name: str) -> Optional[str]:
+    """Normalize an ISO date/datetime query parameter to SQLite's timestamp format."""
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value).strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid '{name}' timestamp: {value}")
+
+
+@app.post("/api/submit/batch", response_model=BatchSubmissionResponse)
+def submit_batch(batch: BatchSubmissionRequest):
+    """Bulk-import reviews: multi-review LLM prompts and chunked executemany inserts."""
+    results: List[BatchItemResult] = []
+    valid: List[tuple] = []
+    for index, item in enumerate(batch.items):
+        try:
+            submission = SubmissionRequest.model_validate(item)
+        except ValidationError as e:
+            errors = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            results.append(BatchItemResult(index=index, error=errors))
+            continue
+        valid.append((index, submission))
+
+    try:
+        # Near-copies of earlier reviews whose outputs are ready reuse them;
+        # the rest go through the multi-review prompts.
+        originals: List[Optional[Dict]] = []
+        signatures = []
+        for _, s in valid:
+            original, signature = dedup.find_duplicate(s.rating, s.review)
+            if original is not None and original["enrichment_status"] not in ("complete", "fallback"):
+                original = None
+            originals.append(original)
+            signatures.append(signature)
+        fresh = iter(generate_batch([(s.rating, s.review) for (_, s), o in zip(valid, originals) if o is None]))
+        generated = [next(fresh) if original is None else original for original in originals]
+        status = _inline_status()
+        ids = add_submissions_batch([
+            {
+                "rating": s.rating,
+                "review": s.review,
+                "ai_response": fields["ai_response"],
+                "ai_summary": fields["ai_summary"],
+                "ai_recommended_action": fields["ai_recommended_action"],
+                "enrichment_status": original["enrichment_status"] if original else status,
+                "duplicate_of": original["id"] if original else None,
+            }
+            for (_, s), fields, original in zip(valid, generated, originals)
+        ])
+        dedup.remember([
+            (submission_id, s.rating, signature)
+            for submission_id, (_, s), original, signature in zip(ids, valid, originals, signatures)
+            if original is None
+        ])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing batch: {str(e)}")
+    for submission_id in ids:
+        _publish_created(submission_id)
+
+    for (index, _), fields, submission_id in zip(valid, generated, ids):
+        results.append(BatchItemResult(index=index, id=submission_id, ai_response=fields["ai_response"]))
+    results.sort(key=lambda r: r.index)
+    return BatchSubmissionResponse(inserted=len(ids), failed=len(batch.items) - len(ids), results=results)
+
+
 @app.get("/api/submissions")
-def list_submissions():
-    """Get all submissions (for admin dashboard)."""
+def list_submissions(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    before_id: Optional[int] = Query(None, ge=1),
+    after_id: Optional[int] = Query(None, ge=0),
+    rating: Optional[int] = Query(None, ge=1, le=5),
+    created_from: Optional[str] = Query(None, alias="from"),
+    created_to: Optional[str] = Query(None, alias="to"),
+):
+    """Get a page of submissions, newest first (for admin dashboard).
+
+    Pass `next_before_id` back as `before_id` to load older rows, or the
+    highest id seen as `after_id` to fetch only newer rows.
+    """
+    created_from = _to_db_timestamp(created_from, "from")
+    created_to = _to_db_timestamp(created_to, "to")
     try:
-        submissions = get_all_submissions()
-        return {"submissions": submissions}
+        etag = _etag_for(request)
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        submissions = get_submissions(
+            limit=limit,
+            before_id=before_id,
+            after_id=after_id,
+            rating=rating,
+            created_from=created_from,
+            created_to=created_to,
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving submissions: {str(e)}")
+    full_page = len(submissions) == limit
+    return JSONResponse({
+        "submissions": submissions,
+        "next_before_id": submissions[-1]["id"] if full_page else None,
+        "next_after_id": submissions[0]["id"] if submissions else after_id,
+    }, headers={"ETag": etag})
+
+
+def _export_ndjson(chunks):
+    for rows in chunks:
+        yield "".join(json.dumps(row) + "\n" for row in rows)
+
+
+def _export_csv(chunks):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+@app.get("/api/submissions/export")
+def export_submissions(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    after_id: int = Query(0, ge=0),
+    rating: Optional[int] = Query(None, ge=1, le=5),
+    created_from: Optional[str] = Query(None, alias="from"),
+    created_to: Optional[str] = Query(None, alias="to"),
+):
+    """Stream submissions oldest first as NDJSON or CSV with flat memory use.
+
+    Rows are read in keyset chunks and written as they are produced. To resume
+    an interrupted export, pass the last id received as `after_id`.
+    """
+    chunks = iter_submissions(
+        after_id=after_id,
+        rating=rating,
+        created_from=_to_db_timestamp(created_from, "from"),
+        created_to=_to_db_timestamp(created_to, "to"),
+    )
+    if format == "csv":
+        return StreamingResponse(
+            _export_csv(chunks),
+            media_type="text/csv",
+            headers={"Content-Disposition": 'attachment; filename="submissions.csv"'},
+        )
+    return StreamingResponse(_export_ndjson(chunks), media_type="application/x-ndjson")
+
+
+@app.get("/api/submissions/{submission_id}")
+def get_submission(submission_id: int):
+    """Get one submission, including its background enrichment status."""
+    try:
+        submission = get_submission_by_id(submission_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error retrieving submission: {str(e)}")
+    if submission is None:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    return submission
+
+
+@app.get("/api/search")
+def search(
+    q: str = Query(..., min_length=1, max_length=200),
+    rating: Optional[int] = Query(None, ge=1, le=5),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+):
+    """Full-text search over reviews and AI summaries, best match first."""
+    try:
+        results = search_submissions(q, rating=rating, limit=limit, offset=offset)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error searching submissions: {str(e)}")
+    return {
+        "results": results,
+        "next_offset": offset + limit if len(results) == limit else None,
+    }
 
 
 @app.get("/api/analytics")
-def get_stats():
-    """Get analytics summary (for admin dashboard)."""
+def get_stats(request: Request):
+    """Get analytics summary (for admin dashboard). Supports If-None-Match."""
     try:
+        etag = _etag_for(request)
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
         analytics = get_analytics()
-        return analytics
+        return JSONResponse(analytics, headers={"ETag": etag})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error computing analytics: {str(e)}")
 
 
+@app.get("/api/analytics/snapshot")
+def get_analytics_snapshot(
+    request: Request,
+    columns: str = Query("rating,created_at", description="Comma-separated columns to include"),
+):
+    """Submissions from the Parquet snapshot as an Arrow IPC stream, with only the requested columns.
+
+    Served from the snapshot files, not SQLite; rows still pending enrichment or
+    newer than the last snapshot run are not included (see X-Snapshot-Last-Id).
+    """
+    if not snapshot.PYARROW_AVAILABLE:
+        raise HTTPException(status_code=503, detail="Analytics snapshot unavailable: pyarrow is not installed")
+    state = snapshot.read_state()
+    query = hashlib.sha1(str(request.query_params).encode("utf-8")).hexdigest()[:12]
+    etag = f'W/"snapshot-{state["last_id"]}-{query}"'
+    headers = {"ETag": etag, "X-Snapshot-Last-Id": str(state["last_id"])}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    try:
+        table = snapshot.read_table([name.strip() for name in columns.split(",") if name.strip()])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(snapshot.to_ipc_stream(table), media_type="application/vnd.apache.arrow.stream", headers=headers)
+
+
+@app.get("/api/analytics/timeseries")
+def get_analytics_timeseries(
+    request: Request,
+    granularity: str = Query("day", pattern="^(hour|day)$"),
+    created_from: Optional[str] = Query(None, alias="from"),
+    created_to: Optional[str] = Query(None, alias="to"),
+):
+    """Volume, average rating and 1-2 star share per hour or day, from rollup tables."""
+    created_from = _to_db_timestamp(created_from, "from")
+    created_to = _to_db_timestamp(created_to, "to")
+    try:
+        etag = _etag_for(request)
+        if _not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        buckets = get_timeseries(granularity, created_from, created_to)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error computing timeseries: {str(e)}")
+    return JSONResponse({"granularity": granularity, "buckets": buckets}, headers={"ETag": etag})
+
+
+@app.get("/api/events")
+async def stream_events(request: Request):
+    """Server-sent events: submission.created and submission.updated (enrichment done).
+
+    Each event's data is the full submission row. Reconnecting clients send
+    Last-Event-ID and receive the buffered events they missed.
+    """
+    last_event_id = request.headers.get("last-event-id", "")
+    sub = hub.subscribe(
+        asyncio.get_running_loop(),
+        int(last_event_id) if last_event_id.isdigit() else None,
+    )
+
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield format_sse(event)
+        finally:
+            hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus scrape endpoint: request, LLM and database timings and counters."""
+    cache = cache_stats()
+    metrics.LLM_CACHE_ENTRIES.set(cache["memory_entries"])
+    metrics.LLM_CACHE_HIT_RATE.set(cache["hit_rate"])
+    metrics.LLM_CIRCUIT_OPEN.set(0 if breaker_state()["state"] == "closed" else 1)
+    metrics.ENRICHMENT_QUEUE_DEPTH.set(enrichment.queue_depth())
+    metrics.SSE_SUBSCRIBERS.set(hub.subscriber_count())
+    metrics.LLM_REQUESTS_ACTIVE.set(admission.controller.active)
+    metrics.LLM_REQUESTS_WAITING.set(admission.controller.waiting)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/llm/status")
+def llm_status():
+    """LLM response cache counters and circuit breaker state (for monitoring)."""
+    return {"cache": cache_stats(), "circuit_breaker": breaker_state()}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
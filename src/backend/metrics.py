@@ -0,0 +1,260 @@
+"""In-process metrics for Task 2: counters, gauges and histograms in Prometheus text format.
+
+Instrumented code observes into the module-level metrics below; `/metrics`
+renders them with `render()`. Nothing is exported unless scraped, and there is
+no external dependency.
+
+Each HTTP request also collects a per-stage breakdown (LLM calls, DB
+functions, write-lock wait, commit) in a context variable, so slow requests
+can be logged with where their time went. Threads started on behalf of a
+request must run in a copy of its context (`contextvars.copy_context().run`)
+for their stages to be attributed to it.
+"""
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Value that can go up and down; set at scrape time for derived state."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram with _sum and _count, as Prometheus expects."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[LabelKey, List] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            return series[2] if series else 0
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((key, (list(s[0]), s[1], s[2])) for key, s in self._series.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(key)} {count}"
+
+
+REGISTRY: List[_Metric] = []
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_seconds", "Time to produce a response (headers, for streams), by method, route and status.")
+LLM_GENERATE_SECONDS = Histogram(
+    "llm_generate_seconds", "Wall time of each llm_service generate_* function, including cache and fallback.")
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_seconds", "Latency of calls that reached the LLM backend, by task and outcome.")
+LLM_CALLS = Counter(
+    "llm_calls_total", "LLM calls by task and outcome (ok, error, unavailable, circuit_open).")
+LLM_FALLBACKS = Counter(
+    "llm_fallbacks_total", "Template fallbacks used in place of LLM output, by field.")
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds", "Wall time of each database function, including lock wait and commit.")
+DB_LOCK_WAIT_SECONDS = Histogram(
+    "db_lock_wait_seconds", "Time write jobs waited for the writer thread and the SQLite write lock.")
+DB_COMMIT_SECONDS = Histogram(
+    "db_commit_seconds", "Time spent in SQLite COMMIT per group-committed write transaction.")
+DB_WRITE_BATCH_SIZE = Histogram(
+    "db_write_batch_size", "Write jobs applied per group-committed transaction.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+DB_BUSY_RETRIES = Counter(
+    "db_busy_retries_total", "BEGIN IMMEDIATE retries because another process held the write lock.")
+DB_ROWS_RETURNED = Histogram(
+    "db_rows_returned", "Rows returned per database read, by function.", buckets=ROW_BUCKETS)
+DEDUP_MATCHES = Counter(
+    "dedup_matches_total", "Submissions that reused the AI outputs of a near-duplicate earlier review.")
+ACTION_CLASSIFIER_DECISIONS = Counter(
+    "action_classifier_decisions_total", "Recommended actions decided by the local classifier, by outcome (local, llm).")
+ADMISSION_REJECTIONS = Counter(
+    "admission_rejections_total", "LLM-backed requests turned away (rate_limited, queue_full, queue_timeout).")
+ADMISSION_WAIT_SECONDS = Histogram(
+    "admission_wait_seconds", "Time LLM-backed requests waited in the admission queue.")
+# Point-in-time state, set when /metrics is scraped.
+LLM_CACHE_ENTRIES = Gauge("llm_cache_entries", "Entries in the in-memory LLM response cache.")
+LLM_CACHE_HIT_RATE = Gauge("llm_cache_hit_rate", "Share of LLM cache lookups served from the cache.")
+LLM_CIRCUIT_OPEN = Gauge("llm_circuit_open", "1 while the LLM circuit breaker is open or half-open.")
+ENRICHMENT_QUEUE_DEPTH = Gauge("enrichment_queue_depth", "Submissions waiting for background enrichment.")
+SSE_SUBSCRIBERS = Gauge("sse_subscribers", "Connected /api/events clients.")
+LLM_REQUESTS_ACTIVE = Gauge("llm_requests_active", "LLM-backed requests currently admitted.")
+LLM_REQUESTS_WAITING = Gauge("llm_requests_waiting", "LLM-backed requests waiting for admission.")
+
+
+def render() -> str:
+    """All metrics in Prometheus text exposition format (version 0.0.4)."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+class StageTimings:
+    """Seconds spent per named stage during one request; stages may overlap."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def summary(self) -> str:
+        """e.g. 'llm.combined=812.4ms db.add_submission=3.1ms(x2)', slowest first."""
+        with self._lock:
+            items = sorted(self.stages.items(), key=lambda item: -item[1])
+            calls = dict(self.calls)
+        return " ".join(
+            f"{stage}={seconds * 1000:.1f}ms" + (f"(x{calls[stage]})" if calls[stage] > 1 else "")
+            for stage, seconds in items
+        )
+
+
+_current_stages: ContextVar[Optional[StageTimings]] = ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def track_stages() -> Iterator[StageTimings]:
+    """Collect record_stage() calls made in this context (and copies of it)."""
+    timings = StageTimings()
+    token = _current_stages.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_stages.reset(token)
+
+
+def record_stage(stage: str, seconds: float):
+    """Attribute time to a stage of the current request; a no-op outside one."""
+    timings = _current_stages.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+def timed(histogram: Histogram, stage_prefix: str, rows: Optional[Histogram] = None) -> Callable:
+    """Decorator: observe the call's duration (labelled function=<name>) and record it as
+    stage '<stage_prefix>.<name>'. With rows=, list results also observe their length."""
+    def decorator(func):
+        name = func.__name__
+        stage = f"{stage_prefix}.{name}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                histogram.observe(elapsed, function=name)
+                record_stage(stage, elapsed)
+            if rows is not None and isinstance(result, list):
+                rows.observe(len(result), function=name)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,264 @@
+"""Incremental columnar snapshot of submissions for analytics (Parquet, partitioned by month).
+
+Aggregating over every submission through JSON pages of the API, or against
+the live SQLite file, competes with the request path. `write_snapshot()`
+appends the submissions newer than the previous run to SNAPSHOT_DIR as
+Parquet files, one directory per month of created_at:
+
+    SNAPSHOT_DIR/month=2026-10/part-000000001001-000000002000.parquet
+    SNAPSHOT_DIR/_state.json    {"last_id": 2000, ...}
+
+Admin fields change until enrichment finishes, so each run stops before the
+first submission still pending; a later run picks it up. Small files from
+frequent runs are merged once a month has more than SNAPSHOT_MAX_FILES_PER_MONTH.
+
+Readers use `read_table()` / `read_snapshot()` with the columns they need,
+so e.g. rating and created_at are read without decoding the review texts.
+Run it from cron (`python src/backend/snapshot.py`) or set
+SNAPSHOT_INTERVAL_SECONDS to refresh it from the API process. pyarrow is
+optional: without it the snapshot is unavailable and nothing else changes.
+It is imported on first use, so API processes that never touch the snapshot
+do not pay for loading it.
+"""
+import importlib.util
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import database
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = Path(os.environ.get("SNAPSHOT_DIR") or Path(__file__).parent / "snapshot")
+SNAPSHOT_INTERVAL_SECONDS = float(os.environ.get("SNAPSHOT_INTERVAL_SECONDS", "0"))
+SNAPSHOT_MAX_FILES_PER_MONTH = int(os.environ.get("SNAPSHOT_MAX_FILES_PER_MONTH", "32"))
+SNAPSHOT_CHUNK_SIZE = 50_000
+
+PYARROW_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+# Bound by _require_pyarrow() on first use.
+pa = pc = ds = pq = None
+
+STATE_FILE = "_state.json"
+_PART_NAME = re.compile(r"^part-(\d+)-(\d+)\.parquet$")
+
+_write_lock = threading.Lock()
+_scheduler: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+class SnapshotUnavailable(RuntimeError):
+    """pyarrow is not installed."""
+
+
+def _require_pyarrow():
+    global pa, pc, ds, pq
+    if not PYARROW_AVAILABLE:
+        raise SnapshotUnavailable("The analytics snapshot needs pyarrow (pip install pyarrow)")
+    if pa is None:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+        import pyarrow.parquet
+        pc, ds, pq = pyarrow.compute, pyarrow.dataset, pyarrow.parquet
+        pa = pyarrow
+
+
+def schema() -> "pa.Schema":
+    """Column types of the snapshot, in database.EXPORT_COLUMNS order."""
+    _require_pyarrow()
+    types = {
+        "id": pa.int64(),
+        "rating": pa.int8(),
+        "created_at": pa.timestamp("s"),
+        "duplicate_of": pa.int64(),
+    }
+    return pa.schema([(name, types.get(name, pa.string())) for name in database.EXPORT_COLUMNS])
+
+
+def read_state(snapshot_dir: Optional[Path] = None) -> Dict:
+    """Progress of the snapshot: the last id written and the row count."""
+    path = Path(snapshot_dir or SNAPSHOT_DIR) / STATE_FILE
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return {"last_id": 0, "rows": 0, "updated_at": None}
+
+
+def _save_state(snapshot_dir: Path, state: Dict):
+    tmp = snapshot_dir / f".{STATE_FILE}.tmp"
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, snapshot_dir / STATE_FILE)
+
+
+def _parts(partition: Path) -> List[tuple]:
+    """(first_id, last_id, path) of the data files in one month, oldest (then widest) first."""
+    parts = []
+    for path in partition.iterdir():
+        match = _PART_NAME.match(path.name)
+        if match:
+            parts.append((int(match.group(1)), int(match.group(2)), path))
+    return sorted(parts, key=lambda part: (part[0], -part[1]))
+
+
+def _clean(snapshot_dir: Path, last_id: int):
+    """Drop what an interrupted run left behind.
+
+    Temporary files, files past the recorded state and files already merged
+    into a larger one, so every id is in exactly one file.
+    """
+    for partition in snapshot_dir.glob("month=*"):
+        for tmp in partition.glob(".*.tmp"):
+            tmp.unlink()
+        covered_to = 0
+        for first, last, path in _parts(partition):
+            if first > last_id or last <= covered_to:
+                path.unlink()
+            else:
+                covered_to = max(covered_to, last)
+
+
+def _write_file(path: Path, table: "pa.Table"):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.parent / f".{path.name}.tmp"  # dot prefix: ignored by dataset readers
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+def _write_rows(snapshot_dir: Path, rows: List[Dict]) -> List[Path]:
+    """Write one chunk of rows, one file per month they fall in."""
+    by_month: Dict[str, List[Dict]] = {}
+    for row in rows:
+        by_month.setdefault(row["created_at"][:7], []).append(row)
+    table_schema = schema()
+    written = []
+    for month, month_rows in by_month.items():
+        columns = {name: [row[name] for row in month_rows] for name in table_schema.names}
+        columns["created_at"] = pc.strptime(
+            pa.array(columns["created_at"], pa.string()), format="%Y-%m-%d %H:%M:%S", unit="s"
+        )
+        table = pa.table(columns, schema=table_schema)
+        path = snapshot_dir / f"month={month}" / f"part-{month_rows[0]['id']:012d}-{month_rows[-1]['id']:012d}.parquet"
+        _write_file(path, table)
+        written.append(path.parent)
+    return written
+
+
+def _compact(partition: Path):
+    """Merge a month's files into one once there are too many of them."""
+    parts = _parts(partition)
+    if len(parts) <= SNAPSHOT_MAX_FILES_PER_MONTH:
+        return
+    table = pa.concat_tables(pq.read_table(path, schema=schema()) for _, _, path in parts)
+    # Written before the old files are removed; _clean() drops them if we stop in between.
+    _write_file(partition / f"part-{parts[0][0]:012d}-{parts[-1][1]:012d}.parquet", table)
+    for _, _, path in parts:
+        path.unlink()
+
+
+def write_snapshot(snapshot_dir: Optional[Path] = None, chunk_size: int = SNAPSHOT_CHUNK_SIZE) -> Dict:
+    """Append submissions newer than the last run. Returns the new state plus rows_written."""
+    _require_pyarrow()
+    snapshot_dir = Path(snapshot_dir or SNAPSHOT_DIR)
+    with _write_lock:
+        snapshot_dir.mkdir(parents=True, exist_ok=True)
+        state = read_state(snapshot_dir)
+        _clean(snapshot_dir, state["last_id"])
+        rows_written = 0
+        touched = set()
+        for rows in database.iter_submissions(after_id=state["last_id"], chunk_size=chunk_size):
+            pending = next((i for i, row in enumerate(rows) if row["enrichment_status"] == "pending"), None)
+            final = rows if pending is None else rows[:pending]
+            if final:
+                touched.update(_write_rows(snapshot_dir, final))
+                rows_written += len(final)
+                state = {
+                    "last_id": final[-1]["id"],
+                    "rows": state["rows"] + len(final),
+                    "updated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                }
+                _save_state(snapshot_dir, state)
+            if pending is not None:
+                break
+        for partition in touched:
+            _compact(partition)
+    return {**state, "rows_written": rows_written}
+
+
+def read_table(columns: Optional[Sequence[str]] = None, snapshot_dir: Optional[Path] = None) -> "pa.Table":
+    """The snapshot as an Arrow table, reading only `columns` (default: all)."""
+    _require_pyarrow()
+    table_schema = schema()
+    columns = list(columns or table_schema.names)
+    unknown = [name for name in columns if name not in table_schema.names]
+    if unknown:
+        raise ValueError(f"Unknown snapshot columns: {', '.join(unknown)}")
+    snapshot_dir = Path(snapshot_dir or SNAPSHOT_DIR)
+    if not any(snapshot_dir.glob("month=*/part-*.parquet")):
+        return table_schema.empty_table().select(columns)
+    dataset = ds.dataset(
+        snapshot_dir, schema=table_schema, format="parquet",
+        partitioning=ds.partitioning(flavor="hive"),
+    )
+    return dataset.to_table(columns=columns)
+
+
+def to_ipc_stream(table: "pa.Table") -> bytes:
+    """Serialize a table read from the snapshot in the Arrow IPC streaming format."""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def read_snapshot(columns: Optional[Sequence[str]] = None, snapshot_dir: Optional[Path] = None):
+    """The snapshot as a pandas DataFrame, reading only `columns` (default: all)."""
+    return read_table(columns, snapshot_dir).to_pandas()
+
+
+def _scheduler_loop(interval: float):
+    while not _stop.wait(interval):
+        try:
+            result = write_snapshot()
+            if result["rows_written"]:
+                logger.info("Snapshot: wrote %d rows (up to id %d)", result["rows_written"], result["last_id"])
+        except Exception:
+            logger.exception("Snapshot refresh failed")
+
+
+def start_scheduler(interval: float = SNAPSHOT_INTERVAL_SECONDS):
+    """Refresh the snapshot every `interval` seconds in a background thread (no-op if 0)."""
+    global _scheduler
+    if interval <= 0 or _scheduler is not None:
+        return
+    if not PYARROW_AVAILABLE:
+        logger.warning("SNAPSHOT_INTERVAL_SECONDS is set but pyarrow is not installed; snapshot disabled")
+        return
+    _stop.clear()
+    _scheduler = threading.Thread(target=_scheduler_loop, args=(interval,), name="snapshot", daemon=True)
+    _scheduler.start()
+
+
+def stop_scheduler(timeout: float = 5.0):
+    global _scheduler
+    if _scheduler is None:
+        return
+    _stop.set()
+    _scheduler.join(timeout)
+    _scheduler = None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Append new submissions to the Parquet analytics snapshot.")
+    parser.add_argument("--dir", type=Path, default=SNAPSHOT_DIR, help="snapshot directory")
+    parser.add_argument("--chunk-size", type=int, default=SNAPSHOT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    database.init_db()
+    print(json.dumps(write_snapshot(args.dir, args.chunk_size), indent=2))
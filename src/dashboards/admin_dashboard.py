@@ -3,10 +3,25 @@ import streamlit as st
 import requests
 import pandas as pd
 import os
-from datetime import datetime
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from requests.adapters import HTTPAdapter
 
 # Configuration
 API_URL = os.environ.get("API_URL", "http://localhost:8000")
+PAGE_SIZE = 20          # Submissions rendered per page
+FETCH_LIMIT = 500       # Rows requested per API call (API maximum)
+INITIAL_ROWS = 200      # History loaded on first visit; older rows load on demand
+MAX_PENDING_RECHECK = 50  # Pending rows re-polled per refresh for enrichment results
+SEARCH_LIMIT = 20       # Search results per page
+LIVE_CHECK_SECONDS = 2  # How often each tab checks the shared live feed (local, no HTTP)
+LIVE_BUFFER_ROWS = 1000  # Recent pushed rows kept by the live feed
+# Parquet snapshot written by the backend; read directly when this path is shared, else via the API.
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR")
+SNAPSHOT_TTL_SECONDS = 300
 
 # End of configuration
 
@@ -18,27 +33,254 @@ st.set_page_config(
 
 st.title("📊 Admin Dashboard - Customer Feedback Analytics")
 
-# Auto-refresh toggle
-auto_refresh = st.sidebar.checkbox("Auto-refresh (every 30s)", value=False)
-if auto_refresh:
-    import time
-    time.sleep(30)
-    st.rerun()
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """One pooled keep-alive HTTP session shared by every rerun."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class LiveFeed:
+    """Background SSE subscriber shared by every admin tab in this Streamlit process.
+
+    It keeps one streaming connection to /api/events and buffers the rows it
+    receives, so open tabs read new submissions from memory instead of each
+    polling the backend.
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.lock = threading.Lock()
+        self.rows: "OrderedDict[int, dict]" = OrderedDict()
+        self.version = 0
+        self.connected = False
+        self.last_event_id = None
+        threading.Thread(target=self._run, name="admin-live-feed", daemon=True).start()
+
+    def _run(self):
+        session = requests.Session()
+        delay = 1
+        while True:
+            headers = {"Accept": "text/event-stream"}
+            if self.last_event_id:
+                headers["Last-Event-ID"] = self.last_event_id
+            try:
+                # The server sends a heartbeat every 15s, well inside the read timeout.
+                with session.get(self.url, headers=headers, stream=True, timeout=(5, 60)) as response:
+                    response.raise_for_status()
+                    self.connected = True
+                    delay = 1
+                    self._consume(response.iter_lines(decode_unicode=True))
+            except requests.RequestException:
+                pass
+            self.connected = False
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def _consume(self, lines):
+        event_id, data = None, None
+        for line in lines:
+            if line == "":
+                if data is not None:
+                    self._apply(event_id, data)
+                event_id, data = None, None
+            elif line.startswith("id:"):
+                event_id = line[3:].strip()
+            elif line.startswith("data:"):
+                data = line[5:].strip()
+            # "event:" is not needed: every event carries the full current row.
+
+    def _apply(self, event_id, data: str):
+        row = json.loads(data)
+        with self.lock:
+            self.rows[row["id"]] = row
+            self.rows.move_to_end(row["id"])
+            while len(self.rows) > LIVE_BUFFER_ROWS:
+                self.rows.popitem(last=False)
+            self.version += 1
+            if event_id:
+                self.last_event_id = event_id
+
+    def snapshot(self):
+        """(version, rows) for merging into a tab's local cache."""
+        with self.lock:
+            return self.version, list(self.rows.values())
+
+
+@st.cache_resource
+def get_live_feed() -> LiveFeed:
+    return LiveFeed(f"{API_URL}/api/events")
+
+
+@st.cache_data(ttl=SNAPSHOT_TTL_SECONDS, show_spinner=False)
+def load_snapshot(columns: tuple) -> pd.DataFrame:
+    """Only `columns` of every snapshotted submission, decoded straight into a DataFrame.
+
+    pyarrow is optional and imported here, so the dashboard starts without it.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    if SNAPSHOT_DIR and os.path.isdir(SNAPSHOT_DIR):
+        dataset = ds.dataset(SNAPSHOT_DIR, format="parquet", partitioning="hive")
+        return dataset.to_table(columns=list(columns)).to_pandas()
+    response = get_session().get(
+        f"{API_URL}/api/analytics/snapshot", params={"columns": ",".join(columns)}, timeout=60
+    )
+    response.raise_for_status()
+    return pa.ipc.open_stream(response.content).read_pandas()
+
+
+def init_state():
+    """Local cache of submissions (by id) plus cursors and ETag responses."""
+    st.session_state.setdefault("rows", {})
+    st.session_state.setdefault("max_id", 0)
+    st.session_state.setdefault("oldest_cursor", None)
+    st.session_state.setdefault("history_complete", False)
+    st.session_state.setdefault("etag_cache", {})
+    st.session_state.setdefault("live_version", -1)
+
+
+def get_json(path: str, params: dict = None) -> dict:
+    """GET with If-None-Match; a 304 reuses the previously cached body."""
+    key = (path, tuple(sorted((params or {}).items())))
+    cached = st.session_state.etag_cache.get(key)
+    headers = {"If-None-Match": cached[0]} if cached else {}
+    response = get_session().get(f"{API_URL}{path}", params=params, headers=headers, timeout=10)
+    if response.status_code == 304 and cached:
+        return cached[1]
+    response.raise_for_status()
+    body = response.json()
+    if "ETag" in response.headers:
+        etag_cache = st.session_state.etag_cache
+        etag_cache[key] = (response.headers["ETag"], body)
+        if len(etag_cache) > 32:  # cursors change, so drop the oldest entries
+            etag_cache.pop(next(iter(etag_cache)))
+    return body
+
+
+def store_rows(rows: list):
+    for row in rows:
+        st.session_state.rows[row["id"]] = row
+        st.session_state.max_id = max(st.session_state.max_id, row["id"])
+
+
+def load_initial():
+    """First visit: load the newest INITIAL_ROWS submissions."""
+    body = get_json("/api/submissions", {"limit": INITIAL_ROWS})
+    store_rows(body["submissions"])
+    st.session_state.oldest_cursor = body["next_before_id"]
+    st.session_state.history_complete = body["next_before_id"] is None
+
+
+def load_new_rows():
+    """Fetch only rows newer than the highest id already cached."""
+    while True:
+        body = get_json("/api/submissions", {"limit": FETCH_LIMIT, "after_id": st.session_state.max_id})
+        store_rows(body["submissions"])
+        if len(body["submissions"]) < FETCH_LIMIT:
+            break
+
+
+def load_older_rows():
+    """Extend the cached history by one API page of older rows."""
+    body = get_json("/api/submissions", {"limit": FETCH_LIMIT, "before_id": st.session_state.oldest_cursor})
+    store_rows(body["submissions"])
+    st.session_state.oldest_cursor = body["next_before_id"]
+    st.session_state.history_complete = body["next_before_id"] is None
+
+
+def recheck_pending_rows():
+    """Refresh rows whose summary/action were still being generated."""
+    pending = [
+        row_id for row_id, row in st.session_state.rows.items()
+        if row.get("enrichment_status") == "pending"
+    ]
+    for row_id in sorted(pending, reverse=True)[:MAX_PENDING_RECHECK]:
+        response = get_session().get(f"{API_URL}/api/submissions/{row_id}", timeout=10)
+        if response.status_code == 200:
+            store_rows([response.json()])
+
+
+def render_submission(row: dict, expanded: bool = False):
+    """One submission as an expander with the customer and admin views side by side."""
+    created_at = row.get("created_at") or "N/A"
+    if created_at != "N/A":
+        created_at = datetime.fromisoformat(created_at).strftime("%Y-%m-%d %H:%M")
+    with st.expander(
+        f"⭐ {row['rating']} | ID: {row['id']} | {created_at}",
+        expanded=expanded
+    ):
+        col1, col2 = st.columns([2, 1])
+        
+        with col1:
+            st.markdown("**Customer Review:**")
+            st.write(row["review"])
+            
+            st.markdown("**AI Response to Customer:**")
+            st.info(row["ai_response"])
+        
+        with col2:
+            if row.get("enrichment_status") == "pending":
+                st.markdown("**Internal Summary:**")
+                st.caption("⏳ Still being generated...")
+            else:
+                st.markdown("**Internal Summary:**")
+                st.write(row["ai_summary"])
+                
+                st.markdown("**Recommended Action:**")
+                st.warning(row["ai_recommended_action"])
+            
+            st.markdown("**Details:**")
+            st.caption(f"Rating: {'⭐' * row['rating']}")
+            st.caption(f"Submitted: {created_at}")
+            if row.get("duplicate_of"):
+                st.caption(f"🔁 Near-duplicate of #{row['duplicate_of']}")
+
+
+init_state()
+
+# Live updates (server push instead of sleep-and-rerun polling)
+live_updates = st.sidebar.checkbox("Live updates", value=True)
+feed = get_live_feed() if live_updates else None
+
+if feed is not None:
+    @st.fragment(run_every=LIVE_CHECK_SECONDS)
+    def live_status():
+        """Cheap local check; reruns the page only when the feed has new events."""
+        if feed.version != st.session_state.live_version:
+            st.rerun()
+        st.caption("🟢 Live" if feed.connected else "🟠 Reconnecting to live updates...")
 
 # Refresh button
 if st.sidebar.button("🔄 Refresh Data", use_container_width=True):
     st.rerun()
 
+if st.sidebar.button("🧹 Clear Local Cache", use_container_width=True):
+    for key in ("rows", "max_id", "oldest_cursor", "history_complete", "etag_cache", "live_version"):
+        st.session_state.pop(key, None)
+    st.rerun()
+
 # Fetch data
 try:
     # Get analytics
-    analytics_response = requests.get(f"{API_URL}/api/analytics", timeout=10)
-    analytics = analytics_response.json() if analytics_response.status_code == 200 else {}
+    analytics = get_json("/api/analytics")
     
-    # Get submissions
-    submissions_response = requests.get(f"{API_URL}/api/submissions", timeout=10)
-    submissions_data = submissions_response.json() if submissions_response.status_code == 200 else {"submissions": []}
-    submissions = submissions_data.get("submissions", [])
+    # Get submissions (incrementally)
+    if not st.session_state.rows:
+        load_initial()
+    elif feed is None or not feed.connected:
+        load_new_rows()
+        recheck_pending_rows()
+    if feed is not None:
+        # New rows and finished enrichments pushed by the backend.
+        live_version, live_rows = feed.snapshot()
+        store_rows(live_rows)
+        st.session_state.live_version = live_version
     
     # Display analytics
     st.markdown("## 📈 Overview")
@@ -68,43 +310,109 @@ try:
         ])
         st.bar_chart(dist_df.set_index("Rating"))
     
-    # Submissions table
+    # Trends (served from hourly/daily rollups on the backend)
+    st.markdown("### Trends")
+    granularity = st.radio("Granularity", ["day", "hour"], horizontal=True)
+    window = timedelta(days=90) if granularity == "day" else timedelta(hours=72)
+    since = (datetime.now(timezone.utc) - window).strftime("%Y-%m-%dT%H:00:00")
+    timeseries = get_json("/api/analytics/timeseries", {"granularity": granularity, "from": since})
+    if timeseries.get("buckets"):
+        trend_df = pd.DataFrame(timeseries["buckets"]).set_index("bucket")
+        trend_df["low_rating_share"] *= 100
+        trend_col1, trend_col2 = st.columns(2)
+        with trend_col1:
+            st.caption("Submissions")
+            st.line_chart(trend_df["submissions"])
+        with trend_col2:
+            st.caption("Average rating and % of 1-2 star reviews")
+            st.line_chart(trend_df[["average_rating", "low_rating_share"]])
+    else:
+        st.caption("No submissions in this window yet.")
+    
+    # Full history from the columnar snapshot (never touches the live database)
+    st.markdown("### Monthly History")
+    try:
+        history = load_snapshot(("rating", "created_at"))
+    except ImportError:
+        history = None
+        st.caption("Analytics snapshot unavailable: install pyarrow to read it")
+    except (requests.RequestException, OSError) as e:
+        history = None
+        st.caption(f"Analytics snapshot unavailable: {e}")
+    if history is not None and len(history):
+        month = history["created_at"].dt.to_period("M")
+        monthly = history.groupby(month)["rating"].agg(submissions="size", average_rating="mean")
+        monthly["low_rating_share"] = (history["rating"] <= 2).groupby(month).mean() * 100
+        monthly.index = monthly.index.astype(str)
+        history_col1, history_col2 = st.columns(2)
+        with history_col1:
+            st.caption("Submissions per month")
+            st.bar_chart(monthly["submissions"])
+        with history_col2:
+            st.caption("Average rating and % of 1-2 star reviews")
+            st.line_chart(monthly[["average_rating", "low_rating_share"]])
+        st.caption(f"{len(history):,} submissions in the snapshot (refreshed every few minutes)")
+    elif history is not None:
+        st.caption("The analytics snapshot is empty; run `python src/backend/snapshot.py`.")
+    
+    # Search
+    st.markdown("---")
+    st.markdown("## 🔍 Search Reviews")
+    search_col1, search_col2 = st.columns([3, 1])
+    with search_col1:
+        search_query = st.text_input(
+            "Keywords", placeholder='e.g. refund, "late delivery", deliver*', label_visibility="collapsed"
+        )
+    with search_col2:
+        search_rating = st.selectbox("Rating", ["Any", 1, 2, 3, 4, 5], label_visibility="collapsed")
+    
+    if search_query.strip():
+        search_page = st.session_state.get("search_page", 0)
+        if st.session_state.get("search_key") != (search_query, search_rating):
+            search_page = 0
+        st.session_state.search_key = (search_query, search_rating)
+        params = {"q": search_query, "limit": SEARCH_LIMIT, "offset": search_page * SEARCH_LIMIT}
+        if search_rating != "Any":
+            params["rating"] = search_rating
+        found = get_session().get(f"{API_URL}/api/search", params=params, timeout=10)
+        found.raise_for_status()
+        found = found.json()
+        if found["results"]:
+            for result in found["results"]:
+                st.caption(f"ID {result['id']}: {result['snippet']}")
+                render_submission(result)
+        else:
+            st.info("No matching reviews.")
+        nav_col1, nav_col2 = st.columns(2)
+        if search_page > 0 and nav_col1.button("⬅️ Previous results"):
+            st.session_state.search_page = search_page - 1
+            st.rerun()
+        if found["next_offset"] is not None and nav_col2.button("Next results ➡️"):
+            st.session_state.search_page = search_page + 1
+            st.rerun()
+    
+    # Submissions list
     st.markdown("---")
     st.markdown("## 📋 Recent Submissions")
     
+    submissions = [st.session_state.rows[i] for i in sorted(st.session_state.rows, reverse=True)]
+    
     if submissions:
-        # Convert to DataFrame
-        df = pd.DataFrame(submissions)
+        page_count = max(1, -(-len(submissions) // PAGE_SIZE))
+        page = st.number_input(
+            f"Page (of {page_count}, {len(submissions)} loaded)",
+            min_value=1, max_value=page_count, value=1, step=1
+        )
+        start = (page - 1) * PAGE_SIZE
         
-        # Format datetime
-        if "created_at" in df.columns:
-            df["created_at"] = pd.to_datetime(df["created_at"]).dt.strftime("%Y-%m-%d %H:%M")
+        # Display detailed view (current page only)
+        for offset, row in enumerate(submissions[start:start + PAGE_SIZE]):
+            render_submission(row, expanded=start + offset < 3)  # Expand first 3
         
-        # Display detailed view
-        for idx, row in df.iterrows():
-            with st.expander(
-                f"⭐ {row['rating']} | ID: {row['id']} | {row.get('created_at', 'N/A')}",
-                expanded=idx < 3  # Expand first 3
-            ):
-                col1, col2 = st.columns([2, 1])
-                
-                with col1:
-                    st.markdown("**Customer Review:**")
-                    st.write(row["review"])
-                    
-                    st.markdown("**AI Response to Customer:**")
-                    st.info(row["ai_response"])
-                
-                with col2:
-                    st.markdown("**Internal Summary:**")
-                    st.write(row["ai_summary"])
-                    
-                    st.markdown("**Recommended Action:**")
-                    st.warning(row["ai_recommended_action"])
-                    
-                    st.markdown("**Details:**")
-                    st.caption(f"Rating: {'⭐' * row['rating']}")
-                    st.caption(f"Submitted: {row.get('created_at', 'N/A')}")
+        if page == page_count and not st.session_state.history_complete:
+            if st.button("⬇️ Load older submissions"):
+                load_older_rows()
+                st.rerun()
     else:
         st.info("No submissions yet. Waiting for customer feedback...")
 
@@ -113,6 +421,11 @@ except requests.exceptions.ConnectionError:
 except Exception as e:
     st.error(f"❌ Error loading data: {str(e)}")
 
+# Started after the data above has been merged, so it only reruns for newer events.
+if feed is not None:
+    with st.sidebar:
+        live_status()
+
 # Footer
 st.markdown("---")
 st.caption(f"Connected to: {API_URL} | Last updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -1,6 +1,7 @@
 """User Dashboard - Public-facing review submission interface."""
 import streamlit as st
 import requests
+import json
 import os
 import sys
 from pathlib import Path
@@ -10,6 +11,21 @@ API_URL = os.environ.get("API_URL", "http://localhost:8000")
 
 # End of configuration
 
+
+def stream_events(response):
+    """Yield (event, data) pairs from a text/event-stream response."""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line == "":
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+
 st.set_page_config(
     page_title="Customer Feedback",
     page_icon="⭐",
@@ -40,32 +56,47 @@ if st.button("Submit Feedback", type="primary", use_container_width=True):
     if not review.strip():
         st.error("Please write a review before submitting.")
     else:
-        with st.spinner("Processing your feedback..."):
-            try:
-                # Call API
-                response = requests.post(
-                    f"{API_URL}/api/submit",
-                    json={"rating": rating, "review": review},
-                    timeout=30
-                )
-                
+        try:
+            # The reply is streamed token by token, so it starts appearing
+            # while the model is still writing it.
+            with requests.post(
+                f"{API_URL}/api/submit/stream",
+                json={"rating": rating, "review": review},
+                stream=True,
+                timeout=30
+            ) as response:
                 if response.status_code == 200:
-                    data = response.json()
-                    st.success("Thank you for your feedback!")
-                    
-                    # Display AI response
                     st.markdown("---")
                     st.markdown("### Our Response")
-                    st.info(data["ai_response"])
-                    
-                    # Show submission ID
-                    st.caption(f"Submission ID: {data['id']}")
+                    reply = st.empty()
+                    reply.info("✍️ ...")
+                    text = ""
+                    done = None
+                    for event, data in stream_events(response):
+                        if event == "token":
+                            text += data["text"]
+                            reply.info(text + " ▌")
+                        elif event == "replace":
+                            text = data["text"]
+                            reply.info(text + " ▌")
+                        elif event == "done":
+                            done = data
+                        elif event == "error":
+                            st.error(f"Error: {data['detail']}")
+
+                    if done:
+                        # Display AI response
+                        reply.info(done["ai_response"])
+                        st.success("Thank you for your feedback!")
+                        
+                        # Show submission ID
+                        st.caption(f"Submission ID: {done['id']}")
                 else:
                     st.error(f"Error: {response.text}")
-            except requests.exceptions.ConnectionError:
-                st.error("Cannot connect to server. Please ensure the backend API is running.")
-            except Exception as e:
-                st.error(f"An error occurred: {str(e)}")
+        except requests.exceptions.ConnectionError:
+            st.error("Cannot connect to server. Please ensure the backend API is running.")
+        except Exception as e:
+            st.error(f"An error occurred: {str(e)}")
 
 # Footer
 st.markdown("---")
@@ -1,10 +1,25 @@
 """Test script for backend API - verifies all endpoints work correctly."""
 import sys
+import json
+import tempfile
+import threading
+import time
 from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent / "src" / "backend"))
 
+import database
 from database import add_submission, get_all_submissions, get_analytics, init_db
+
+# Keep test rows out of the development database.
+database.DB_PATH = Path(tempfile.mkdtemp(prefix="feedback-tests-")) / "submissions.db"
+init_db()
+import llm_service
 from llm_service import generate_user_response, generate_admin_summary, generate_recommended_action
+import admission
+
+# Tests submit far faster than any real client; only test_admission_control
+# exercises the per-client rate limit.
+admission.controller.rate_limiter = None
 
 def test_database():
     """Test database operations."""
@@ -34,6 +49,51 @@ def test_database():
     
     return True
 
+def test_connection_pool():
+    """Test pooled connections: reuse per thread, WAL mode, concurrent access."""
+    print("\nTesting connection pool...")
+    init_db()
+
+    conn = database.get_connection()
+    assert conn is database.get_connection()
+    mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal", mode
+    print(f"✓ Connection reused, journal_mode={mode}")
+
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(20):
+                add_submission(n, f"pool test {n}-{i}", "r", "s", "a")
+                get_analytics()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(1, 6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors, errors
+    print("✓ Concurrent reads/writes from 5 threads")
+
+    database.close_connections()
+    assert database.get_connection() is not conn
+    print("✓ Connections closed and reopened")
+
+    baseline = len(database._pool)
+    for _ in range(5):
+        threads = [threading.Thread(target=get_analytics) for _ in range(50)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(database._pool) <= baseline + 1, len(database._pool)
+    print("✓ Connections of finished threads are closed and leave the pool")
+
+    return True
+
 def test_llm_service():
     """Test LLM service (requires GEMINI_API_KEY)."""
     print("\nTesting LLM service...")
@@ -50,6 +110,1107 @@ def test_llm_service():
     
     return True
 
+def test_combined_generation():
+    """Test single-call generation: JSON parsing, validation and per-field fallback."""
+    print("\nTesting combined generation...")
+
+    result = llm_service.generate_all(2, "Late delivery")
+    assert set(result) == set(llm_service.COMBINED_FIELDS)
+    assert all(result.values())
+    print("✓ All three fields returned without an LLM")
+
+    original = llm_service._call_model
+    try:
+        llm_service._call_model = lambda *a, **k: (
+            '```json\n{"ai_response": "Sorry about that!", "ai_summary": "", "extra": 1}\n```'
+        )
+        result = llm_service.generate_all(2, "Late delivery")
+        assert result["ai_response"] == "Sorry about that!"
+        assert result["ai_summary"] == llm_service.fallback_admin_summary(2, "Late delivery")
+        assert result["ai_recommended_action"] == llm_service.fallback_recommended_action(2)
+        print("✓ Partial JSON keeps valid fields and falls back per field")
+
+        llm_service._call_model = lambda *a, **k: "not json at all"
+        result = llm_service.generate_all(5, "Great")
+        assert result["ai_response"] == llm_service.fallback_user_response(5)
+        print("✓ Unparseable output falls back to templates")
+    finally:
+        llm_service._call_model = original
+
+    return True
+
+def test_background_enrichment():
+    """Test that submit returns immediately and admin fields are filled in later."""
+    print("\nTesting background enrichment...")
+    from fastapi.testclient import TestClient
+    import enrichment
+    from main import app
+
+    with TestClient(app) as client:
+        resp = client.post("/api/submit", json={"rating": 1, "review": "Order arrived broken"})
+        assert resp.status_code == 200, resp.text
+        sub_id = resp.json()["id"]
+        print(f"✓ Submitted ID {sub_id} with reply: {resp.json()['ai_response'][:40]}...")
+
+        enrichment.wait_until_idle()
+        detail = client.get(f"/api/submissions/{sub_id}").json()
+        assert detail["enrichment_status"] == "fallback", detail
+        assert detail["ai_summary"] and detail["ai_recommended_action"]
+        print(f"✓ Without an LLM, templates are stored as fallback: {detail['ai_recommended_action'][:40]}...")
+
+        assert client.get("/api/submissions/999999999").status_code == 404
+        print("✓ Unknown ID returns 404")
+
+    import llm_backends
+    original_generate = enrichment.generate_admin_fields
+    original_backoff = enrichment.BACKOFF_SECONDS
+    calls = []
+
+    def flaky(rating, review, strict=False):
+        calls.append(strict)
+        if strict:
+            raise enrichment.LLMError("boom")
+        return original_generate(rating, review)
+
+    try:
+        llm_backends.set_backend(llm_backends.FakeBackend(latency_ms=0, jitter_ms=0))
+        sub_id = add_submission(1, "Order arrived broken twice", "r", None, None, enrichment_status="pending")
+        assert enrichment.enrich_submission(sub_id) == "complete"
+        assert database.get_submission_by_id(sub_id)["ai_summary"].startswith("(fake)")
+        print("✓ LLM output is stored as complete")
+
+        # Retries exhaust, then templates are stored with status "fallback".
+        enrichment.generate_admin_fields = flaky
+        enrichment.BACKOFF_SECONDS = 0.001
+        sub_id = add_submission(2, "Flaky", "r", None, None, enrichment_status="pending")
+        assert enrichment.enrich_submission(sub_id) == "fallback"
+        assert calls.count(True) == enrichment.MAX_ATTEMPTS
+        assert database.get_submission_by_id(sub_id)["enrichment_status"] == "fallback"
+        print(f"✓ Fell back after {enrichment.MAX_ATTEMPTS} attempts")
+    finally:
+        enrichment.generate_admin_fields = original_generate
+        enrichment.BACKOFF_SECONDS = original_backoff
+        llm_backends.set_backend(None)
+        llm_service._cache.clear()
+
+    return True
+
+def test_pagination():
+    """Test keyset pagination and filters on /api/submissions."""
+    print("\nTesting pagination...")
+    from fastapi.testclient import TestClient
+    from main import app
+
+    base = add_submission(3, "pagination base", "r", "s", "a")
+    ids = [add_submission(n % 5 + 1, f"pagination {n}", "r", "s", "a") for n in range(6)]
+
+    page = database.get_submissions(limit=3, after_id=base)
+    assert [r["id"] for r in page] == ids[2::-1], page
+    print("✓ after_id returns the next rows, newest first")
+
+    page = database.get_submissions(limit=2, before_id=ids[-1] + 1)
+    assert [r["id"] for r in page] == [ids[-1], ids[-2]]
+    print("✓ before_id walks back through history")
+
+    page = database.get_submissions(limit=10, after_id=base, rating=2)
+    assert page and all(r["rating"] == 2 for r in page)
+    print("✓ Rating filter")
+
+    plan = " ".join(
+        str(tuple(r)) for r in database.get_connection().execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM submissions WHERE rating = 2 AND id < 10 ORDER BY id DESC LIMIT 5"
+        )
+    )
+    assert "idx_submissions_rating_id" in plan, plan
+    print("✓ Rating filter uses the (rating, id) index")
+
+    with TestClient(app) as client:
+        body = client.get("/api/submissions", params={"limit": 4, "after_id": base}).json()
+        assert [r["id"] for r in body["submissions"]] == ids[3::-1]
+        assert body["next_after_id"] == ids[3]
+        assert body["next_before_id"] == ids[0]
+
+        body = client.get("/api/submissions", params={"after_id": ids[3]}).json()
+        assert [r["id"] for r in body["submissions"]] == ids[:3:-1]
+        assert body["next_before_id"] is None
+
+        assert client.get("/api/submissions", params={"from": "not-a-date"}).status_code == 400
+        assert client.get("/api/submissions", params={"limit": 0}).status_code == 422
+        body = client.get("/api/submissions", params={"from": "2000-01-01", "to": "2000-01-02"}).json()
+        assert body["submissions"] == []
+    print("✓ API cursors and date-range validation")
+
+    return True
+
+def test_analytics_rollups():
+    """Test that trigger-maintained rollups match a full scan and can be rebuilt."""
+    print("\nTesting analytics rollups...")
+    init_db()
+    before = get_analytics()
+    add_submission(1, "rollup test", "r", "s", "a")
+    after = get_analytics()
+    assert after["total_submissions"] == before["total_submissions"] + 1
+    assert after["rating_distribution"][1] == before["rating_distribution"].get(1, 0) + 1
+    assert database.verify_rollups()["ok"]
+    print("✓ Insert updates rollup in the same transaction")
+
+    conn = database.get_connection()
+    row = conn.execute(
+        "SELECT COUNT(*), AVG(rating) FROM submissions"
+    ).fetchone()
+    assert after["total_submissions"] == row[0]
+    assert after["average_rating"] == round(row[1], 2)
+    print("✓ Rollup analytics match a full scan")
+
+    with conn:
+        conn.execute("UPDATE rating_rollup SET submission_count = submission_count + 7 WHERE rating = 1")
+    assert not database.verify_rollups()["ok"]
+    database.rebuild_rollups()
+    assert database.verify_rollups()["ok"]
+    print("✓ Drift detected and repaired by rebuild")
+
+    return True
+
+def test_llm_cache():
+    """Test the LLM response cache: LRU, TTL, persistence and call deduplication."""
+    print("\nTesting LLM cache...")
+    import tempfile
+    import time
+    from llm_cache import LLMCache, make_key
+
+    assert make_key("t", 5, "Great service!", "m", "1") == make_key("t", 5, "  great   SERVICE ", "m", "1")
+    assert make_key("t", 5, "Great service!", "m", "1") != make_key("t", 4, "Great service!", "m", "1")
+    print("✓ Keys normalize review text and include rating")
+
+    cache = LLMCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    cache.get("a")
+    cache.put("c", "3")
+    assert cache.get("b") is None and cache.get("a") == "1"
+    assert cache.stats()["evictions"] == 1
+    print("✓ Least recently used entry evicted")
+
+    cache = LLMCache(ttl_seconds=0.01)
+    cache.put("a", "1")
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    print("✓ Expired entries are not served")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "cache.db")
+        LLMCache(path=path).put("k", "persisted")
+        reopened = LLMCache(path=path)
+        assert reopened.get("k") == "persisted"
+        assert reopened.stats()["disk_hits"] == 1
+    print("✓ Persistent tier survives a restart")
+
+    calls = []
+    original = llm_service._call_model
+    try:
+        llm_service._cache.clear()
+        llm_service._call_model = lambda *a, **k: calls.append(1) or "Thanks a lot!"
+        first = llm_service.generate_user_response(5, "Great service!")
+        second = llm_service.generate_user_response(5, "great service")
+        assert first == second == "Thanks a lot!"
+        assert len(calls) == 1
+        print("✓ Repeated review served from cache without an LLM call")
+    finally:
+        llm_service._call_model = original
+        llm_service._cache.clear()
+
+    return True
+
+def test_concurrent_fanout_and_breaker():
+    """Test concurrent generate_* calls under a deadline and the circuit breaker."""
+    print("\nTesting concurrent fan-out and circuit breaker...")
+    import time
+    from circuit_breaker import CircuitBreaker
+
+    original = llm_service._call_model
+    try:
+        llm_service._cache.clear()
+
+        def slow(prompt, **kwargs):
+            time.sleep(0.2)
+            return "LLM text"
+
+        llm_service._call_model = slow
+        start = time.perf_counter()
+        result = llm_service.generate_all_concurrent(4, "Concurrent fan-out", deadline=2.0)
+        elapsed = time.perf_counter() - start
+        assert all(v == "LLM text" for v in result.values()), result
+        assert elapsed < 0.5, elapsed
+        print(f"✓ Three calls finished in {elapsed:.2f}s (not serial)")
+
+        llm_service._cache.clear()
+
+        def hung(prompt, **kwargs):
+            time.sleep(1.0)
+            return "too late"
+
+        llm_service._call_model = hung
+        start = time.perf_counter()
+        result = llm_service.generate_all_concurrent(1, "Deadline test", deadline=0.1)
+        assert time.perf_counter() - start < 0.5
+        assert result["ai_recommended_action"] == llm_service.fallback_recommended_action(1)
+        print("✓ Deadline returns template fallbacks")
+
+        from concurrent.futures import ThreadPoolExecutor
+        llm_service._call_model = slow
+        with ThreadPoolExecutor(max_workers=admission.controller.max_concurrent) as requests_pool:
+            results = list(requests_pool.map(
+                lambda n: llm_service.generate_all_concurrent(3, f"Busy fan-out {n}", deadline=1.0),
+                range(admission.controller.max_concurrent),
+            ))
+        assert all(v == "LLM text" for result in results for v in result.values()), results
+        print(f"✓ {len(results)} concurrent requests all get LLM text within the deadline")
+    finally:
+        llm_service._call_model = original
+        llm_service._cache.clear()
+
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=0.05)
+    assert breaker.allow()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.snapshot()["state"] == "open"
+    assert not breaker.allow()
+    print("✓ Breaker opens at the failure threshold")
+
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    assert breaker.snapshot()["state"] == "half_open"
+    breaker.record_success()
+    assert breaker.snapshot()["state"] == "closed"
+    assert breaker.snapshot()["trips"] == 1
+    print("✓ Half-open probe closes the breaker on success")
+
+    return True
+
+def test_batch_submission():
+    """Test bulk ingest: per-item validation, batched inserts and batched prompts."""
+    print("\nTesting batch submission...")
+    from fastapi.testclient import TestClient
+    from main import app
+
+    ids = database.add_submissions_batch(
+        [{"rating": 4, "review": f"chunked {i}", "ai_response": "r", "ai_summary": "s",
+          "ai_recommended_action": "a"} for i in range(7)],
+        chunk_size=3,
+    )
+    assert len(ids) == 7 and ids == list(range(ids[0], ids[0] + 7))
+    assert database.get_submission_by_id(ids[-1])["review"] == "chunked 6"
+    print("✓ Chunked executemany returns IDs in order")
+
+    items = [{"rating": 5, "review": "Bulk import"}, {"rating": 9, "review": "bad"}, {"review": "no rating"}]
+    with TestClient(app) as client:
+        body = client.post("/api/submit/batch", json={"items": items}).json()
+    assert body["inserted"] == 1 and body["failed"] == 2, body
+    assert body["results"][0]["id"] and body["results"][0]["ai_response"]
+    assert "rating" in body["results"][1]["error"] and "rating" in body["results"][2]["error"]
+    print("✓ Invalid items reported per index, valid ones inserted")
+
+    prompts = []
+    original_call, original_available = llm_service._call_model, llm_service.llm_available
+    try:
+        llm_service._cache.clear()
+        llm_service.llm_available = lambda: True
+
+        def fake_call(prompt, **kwargs):
+            prompts.append(prompt)
+            return json.dumps([
+                {"index": 2, "ai_response": "R2", "ai_summary": "S2", "ai_recommended_action": "A2"},
+                {"index": 1, "ai_response": "R1", "ai_summary": "S1"},
+            ])
+
+        llm_service._call_model = fake_call
+        out = llm_service.generate_batch([(5, "First"), (1, "Second"), (5, "first!")])
+        assert len(prompts) == 1
+        assert out[1]["ai_response"] == "R2" and out[0]["ai_response"] == "R1"
+        assert out[0]["ai_recommended_action"] == llm_service.fallback_recommended_action(5)
+        assert out[2]["ai_response"] == "R1"
+        print("✓ One prompt for the group, duplicates reused, missing fields fall back")
+
+        llm_service.generate_batch([(1, "Second")])
+        assert len(prompts) == 1
+        print("✓ Complete batch results are cached")
+    finally:
+        llm_service._call_model, llm_service.llm_available = original_call, original_available
+        llm_service._cache.clear()
+
+    return True
+
+def test_conditional_requests():
+    """Test ETag / If-None-Match handling on the admin read endpoints."""
+    print("\nTesting conditional requests...")
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as client:
+        for path in ("/api/analytics", "/api/submissions?limit=5"):
+            first = client.get(path)
+            etag = first.headers["etag"]
+            again = client.get(path, headers={"If-None-Match": etag})
+            assert again.status_code == 304 and not again.content
+            add_submission(3, "etag bump", "r", "s", "a")
+            changed = client.get(path, headers={"If-None-Match": etag})
+            assert changed.status_code == 200 and changed.headers["etag"] != etag
+        print("✓ 304 while unchanged, fresh 200 after a write")
+
+        assert client.get("/api/submissions?limit=5").headers["etag"] != \
+            client.get("/api/submissions?limit=6").headers["etag"]
+        print("✓ ETag depends on query parameters")
+
+    return True
+
+def test_timeseries():
+    """Test hourly/daily rollups against a full scan and the timeseries endpoint."""
+    print("\nTesting timeseries rollups...")
+    from fastapi.testclient import TestClient
+    from main import app
+
+    conn = database.get_connection()
+    with conn:
+        conn.execute(
+            "INSERT INTO submissions (rating, review, created_at) VALUES (1, 'ts', '2001-02-03 04:05:06')"
+        )
+        conn.execute(
+            "INSERT INTO submissions (rating, review, created_at) VALUES (4, 'ts', '2001-02-03 04:59:00')"
+        )
+        conn.execute(
+            "INSERT INTO submissions (rating, review, created_at) VALUES (5, 'ts', '2001-02-03 07:00:00')"
+        )
+        conn.execute(
+            "INSERT INTO submissions (rating, review, created_at) VALUES (2, 'ts', '2001-02-04 00:00:00')"
+        )
+    assert database.verify_rollups()["ok"]
+    print("✓ Triggers keep hourly/daily buckets in sync")
+
+    hours = database.get_timeseries("hour", "2001-02-03 04:30:00", "2001-02-04 00:00:00")
+    assert [b["bucket"] for b in hours] == ["2001-02-03 04:00:00", "2001-02-03 07:00:00"]
+    assert hours[0]["submissions"] == 2 and hours[0]["average_rating"] == 2.5
+    assert hours[0]["low_rating_share"] == 0.5
+    assert [b["bucket"] for b in database.get_timeseries("hour", "2001-02-03 05:00:00", "2001-02-03 07:00:01")] == [
+        "2001-02-03 07:00:00"
+    ]
+    print("✓ Hourly buckets with average and low-rating share; a partial last bucket is included")
+
+    with TestClient(app) as client:
+        body = client.get(
+            "/api/analytics/timeseries",
+            params={"granularity": "day", "from": "2001-02-03", "to": "2001-02-04"},
+        ).json()
+        assert body["buckets"] == [
+            {"bucket": "2001-02-03", "submissions": 3, "average_rating": 3.33, "low_rating_share": 0.3333}
+        ]
+        days = client.get("/api/analytics/timeseries", params={"granularity": "day", "from": "2001-02-03", "to": "2001-02-05"}).json()
+        assert [b["bucket"] for b in days["buckets"]] == ["2001-02-03", "2001-02-04"]
+        assert client.get("/api/analytics/timeseries", params={"granularity": "week"}).status_code == 422
+    print("✓ Daily timeseries endpoint excludes the `to` day")
+
+    with conn:
+        conn.execute("DELETE FROM submissions WHERE created_at LIKE '2001-02-0%'")
+    assert database.verify_rollups()["ok"]
+    assert database.get_timeseries("day", "2001-02-03 00:00:00", "2001-02-04 00:00:00") == []
+    print("✓ Deletes are subtracted from buckets")
+
+    return True
+
+def test_streaming_export():
+    """Test chunked iteration and the NDJSON/CSV export endpoint."""
+    print("\nTesting streaming export...")
+    import csv
+    import io
+    from fastapi.testclient import TestClient
+    from main import app
+
+    base = add_submission(2, "export base", "r", "s", "a")
+    ids = [add_submission(3, f"export, \"quoted\" {i}", "r", "s", "a") for i in range(5)]
+
+    chunks = list(database.iter_submissions(after_id=base, chunk_size=2))
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert [r["id"] for c in chunks for r in c] == ids
+    print("✓ Keyset chunks cover every row exactly once")
+
+    with TestClient(app) as client:
+        resp = client.get("/api/submissions/export", params={"after_id": base})
+        assert resp.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        assert [r["id"] for r in lines] == ids
+        print("✓ NDJSON export resumes after a given id")
+
+        resp = client.get("/api/submissions/export", params={"format": "csv", "after_id": ids[2], "rating": 3})
+        rows = list(csv.DictReader(io.StringIO(resp.text)))
+        assert [int(r["id"]) for r in rows] == ids[3:]
+        assert rows[0]["review"] == 'export, "quoted" 3'
+        print("✓ CSV export with filters and proper quoting")
+
+        assert client.get("/api/submissions/export", params={"format": "xml"}).status_code == 422
+
+    return True
+
+def test_full_text_search():
+    """Test the FTS5 index: trigger sync, backfill migration, ranking and the endpoint."""
+    print("\nTesting full-text search...")
+    from fastapi.testclient import TestClient
+    from main import app
+
+    original_path = database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            database.DB_PATH = Path(tmp) / "fts.db"
+            init_db()
+            conn = database.get_connection()
+            with conn:
+                conn.executescript("""
+                    DROP TRIGGER trg_fts_insert;
+                    DROP TRIGGER trg_fts_delete;
+                    DROP TRIGGER trg_fts_update;
+                    DROP TABLE submissions_fts;
+                """)
+            # Back to the schema version just before the search index existed.
+            conn.execute(f"PRAGMA user_version = {database.MIGRATIONS.index(database._create_search_index)}")
+            sub_id = add_submission(1, "Still waiting for my refund", "r", "s", "a")
+            init_db()
+            assert [r["id"] for r in database.search_submissions("refund")] == [sub_id]
+            print("✓ Migration backfills rows written before the index existed")
+        finally:
+            database.close_connections()
+            database.DB_PATH = original_path
+
+    first = add_submission(1, "Zorblax refund requested after zorblax broke", "r", None, None)
+    second = add_submission(4, "Nice shop", "r", "Mentions zorblax once", "a")
+    results = database.search_submissions("zorblax")
+    assert [r["id"] for r in results] == [first, second], results
+    assert "**zorblax**" in results[0]["snippet"].lower()
+    print("✓ Review matches rank above summary matches")
+
+    database.update_enrichment(first, "Customer mentions quuxly", "a", "complete")
+    assert [r["id"] for r in database.search_submissions("quuxly")] == [first]
+    assert [r["id"] for r in database.search_submissions("zorblax", rating=4)] == [second]
+    print("✓ Summary updates are indexed; rating filter applies")
+
+    with TestClient(app) as client:
+        body = client.get("/api/search", params={"q": 'zorblax) ^ (-', "limit": 1}).json()
+        assert [r["id"] for r in body["results"]] == [first] and body["next_offset"] == 1
+        body = client.get("/api/search", params={"q": "zorblax", "limit": 1, "offset": 1}).json()
+        assert [r["id"] for r in body["results"]] == [second]
+        assert client.get("/api/search").status_code == 422
+    print("✓ Search endpoint paginates and tolerates operator characters")
+
+    old = add_submission(1, "Plumbix refund still missing", "r", "s", "a")
+    newer = [add_submission(5, f"Plumbix refund arrived quickly {n}", "r", "s", "a") for n in range(5)]
+    original_candidates = database.SEARCH_CANDIDATES
+    database.SEARCH_CANDIDATES = 3
+    try:
+        assert [r["id"] for r in database.search_submissions("plumbix", rating=1)] == [old]
+        ids = [r["id"] for r in database.search_submissions("plumbix", limit=10)]
+        assert sorted(ids[:3]) == newer[2:] and ids[3:] == [newer[1], newer[0], old], ids
+        page = [r["id"] for r in database.search_submissions("plumbix", limit=2, offset=4)]
+        assert page == [newer[0], old], page
+    finally:
+        database.SEARCH_CANDIDATES = original_candidates
+    print("✓ Matches outside the ranked window still come back, newest first; filters apply before the window")
+
+    return True
+
+def test_llm_backends():
+    """Test backend selection, client reuse and the offline fake backend."""
+    print("\nTesting LLM backends...")
+    import os
+    import llm_backends
+    from llm_backends import FakeBackend
+
+    assert llm_backends.get_backend() is llm_backends.get_backend()
+    print("✓ One backend instance per process")
+
+    original_env = os.environ.get("LLM_BACKEND")
+    try:
+        os.environ["LLM_BACKEND"] = "fake"
+        assert isinstance(llm_backends.create_backend_from_env(), FakeBackend)
+        os.environ["LLM_BACKEND"] = "none"
+        assert not llm_backends.create_backend_from_env().available()
+    finally:
+        if original_env is None:
+            os.environ.pop("LLM_BACKEND", None)
+        else:
+            os.environ["LLM_BACKEND"] = original_env
+    print("✓ LLM_BACKEND selects the implementation")
+
+    fake = FakeBackend(latency_ms=0, jitter_ms=0, seed=1)
+    try:
+        llm_backends.set_backend(fake)
+        llm_service._cache.clear()
+        llm_service._breaker.reset()
+        result = llm_service.generate_all(3, "Fake backend review")
+        assert all(v.startswith("(fake)") for v in result.values()), result
+        batch = llm_service.generate_batch([(1, "one"), (2, "two")])
+        assert batch[1]["ai_summary"] == "(fake) ai_summary for review 2"
+        assert fake.calls == 2
+        print("✓ Fake backend answers combined and batch prompts")
+
+        llm_backends.set_backend(FakeBackend(latency_ms=0, jitter_ms=0, error_rate=1.0))
+        llm_service._cache.clear()
+        result = llm_service.generate_all(1, "Failing backend")
+        assert result["ai_recommended_action"] == llm_service.fallback_recommended_action(1)
+        assert llm_service.breaker_state()["consecutive_failures"] == 1
+        print("✓ Injected errors fall back and count toward the breaker")
+    finally:
+        llm_backends.set_backend(None)
+        llm_service._cache.clear()
+        llm_service._breaker.reset()
+
+    return True
+
+def test_streaming_submit():
+    """Test /api/submit/stream: token events, mid-stream fallback and the stored row."""
+    print("\nTesting streaming submit...")
+    import llm_backends
+    from llm_backends import FakeBackend, LLMBackendError
+    from fastapi.testclient import TestClient
+    from main import app
+
+    def post_stream(client, rating, review):
+        events = []
+        with client.stream("POST", "/api/submit/stream", json={"rating": rating, "review": review}) as response:
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            for block in response.read().decode("utf-8").split("\n\n"):
+                lines = dict(line.split(": ", 1) for line in block.splitlines())
+                if lines:
+                    events.append((lines["event"], json.loads(lines["data"])))
+        return events
+
+    class BrokenStream(FakeBackend):
+        def stream(self, prompt, max_output_tokens, temperature, timeout):
+            yield "Thanks for"
+            raise LLMBackendError("connection reset")
+
+    try:
+        llm_backends.set_backend(FakeBackend(latency_ms=0, jitter_ms=0))
+        llm_service._cache.clear()
+        llm_service._breaker.reset()
+        with TestClient(app) as client:
+            events = post_stream(client, 5, "Streaming review")
+            tokens = [data["text"] for kind, data in events if kind == "token"]
+            assert len(tokens) > 1, events
+            kind, done = events[-1]
+            assert kind == "done" and done["ai_response"] == "".join(tokens).strip()
+            stored = client.get(f"/api/submissions/{done['id']}").json()
+            assert stored["ai_response"] == done["ai_response"]
+            print("✓ Reply streamed as tokens, then stored with its id")
+
+            events = post_stream(client, 5, "Streaming review")
+            assert [kind for kind, _ in events] == ["token", "done"]
+            print("✓ Cached reply arrives as a single token")
+
+            llm_backends.set_backend(BrokenStream())
+            events = post_stream(client, 2, "Stream breaks halfway")
+            assert [kind for kind, _ in events] == ["token", "replace", "done"]
+            assert events[-1][1]["ai_response"] == llm_service.fallback_user_response(2)
+            print("✓ Mid-stream failure replaces the partial reply with the fallback")
+
+            import main
+            original_store = main._store_streamed
+            stored = threading.Event()
+
+            def slow_store(*args):
+                time.sleep(0.3)
+                submission_id = original_store(*args)
+                stored.set()
+                return submission_id
+
+            main._store_streamed = slow_store
+            try:
+                llm_backends.set_backend(FakeBackend(latency_ms=0, jitter_ms=0))
+                stream = main._stream_submission(main.SubmissionRequest(rating=3, review="Client leaves early"))
+                next(stream)
+                started = time.perf_counter()
+                stream.close()
+                assert time.perf_counter() - started < 0.1
+                assert stored.wait(5)
+            finally:
+                main._store_streamed = original_store
+            print("✓ A disconnected stream is stored in the background, not while closing")
+
+            from circuit_breaker import CircuitBreaker
+            original_breaker = llm_service._breaker
+            llm_service._breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=0.05)
+            try:
+                llm_service._breaker.record_failure()
+                time.sleep(0.06)
+                probe = llm_service.generate_user_response_stream(4, "Probe closed by a departing client")
+                assert next(probe)[0] == "token"
+                probe.close()
+                assert llm_service._breaker.allow(), llm_service._breaker.snapshot()
+            finally:
+                llm_service._breaker = original_breaker
+            print("✓ A half-open probe closed mid-stream is released, not left in flight")
+            import enrichment
+            enrichment.wait_until_idle()
+    finally:
+        llm_backends.set_backend(None)
+        llm_service._cache.clear()
+        llm_service._breaker.reset()
+
+    return True
+
+def test_event_hub():
+    """Test the SSE hub: cross-thread publish, replay, slow-subscriber cutoff, submit events."""
+    print("\nTesting event hub...")
+    import asyncio
+    import events
+    from events import EventHub, format_sse
+    from fastapi.testclient import TestClient
+    from main import app
+
+    loop = asyncio.new_event_loop()
+    try:
+        hub = EventHub(replay_size=3)
+        sub = hub.subscribe(loop)
+        worker = threading.Thread(target=hub.publish, args=("submission.created", {"id": 1}))
+        worker.start()
+        worker.join()
+        event = loop.run_until_complete(asyncio.wait_for(sub.queue.get(), 1))
+        assert event == (1, "submission.created", {"id": 1})
+        assert format_sse(event) == 'id: 1\nevent: submission.created\ndata: {"id": 1}\n\n'
+        print("✓ Event published from another thread reaches the subscriber")
+
+        for i in range(2, 6):
+            hub.publish("submission.updated", {"id": i})
+        replay = hub.subscribe(loop, last_event_id=3)
+        assert [replay.queue.get_nowait()[0] for _ in range(2)] == [4, 5]
+        print("✓ Reconnect with Last-Event-ID replays missed events")
+
+        original_size = events.SUBSCRIBER_QUEUE_SIZE
+        events.SUBSCRIBER_QUEUE_SIZE = 2
+        try:
+            slow = hub.subscribe(loop)
+            for i in range(3):
+                hub.publish("submission.created", {"id": 10 + i})
+            loop.run_until_complete(asyncio.sleep(0))
+            assert slow.closed
+            assert [slow.queue.get_nowait() is None for _ in range(3)] == [False, False, True]
+        finally:
+            events.SUBSCRIBER_QUEUE_SIZE = original_size
+        print("✓ Subscriber that falls behind is disconnected")
+
+        received = []
+        listener = events.hub.subscribe(loop)
+        listener.deliver = received.append
+        with TestClient(app) as client:
+            sub_id = client.post("/api/submit", json={"rating": 4, "review": "Pushed live"}).json()["id"]
+            import enrichment
+            enrichment.wait_until_idle()
+        loop.run_until_complete(asyncio.sleep(0.05))
+        events.hub.unsubscribe(listener)
+        kinds = [(e[1], e[2]["id"]) for e in received]
+        assert ("submission.created", sub_id) in kinds and ("submission.updated", sub_id) in kinds, kinds
+        print("✓ Submit and enrichment publish created/updated events")
+    finally:
+        loop.close()
+
+    return True
+
+def test_metrics():
+    """Test histograms/counters, per-request stage timings and the /metrics endpoint."""
+    print("\nTesting metrics...")
+    import metrics
+    from fastapi.testclient import TestClient
+    from main import app
+
+    histogram = metrics.Histogram("test_latency_seconds", "Test histogram.", buckets=(0.1, 1.0))
+    histogram.observe(0.05, route="/a")
+    histogram.observe(0.5, route="/a")
+    rendered = histogram.render()
+    assert 'test_latency_seconds_bucket{route="/a",le="0.1"} 1' in rendered
+    assert 'test_latency_seconds_bucket{route="/a",le="+Inf"} 2' in rendered
+    assert 'test_latency_seconds_count{route="/a"} 2' in rendered
+    metrics.REGISTRY.remove(histogram)
+    print("✓ Histogram renders cumulative buckets, sum and count")
+
+    with metrics.track_stages() as stages:
+        database.add_submission(3, "Timed write", "r", "s", "a")
+        llm_service.generate_all_concurrent(3, "Timed fan-out")
+    assert {"db.add_submission", "db.lock_wait", "db.commit"} <= set(stages.stages), stages.stages
+    # Recorded from the fan-out threads through copied contexts.
+    assert "llm.generate_admin_summary" in stages.stages, stages.stages
+    print("✓ Stage timings include lock wait, commit and fan-out threads")
+
+    fallbacks = metrics.LLM_FALLBACKS.value(field="ai_recommended_action")
+    llm_service.fallback_recommended_action(1)
+    assert metrics.LLM_FALLBACKS.value(field="ai_recommended_action") == fallbacks + 1
+
+    with TestClient(app) as client:
+        client.get("/api/submissions?limit=5")
+        response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_seconds_count{method="GET",route="/api/submissions",status="200"}' in body
+    assert 'db_rows_returned_bucket{function="get_submissions",le="5"}' in body
+    assert "# TYPE llm_fallbacks_total counter" in body
+    print("✓ /metrics exposes request, database and LLM metrics")
+
+    return True
+
+def test_admission_control():
+    """Test per-client rate limiting, bounded LLM concurrency and the wait queue."""
+    print("\nTesting admission control...")
+    import asyncio
+    import httpx
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from admission import AdmissionController, AdmissionMiddleware, ClientRateLimiter
+    from main import app
+
+    limiter = ClientRateLimiter(rate_per_minute=60, burst=2)
+    assert limiter.acquire("a") == 0 and limiter.acquire("a") == 0
+    assert 0 < limiter.acquire("a") <= 1.0
+    assert limiter.acquire("b") == 0
+    assert limiter.acquire("c", cost=5) == 0
+    assert limiter.acquire("c") > 3
+    print("✓ Token bucket allows a burst per client, then asks to wait; big costs leave it in debt")
+
+    original = admission.controller
+    admission.controller = AdmissionController(4, 4, 1.0, ClientRateLimiter(60, 1))
+    try:
+        with TestClient(app) as client:
+            assert client.post("/api/submit", json={"rating": 5, "review": "First"}).status_code == 200
+            limited = client.post("/api/submit", json={"rating": 5, "review": "Second"})
+            assert limited.status_code == 429 and int(limited.headers["Retry-After"]) >= 1
+            assert client.get("/api/analytics").status_code == 200
+
+        admission.controller = AdmissionController(4, 4, 1.0, ClientRateLimiter(60, 5))
+        items = [{"rating": 4, "review": f"Batch cost {n}"} for n in range(3 * llm_service.BATCH_SIZE)]
+        with TestClient(app) as client:
+            first = client.post("/api/submit/batch", json={"items": items})
+            assert first.status_code == 200 and first.json()["inserted"] == len(items)
+            assert client.post("/api/submit/batch", json={"items": items}).status_code == 429
+    finally:
+        admission.controller = original
+    print("✓ Over-limit client gets 429 with Retry-After; batches pay per prompt; reads are unaffected")
+
+    slow_app = FastAPI()
+
+    @slow_app.post("/api/submit")
+    async def slow_submit():
+        await asyncio.sleep(0.3)
+        return {"ok": True}
+
+    @slow_app.get("/")
+    async def health():
+        return {"status": "ok"}
+
+    controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=0.1)
+    slow_app.add_middleware(AdmissionMiddleware, admission=controller)
+
+    async def storm():
+        transport = httpx.ASGITransport(app=slow_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            posts = [asyncio.create_task(client.post("/api/submit")) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            health = await client.get("/")
+            return health, await asyncio.gather(*posts)
+
+    health, responses = asyncio.run(storm())
+    assert health.status_code == 200
+    assert sorted(r.status_code for r in responses) == [200, 503, 503]
+    assert all(r.headers.get("Retry-After") for r in responses if r.status_code == 503)
+    assert controller.active == 0 and controller.waiting == 0
+    print("✓ Excess LLM requests get fast 503s while health checks still answer")
+
+    return True
+
+def test_near_duplicates():
+    """Test MinHash near-duplicate detection and reuse of the original's AI outputs."""
+    print("\nTesting near-duplicate detection...")
+    from fastapi.testclient import TestClient
+    import dedup
+    from main import app
+
+    index = dedup.NearDuplicateIndex()
+    review = "The delivery took over an hour and the pizza arrived completely cold, very disappointing."
+    reworded = "The delivery took over an hour and the pizza arrived completely cold!! Very disappointing"
+    index.add(1, 2, index.signature(review))
+    match = index.query(2, index.signature(reworded))
+    assert match is not None and match[0] == 1 and match[1] >= dedup.DEDUP_THRESHOLD, match
+    assert index.query(5, index.signature(reworded)) is None
+    assert index.query(2, index.signature("Lovely staff, quick service and the best tiramisu in town.")) is None
+    print("✓ Reworded copy with the same rating matches; other ratings and texts do not")
+
+    assert dedup.find_duplicate(2, "Cold pizza.") == (None, None)
+    print("✓ Short reviews are never treated as duplicates")
+
+    flood = "Worst experience ever, the manager was rude to us and refused any refund for the burnt meal."
+    with TestClient(app) as client:
+        first = client.post("/api/submit", json={"rating": 1, "review": flood}).json()
+        second = client.post("/api/submit", json={"rating": 1, "review": flood.upper() + "!!!"}).json()
+        assert second["ai_response"] == first["ai_response"]
+        copy = client.get(f"/api/submissions/{second['id']}").json()
+        assert copy["duplicate_of"] == first["id"], copy
+        assert client.get(f"/api/submissions/{first['id']}").json()["duplicate_of"] is None
+    print("✓ Near-duplicate submission reuses the reply and records duplicate_of")
+
+    import main
+    stream = main._stream_submission(main.SubmissionRequest(rating=1, review=flood + " Never again."))
+    assert next(stream).startswith("event: token")
+    stream.close()
+    copies = [s for s in database.search_submissions("burnt meal never again", limit=50) if s["duplicate_of"] == first["id"]]
+    assert copies, "duplicate streamed to a departing client was not stored"
+    print("✓ A streamed duplicate is stored before its reply is sent")
+
+    dedup.reset_index()
+    original, _ = dedup.find_duplicate(1, flood + " ")
+    assert original is not None and original["id"] == first["id"]
+    print("✓ Index is rebuilt from stored signatures")
+
+    return True
+
+def test_analytics_snapshot():
+    """Test the incremental Parquet snapshot and the column-projected Arrow endpoint."""
+    print("\nTesting analytics snapshot...")
+    import pyarrow as pa
+    from fastapi.testclient import TestClient
+    import snapshot
+    from main import app
+
+    original_dir = snapshot.SNAPSHOT_DIR
+    snapshot.SNAPSHOT_DIR = Path(tempfile.mkdtemp(prefix="feedback-snapshot-"))
+    try:
+        first = snapshot.write_snapshot()
+        assert first["rows_written"] == first["rows"] > 0
+        assert list(snapshot.SNAPSHOT_DIR.glob("month=*/part-*.parquet"))
+        print(f"✓ Snapshot written: {first['rows']} rows partitioned by month")
+
+        pending_id = add_submission(2, "Not enriched yet", "r", None, None, enrichment_status="pending")
+        add_submission(4, "Enriched after it", "r", "s", "a")
+        assert snapshot.write_snapshot()["rows_written"] == 0
+        database.update_enrichment(pending_id, "s", "a", "complete")
+        second = snapshot.write_snapshot()
+        assert second["rows_written"] == 2 and second["last_id"] > pending_id
+        assert snapshot.write_snapshot()["rows_written"] == 0
+        print("✓ Later runs append only new ids and wait for pending enrichment")
+
+        frame = snapshot.read_snapshot(["rating", "created_at"])
+        assert list(frame.columns) == ["rating", "created_at"] and len(frame) == second["rows"]
+        assert snapshot.read_snapshot(["id"])["id"].is_unique
+        print("✓ Column-projected read returns each submission once")
+
+        with TestClient(app) as client:
+            response = client.get("/api/analytics/snapshot", params={"columns": "rating,created_at"})
+            assert response.status_code == 200
+            assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+            table = pa.ipc.open_stream(response.content).read_all()
+            assert table.column_names == ["rating", "created_at"] and table.num_rows == second["rows"]
+            cached = client.get(
+                "/api/analytics/snapshot",
+                params={"columns": "rating,created_at"},
+                headers={"If-None-Match": response.headers["ETag"]},
+            )
+            assert cached.status_code == 304
+            assert client.get("/api/analytics/snapshot", params={"columns": "rating,nope"}).status_code == 400
+        print("✓ /api/analytics/snapshot serves an Arrow stream with only the requested columns")
+    finally:
+        snapshot.SNAPSHOT_DIR = original_dir
+
+    return True
+
+def test_schema_migrations():
+    """Test versioned migrations: fresh databases, pre-versioning databases and no-op reruns."""
+    print("\nTesting schema migrations...")
+    import sqlite3
+
+    original_path = database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            database.DB_PATH = Path(tmp) / "fresh.db"
+            init_db()
+            conn = database.get_connection()
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == database.SCHEMA_VERSION
+            print(f"✓ Fresh database migrated to version {database.SCHEMA_VERSION}")
+
+            # A database from before enrichment, rollups and versioning (user_version 0).
+            legacy = Path(tmp) / "legacy.db"
+            with sqlite3.connect(str(legacy)) as old:
+                old.execute("""
+                    CREATE TABLE submissions (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT, rating INTEGER NOT NULL, review TEXT NOT NULL,
+                        ai_response TEXT, ai_summary TEXT, ai_recommended_action TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                old.execute("INSERT INTO submissions (rating, review) VALUES (2, 'Legacy refund complaint')")
+            old.close()
+            database.DB_PATH = legacy
+            init_db()
+            row = database.get_submission_by_id(1)
+            assert row["enrichment_status"] == "complete" and row["duplicate_of"] is None
+            assert get_analytics()["total_submissions"] == 1
+            assert [r["id"] for r in database.search_submissions("refund")] == [1]
+            print("✓ Pre-versioning database is upgraded in place and backfilled")
+
+            calls = []
+            original_migrations = database.MIGRATIONS
+            database.MIGRATIONS = tuple(lambda conn, m=m: calls.append(m) for m in original_migrations)
+            try:
+                init_db()
+            finally:
+                database.MIGRATIONS = original_migrations
+            assert calls == []
+            print("✓ Up-to-date database runs no migrations")
+        finally:
+            database.close_connections()
+            database.DB_PATH = original_path
+
+    return True
+
+def test_lazy_imports():
+    """Test that importing the app loads neither the Gemini SDK nor pyarrow, nor touches the DB."""
+    print("\nTesting lazy imports...")
+    import os
+    import subprocess
+
+    backend_dir = Path(__file__).parent.parent / "src" / "backend"
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "untouched.db"
+        env = {**os.environ, "LLM_BACKEND": "gemini", "GEMINI_API_KEY": "dummy", "FEEDBACK_DB_PATH": str(db_path)}
+        check = (
+            "import sys, main; "
+            "assert 'google.generativeai' not in sys.modules, 'genai imported'; "
+            "assert 'pyarrow' not in sys.modules, 'pyarrow imported'"
+        )
+        result = subprocess.run([sys.executable, "-c", check], cwd=backend_dir, env=env,
+                                capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+        assert not db_path.exists()
+    print("✓ Importing main defers the Gemini SDK, pyarrow and schema setup")
+
+    return True
+
+def test_group_commit_writer():
+    """Test the single writer: group commit, per-job savepoints and waiting out other writers."""
+    print("\nTesting group-commit writer...")
+    import sqlite3
+    import metrics
+    from concurrent.futures import ThreadPoolExecutor
+
+    # A slow job holds the writer; everything queued meanwhile commits as one batch.
+    batches_before = metrics.DB_WRITE_BATCH_SIZE.count()
+    blocker = database._writer.submit(lambda conn: time.sleep(0.2))
+    time.sleep(0.05)
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        ids = list(pool.map(lambda n: add_submission(n % 5 + 1, f"group commit {n}", "r", "s", "a"), range(10)))
+    blocker.future.result()
+    assert len(set(ids)) == 10
+    assert [database.get_submission_by_id(i)["review"] for i in ids] == [f"group commit {n}" for n in range(10)]
+    assert metrics.DB_WRITE_BATCH_SIZE.count() - batches_before == 2
+    print("✓ Concurrent writes are group-committed and each caller gets its own id")
+
+    blocker = database._writer.submit(lambda conn: time.sleep(0.1))
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        good = pool.submit(add_submission, 3, "kept", "r", "s", "a")
+        bad = pool.submit(add_submission, None, "violates NOT NULL", "r", "s", "a")
+        also_good = pool.submit(add_submission, 4, "also kept", "r", "s", "a")
+        try:
+            bad.result()
+            assert False, "NOT NULL violation should reach its caller"
+        except sqlite3.IntegrityError:
+            pass
+        assert database.get_submission_by_id(good.result())["review"] == "kept"
+        assert database.get_submission_by_id(also_good.result())["review"] == "also kept"
+    blocker.future.result()
+    print("✓ A failing write rolls back alone; the rest of its batch commits")
+
+    # Another process (here: another connection) holding the write lock is waited out.
+    other = sqlite3.connect(str(database.DB_PATH), isolation_level=None, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.3, lambda: other.execute("COMMIT")).start()
+    started = time.perf_counter()
+    sub_id = add_submission(5, "after the other writer", "r", "s", "a")
+    assert time.perf_counter() - started >= 0.25
+    assert database.get_submission_by_id(sub_id) is not None
+    other.close()
+    print("✓ Writes wait for another writer instead of failing")
+
+    # A connection closed underneath the writer fails that batch, not the writer.
+    def close_mid_batch(conn):
+        conn.close()
+        return "unreachable"
+
+    job = database._writer.submit(close_mid_batch)
+    try:
+        job.future.result(timeout=5)
+        assert False, "a batch on a closed connection cannot commit"
+    except sqlite3.ProgrammingError:
+        pass
+    database.close_connections()
+    sub_id = add_submission(5, "after a broken batch", "r", "s", "a")
+    assert database.get_submission_by_id(sub_id)["review"] == "after a broken batch"
+    print("✓ A failing rollback resolves every future and the writer keeps running")
+
+    return True
+
+def test_action_classifier():
+    """Test the local recommended-action classifier and the LLM calls it saves."""
+    print("\nTesting local action classifier...")
+    import random
+    import metrics
+    import action_classifier
+
+    assert action_classifier.label_action("Reach out to apologise and offer a refund.") == "follow_up"
+    assert action_classifier.label_action("Share this praise with the kitchen team.") == "share_praise"
+    assert action_classifier.label_action("Investigate wait times at peak hours.") == "improve"
+    assert action_classifier.label_action("Do something.") is None
+    print("✓ LLM-written actions are labelled by category; unclear ones are skipped")
+
+    rng = random.Random(0)
+    words = {
+        "share_praise": (5, ["great food", "friendly staff", "loved it", "excellent service"]),
+        "follow_up": (1, ["cold food", "rude waiter", "never again", "waited an hour"]),
+        "improve": (3, ["okay", "average", "slow but fine", "nothing special"]),
+    }
+    examples = [
+        (rating, " and ".join(rng.sample(phrases, 2)), category)
+        for _ in range(300) for category, (rating, phrases) in words.items()
+    ]
+    model = action_classifier.HashedLinearClassifier(n_features=1 << 12).fit(examples)
+    category, confidence = model.predict(5, "loved it, friendly staff")
+    assert category == "share_praise" and confidence > 0.9, (category, confidence)
+    assert model.predict(3, "rude waiter but loved it")[1] < 0.9
+    with tempfile.TemporaryDirectory() as tmp:
+        model.save(Path(tmp) / "model.npz")
+        loaded = action_classifier.HashedLinearClassifier.load(Path(tmp) / "model.npz")
+    assert loaded.predict(1, "cold food") == model.predict(1, "cold food")
+    assert loaded.metadata["examples"] == len(examples)
+    print("✓ Trained model is confident on routine reviews, unsure on mixed ones, and round-trips to disk")
+
+    original = (llm_service._call_model, llm_service.llm_available)
+    prompts = []
+    try:
+        action_classifier.set_classifier(model)
+        llm_service._cache.clear()
+        llm_service.llm_available = lambda: True
+        llm_service._call_model = lambda prompt, *a, **k: prompts.append(prompt) or "Customer praises the food."
+        local_before = metrics.ACTION_CLASSIFIER_DECISIONS.value(outcome="local")
+        assert generate_recommended_action(5, "great food and excellent service") == action_classifier.ACTIONS["share_praise"]
+        fields = llm_service.generate_admin_fields(5, "friendly staff, loved it", strict=True)
+        assert fields == {"ai_summary": "Customer praises the food.",
+                          "ai_recommended_action": action_classifier.ACTIONS["share_praise"]}
+        assert len(prompts) == 1 and "ai_recommended_action" not in prompts[0]
+        assert metrics.ACTION_CLASSIFIER_DECISIONS.value(outcome="local") - local_before == 2
+
+        generate_recommended_action(3, "rude waiter but loved it")
+        assert len(prompts) == 2
+        print("✓ Confident actions skip the LLM (admin fields ask only for the summary); unsure ones use it")
+    finally:
+        llm_service._call_model, llm_service.llm_available = original
+        llm_service._cache.clear()
+        action_classifier.set_classifier(None)
+
+    return True
+
 def main():
     """Run all tests."""
     print("=" * 50)
@@ -58,7 +1219,30 @@ def main():
     
     try:
         test_database()
+        test_connection_pool()
         test_llm_service()
+        test_combined_generation()
+        test_background_enrichment()
+        test_pagination()
+        test_analytics_rollups()
+        test_llm_cache()
+        test_concurrent_fanout_and_breaker()
+        test_batch_submission()
+        test_conditional_requests()
+        test_timeseries()
+        test_streaming_export()
+        test_full_text_search()
+        test_llm_backends()
+        test_event_hub()
+        test_streaming_submit()
+        test_metrics()
+        test_admission_control()
+        test_near_duplicates()
+        test_analytics_snapshot()
+        test_schema_migrations()
+        test_lazy_imports()
+        test_group_commit_writer()
+        test_action_classifier()
         print("\n" + "=" * 50)
         print("✅ All tests passed!")
         print("=" * 50)